@@ -38,6 +38,71 @@ def create_app():
     app.config['BABEL_DEFAULT_LOCALE'] = 'en'
     app.config['BABEL_DEFAULT_TIMEZONE'] = 'UTC'
 
+    # Background NLP worker (flask nlp worker)
+    app.config['NLP_WORKER_BATCH_SIZE'] = int(os.environ.get('NLP_WORKER_BATCH_SIZE', 50))
+    app.config['NLP_WORKER_POLL_INTERVAL'] = float(os.environ.get('NLP_WORKER_POLL_INTERVAL', 5))
+    app.config['NLP_WORKER_MAX_ATTEMPTS'] = int(os.environ.get('NLP_WORKER_MAX_ATTEMPTS', 3))
+    app.config['NLP_WORKER_LEASE_SECONDS'] = int(os.environ.get('NLP_WORKER_LEASE_SECONDS', 300))
+    app.config['NLP_WORKER_RETRY_DELAY'] = int(os.environ.get('NLP_WORKER_RETRY_DELAY', 30))
+    app.config['NLP_SENTIMENT_ENGINE'] = os.environ.get('NLP_SENTIMENT_ENGINE', 'textblob')
+    app.config['NLP_CACHE_SIZE'] = int(os.environ.get('NLP_CACHE_SIZE', 10000))
+    app.config['NLP_CACHE_PERSIST'] = os.environ.get('NLP_CACHE_PERSIST', 'false').lower() in ('1', 'true', 'yes')
+    # Seconds between the worker's exact recounts of the listing totals and
+    # dashboard aggregates (0 = never)
+    app.config['DASHBOARD_REFRESH_INTERVAL'] = float(os.environ.get('DASHBOARD_REFRESH_INTERVAL', 300))
+
+    # Trending-issue alerts (hourly tag buckets)
+    app.config['TRENDING_THRESHOLD'] = int(os.environ.get('TRENDING_THRESHOLD', 10))
+    app.config['TRENDING_WINDOW_HOURS'] = int(os.environ.get('TRENDING_WINDOW_HOURS', 24))
+    app.config['TRENDING_RETENTION_HOURS'] = int(os.environ.get('TRENDING_RETENTION_HOURS', 24 * 14))
+    # 'anomaly' compares each (tag, location) with its own baseline; 'threshold'
+    # alerts on TRENDING_THRESHOLD across all locations
+    app.config['ALERT_DETECTOR'] = os.environ.get('ALERT_DETECTOR', 'anomaly')
+    app.config['ANOMALY_ALPHA'] = float(os.environ.get('ANOMALY_ALPHA', 0.1))
+    app.config['ANOMALY_Z_THRESHOLD'] = float(os.environ.get('ANOMALY_Z_THRESHOLD', 3.0))
+    app.config['ANOMALY_MIN_COUNT'] = int(os.environ.get('ANOMALY_MIN_COUNT', 5))
+    app.config['ANOMALY_MIN_HOURS'] = int(os.environ.get('ANOMALY_MIN_HOURS', 24))
+    app.config['ANOMALY_HISTORY_HOURS'] = int(os.environ.get('ANOMALY_HISTORY_HOURS', 24 * 7))
+
+    # Poll voting: 'direct' commits each vote, 'buffered' batches them in
+    # memory and flushes every POLL_VOTE_FLUSH_INTERVAL seconds
+    app.config['POLL_VOTE_MODE'] = os.environ.get('POLL_VOTE_MODE', 'direct')
+    app.config['POLL_VOTE_FLUSH_INTERVAL'] = float(os.environ.get('POLL_VOTE_FLUSH_INTERVAL', 1.0))
+    app.config['POLL_VOTE_MAX_PENDING'] = int(os.environ.get('POLL_VOTE_MAX_PENDING', 1000))
+    # Seconds a process may serve cached poll results changed by another process
+    app.config['POLL_RESULTS_CACHE_TTL'] = float(os.environ.get('POLL_RESULTS_CACHE_TTL', 5))
+    # Live results over SSE: 'local' (one process), 'postgres' (LISTEN/NOTIFY
+    # across workers) or 'memory' (in-process stand-in for tests)
+    app.config['POLL_STREAM_BACKEND'] = os.environ.get('POLL_STREAM_BACKEND', 'local')
+    app.config['POLL_STREAM_HEARTBEAT'] = float(os.environ.get('POLL_STREAM_HEARTBEAT', 15))
+    app.config['POLL_STREAM_HISTORY'] = int(os.environ.get('POLL_STREAM_HISTORY', 100))
+    # Seconds before a stream ends; the browser reconnects with Last-Event-ID
+    app.config['POLL_STREAM_MAX_SECONDS'] = float(os.environ.get('POLL_STREAM_MAX_SECONDS', 300))
+    # Open streams per process; past it new ones get a 503 (see gunicorn.conf.py)
+    app.config['POLL_STREAM_MAX_PER_WORKER'] = int(os.environ.get('POLL_STREAM_MAX_PER_WORKER', 10))
+    # In-process Bloom filters in front of the poll_voter unique index
+    app.config['POLL_VOTER_FILTER_CAPACITY'] = int(os.environ.get('POLL_VOTER_FILTER_CAPACITY', 10000))
+    app.config['POLL_VOTER_ERROR_RATE'] = float(os.environ.get('POLL_VOTER_ERROR_RATE', 1e-6))
+    # Shared secret the SMS/USSD gateway sends as X-Gateway-Token; only then is
+    # a vote's phone_number trusted to identify the voter (unset = never)
+    app.config['POLL_GATEWAY_TOKEN'] = os.environ.get('POLL_GATEWAY_TOKEN')
+    # Seconds a process may reuse a resolved scorecard official lookup
+    app.config['OFFICIAL_LOOKUP_CACHE_TTL'] = float(os.environ.get('OFFICIAL_LOOKUP_CACHE_TTL', 300))
+    # Seconds before a process rebuilds its official typeahead index (0 = never)
+    app.config['OFFICIAL_TYPEAHEAD_REFRESH'] = float(os.environ.get('OFFICIAL_TYPEAHEAD_REFRESH', 300))
+    # Issue/feedback search: 'auto' (SQLite FTS5 / PostgreSQL tsvector when the
+    # tables exist), 'sqlite', 'postgres' or 'memory' (in-process index)
+    app.config['SEARCH_BACKEND'] = os.environ.get('SEARCH_BACKEND', 'auto')
+    app.config['SEARCH_MAX_RESULTS'] = int(os.environ.get('SEARCH_MAX_RESULTS', 1000))
+    app.config['SEARCH_MEMORY_REFRESH'] = float(os.environ.get('SEARCH_MEMORY_REFRESH', 300))
+    # Cached public JSON responses: 'local' (per process), 'redis' (shared by
+    # every process at RESPONSE_CACHE_URL) or 'none'
+    app.config['RESPONSE_CACHE_BACKEND'] = os.environ.get('RESPONSE_CACHE_BACKEND', 'local')
+    app.config['RESPONSE_CACHE_URL'] = os.environ.get('RESPONSE_CACHE_URL')
+    app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1000))
+    # Seconds other requests wait for the one recomputing a missing response
+    app.config['RESPONSE_CACHE_LOCK_TIMEOUT'] = float(os.environ.get('RESPONSE_CACHE_LOCK_TIMEOUT', 5))
+
     # Initialize extensions with app
     db.init_app(app)
     login_manager.init_app(app)
@@ -87,6 +152,14 @@ def create_app():
     app.register_blueprint(polls_bp)
     app.register_blueprint(admin_bp, url_prefix='/admin')
 
+    # Register CLI commands
+    from app.cli import counts_cli, nlp_cli, officials_cli, polls_cli, search_cli
+    app.cli.add_command(counts_cli)
+    app.cli.add_command(nlp_cli)
+    app.cli.add_command(officials_cli)
+    app.cli.add_command(polls_cli)
+    app.cli.add_command(search_cli)
+
     # Add error handlers for production
     @app.errorhandler(404)
     def not_found_error(error):
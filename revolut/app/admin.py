@@ -6,10 +6,24 @@ from datetime import datetime, timedelta
 from app import db
 from app.models import User, Role, Official, Poll, UserFeedback, Issue, Alert, user_roles
 from app.auth import role_required
+from app.utils.dashboard import active_poll_snapshots, dashboard_aggregates
+from app.utils.official_lookup import forget_official_key, set_lookup_key
+from app.utils.official_ratings import forget_official, rating_summary
+from app.utils.official_typeahead import forget_official_suggestions, index_official
+from app.utils.poll_dedup import forget_poll
+from app.utils.poll_results import conditional_json, invalidate_poll, poll_snapshots, with_status
+from app.utils.poll_votes import build_option_rows
+from app.utils.response_cache import invalidate_responses
+from app.utils.row_counts import POLL_COUNTER, USER_COUNTER, add_to_counters, bump_counters, official_deltas
 import json
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+ADMIN_POLL_FIELDS = ('id', 'question', 'options', 'total_votes', 'created_at', 'expires_at',
+                     'is_active', 'status', 'created_by')
+ADMIN_DASHBOARD_POLL_FIELDS = ('id', 'question', 'options', 'total_votes', 'created_at', 'expires_at',
+                               'is_active', 'status')
+
 # Dashboard Routes
 @admin_bp.route('/dashboard')
 @login_required
@@ -24,60 +38,29 @@ def admin_dashboard():
 def get_dashboard_data():
     """Get comprehensive dashboard data"""
     try:
-        # Get basic statistics
-        total_users = User.query.count()
-        active_polls = Poll.query.filter(
-            and_(Poll.expires_at > datetime.utcnow() if Poll.expires_at else True)
-        ).all()
-        officials_count = Official.query.count()
-
-        # Get feedback statistics by location
-        feedback_stats = db.session.query(
-            UserFeedback.location,
-            func.count(UserFeedback.id).label('count'),
-            func.avg(UserFeedback.sentiment_score).label('avg_sentiment')
-        ).group_by(UserFeedback.location).all()
+        # Counts and per-location sentiment from one read of the row counters
+        aggregates = dashboard_aggregates()
 
         feedback_stats_data = []
-        for stat in feedback_stats:
+        for stat in aggregates['feedback_stats']:
             feedback_stats_data.append({
-                'location': stat.location or 'Unknown',
-                'count': stat.count,
-                'avg_sentiment': float(stat.avg_sentiment) if stat.avg_sentiment else 0.0
+                'location': stat['location'] or 'Unknown',
+                'count': stat['count'],
+                'avg_sentiment': stat['avg_sentiment']
             })
 
         # Format active polls data
-        polls_data = []
-        for poll in active_polls:
-            options = poll.options if isinstance(poll.options, list) else []
-            total_votes = sum(opt.get('votes', 0) for opt in options)
-
-            formatted_options = []
-            for opt in options:
-                votes = opt.get('votes', 0)
-                percentage = (votes / total_votes * 100) if total_votes > 0 else 0
-                formatted_options.append({
-                    'text': opt.get('text', ''),
-                    'votes': votes,
-                    'percentage': round(percentage, 1)
-                })
-
-            polls_data.append({
-                'id': poll.id,
-                'question': poll.question,
-                'options': formatted_options,
-                'total_votes': total_votes,
-                'created_at': poll.created_at.isoformat(),
-                'expires_at': poll.expires_at.isoformat() if poll.expires_at else None,
-                'is_active': poll.expires_at > datetime.utcnow() if poll.expires_at else True,
-                'status': 'Active' if (poll.expires_at > datetime.utcnow() if poll.expires_at else True) else 'Expired'
-            })
+        now = datetime.utcnow()
+        polls_data = [with_status(snapshot, ADMIN_DASHBOARD_POLL_FIELDS, now)
+                      for snapshot in active_poll_snapshots(now)]
 
         return jsonify({
-            'total_users': total_users,
+            'total_users': aggregates['total_users'],
             'active_polls': polls_data,
-            'officials_count': officials_count,
-            'feedback_stats': feedback_stats_data
+            'officials_count': aggregates['officials_count'],
+            'feedback_stats': feedback_stats_data,
+            'updated_at': aggregates['updated_at'],
+            'recounted_at': aggregates['recounted_at']
         })
 
     except Exception as e:
@@ -154,7 +137,9 @@ def delete_user(user_id):
             return jsonify({'error': 'Cannot delete your own account'}), 400
 
         db.session.delete(user)
+        bump_counters([USER_COUNTER], -1)
         db.session.commit()
+        invalidate_responses('dashboard')
         return jsonify({'message': 'User deleted successfully'})
 
     except Exception as e:
@@ -172,6 +157,7 @@ def list_officials():
         officials_data = []
 
         for official in officials:
+            summary = rating_summary(official)
             officials_data.append({
                 'id': official.id,
                 'name': official.name,
@@ -180,6 +166,8 @@ def list_officials():
                 'department': official.department,
                 'average_score': official.average_score,
                 'rating_count': official.rating_count,
+                'rating_stddev': summary['stddev'],
+                'rating_distribution': summary['distribution'],
                 'last_updated': official.last_updated.isoformat() if official.last_updated else None
             })
 
@@ -201,13 +189,16 @@ def create_official():
             position=data['position'],
             constituency=data['constituency'],
             department=data.get('department'),
-            ratings=[],
             average_score=0.0,
             rating_count=0
         )
+        set_lookup_key(official)
 
         db.session.add(official)
+        add_to_counters(official_deltas(official))
         db.session.commit()
+        index_official(official)
+        invalidate_responses('officials', 'dashboard')
 
         return jsonify({'message': 'Official created successfully', 'id': official.id})
 
@@ -232,9 +223,13 @@ def update_official(official_id):
             official.constituency = data['constituency']
         if 'department' in data:
             official.department = data['department']
+        set_lookup_key(official)
 
         official.last_updated = datetime.utcnow()
         db.session.commit()
+        forget_official_key(official.id)
+        index_official(official)
+        invalidate_responses('officials')
 
         return jsonify({'message': 'Official updated successfully'})
 
@@ -249,8 +244,13 @@ def delete_official(official_id):
     """Delete an official"""
     try:
         official = Official.query.get_or_404(official_id)
+        forget_official(official.id)
         db.session.delete(official)
+        add_to_counters(official_deltas(official, -1))
         db.session.commit()
+        forget_official_key(official_id)
+        forget_official_suggestions(official_id)
+        invalidate_responses('officials', 'dashboard')
 
         return jsonify({'message': 'Official deleted successfully'})
 
@@ -265,38 +265,11 @@ def delete_official(official_id):
 def get_poll_results():
     """Get all polls with results"""
     try:
-        polls = Poll.query.order_by(desc(Poll.created_at)).all()
-        polls_data = []
-
-        for poll in polls:
-            options = poll.options if isinstance(poll.options, list) else []
-            total_votes = sum(opt.get('votes', 0) for opt in options)
-
-            formatted_options = []
-            for opt in options:
-                votes = opt.get('votes', 0)
-                percentage = (votes / total_votes * 100) if total_votes > 0 else 0
-                formatted_options.append({
-                    'text': opt.get('text', ''),
-                    'votes': votes,
-                    'percentage': round(percentage, 1)
-                })
-
-            is_active = poll.expires_at > datetime.utcnow() if poll.expires_at else True
-
-            polls_data.append({
-                'id': poll.id,
-                'question': poll.question,
-                'options': formatted_options,
-                'total_votes': total_votes,
-                'created_at': poll.created_at.isoformat(),
-                'expires_at': poll.expires_at.isoformat() if poll.expires_at else None,
-                'is_active': is_active,
-                'status': 'Active' if is_active else 'Expired',
-                'created_by': poll.user.username if poll.user else 'Unknown'
-            })
+        # Cached snapshots carry the creator's username, so no per-row user lookups
+        now = datetime.utcnow()
+        polls_data = [with_status(snapshot, ADMIN_POLL_FIELDS, now) for snapshot in poll_snapshots()]
 
-        return jsonify({'polls': polls_data})
+        return conditional_json({'polls': polls_data})
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -316,8 +289,9 @@ def create_poll():
 
         # Format options
         options = []
-        for option_text in data['options']:
+        for i, option_text in enumerate(data['options']):
             options.append({
+                'id': i + 1,
                 'text': option_text,
                 'votes': 0
             })
@@ -328,9 +302,12 @@ def create_poll():
             created_by=current_user.id,
             expires_at=expires_at
         )
+        poll.option_rows = build_option_rows(data['options'])
 
         db.session.add(poll)
+        bump_counters([POLL_COUNTER])
         db.session.commit()
+        invalidate_poll(poll.id)
 
         # TODO: Send SMS notifications if notify_citizens is True
         if data.get('notify_citizens'):
@@ -358,6 +335,7 @@ def update_poll(poll_id):
             poll.expires_at = datetime.fromisoformat(data['expires_at']) if data['expires_at'] else None
 
         db.session.commit()
+        invalidate_poll(poll.id)
         return jsonify({'message': 'Poll updated successfully'})
 
     except Exception as e:
@@ -371,8 +349,11 @@ def delete_poll(poll_id):
     """Delete a poll"""
     try:
         poll = Poll.query.get_or_404(poll_id)
+        forget_poll(poll.id)
         db.session.delete(poll)
+        bump_counters([POLL_COUNTER], -1)
         db.session.commit()
+        invalidate_poll(poll_id)
 
         return jsonify({'message': 'Poll deleted successfully'})
 
@@ -623,7 +604,9 @@ def admin_create_user():
             user.roles.append(role)
 
         db.session.add(user)
+        bump_counters([USER_COUNTER])
         db.session.commit()
+        invalidate_responses('dashboard')
 
         return jsonify({'message': 'User created successfully', 'id': user.id})
 
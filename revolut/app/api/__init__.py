@@ -1,7 +1,19 @@
 # app/api/__init__.py - Fixed Main API
 from flask import Blueprint, request, jsonify, current_app
 from app import db
-from app.models import UserFeedback, Poll, Alert, Role, User, Issue, Official
+from app.models import SENTIMENT_BANDS, UserFeedback, Role, Issue, Official
+from app.utils.dashboard import active_poll_snapshots, dashboard_aggregates, recent_alerts
+from app.utils.feedback_rollup import GROUPINGS, daily_series, grouped_totals, parse_range
+from app.utils.official_lookup import find_official_id, forget_official_key
+from app.utils.official_ratings import rating_summary, record_rating
+from app.utils.official_typeahead import (forget_official_suggestions, suggest_officials,
+                                          update_official_rating)
+from app.utils.pagination import keyset_page
+from app.utils.response_cache import cached_response, invalidate_responses
+from app.utils.row_counts import (FEEDBACK_COUNTER, ISSUE_COUNTER, add_to_counters, approximate_count,
+                                  bump_counters, feedback_deltas, issue_counters, issue_status_counter,
+                                  rating_deltas)
+from app.utils.search import RankedPage, index_rows, location_filter, search as search_documents
 from datetime import datetime
 import traceback
 from flask_login import current_user
@@ -53,19 +65,17 @@ def submit_feedback():
         )
 
         db.session.add(feedback)
+        db.session.flush()
+        index_rows('feedback', [feedback])
+        add_to_counters(feedback_deltas([(None, (feedback.location, feedback.sentiment_score))]))
         db.session.commit()
+        # Issue listings show feedback counts
+        invalidate_responses('issues', 'dashboard')
 
         current_app.logger.info(f"Feedback created successfully: ID {feedback.id}")
 
-        # Process feedback (NLP and alerts) - optional, can be implemented later
-        try:
-            # from app.utils.nlp_processor import process_feedback
-            # from app.utils.alerts import check_for_trending_issues
-            # process_feedback(feedback.id)
-            # check_for_trending_issues()
-            pass
-        except Exception as e:
-            current_app.logger.warning(f"Failed to process feedback: {str(e)}")
+        # NLP processing and trending checks run in the background worker
+        # (flask nlp worker), which picks up rows with is_processed=False.
 
         # Send SMS confirmation if contact provided
         if feedback.contact and feedback.source != 'sms':
@@ -94,31 +104,54 @@ def submit_feedback():
 
 @api.route('/feedback', methods=['GET'])
 def get_feedback():
-    """Get all feedback with optional filtering"""
+    """Get feedback newest first, one page at a time, or ranked search results.
+
+    Query parameters: ``sentiment`` (positive, negative, neutral), ``location``,
+    ``per_page`` (default 20, max 100) and ``cursor`` (``next_cursor`` from the
+    previous page). With ``search`` results are ranked and paged by ``page``.
+    Unfiltered totals are approximate, from ``row_counter``; location totals
+    are exact.
+    """
     try:
         sentiment = request.args.get('sentiment')
         location = request.args.get('location')
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)  # Limit per_page
+        search = request.args.get('search')
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
 
         query = UserFeedback.query
 
-        if sentiment:
-            if sentiment == 'positive':
-                query = query.filter(UserFeedback.sentiment_score > 0.1)
-            elif sentiment == 'negative':
-                query = query.filter(UserFeedback.sentiment_score < -0.1)
-            elif sentiment == 'neutral':
-                query = query.filter(UserFeedback.sentiment_score.between(-0.1, 0.1))
+        # Each band has a partial (created_at, id) index
+        if sentiment in SENTIMENT_BANDS:
+            query = query.filter(SENTIMENT_BANDS[sentiment])
 
-        if location:
-            query = query.filter(UserFeedback.location.ilike(f'%{location}%'))
+        # Text and location matching go through the search index; a location
+        # alone filters every match rather than the capped ranked ids
+        if search:
+            matches = search_documents('feedback', text=search, location=location)
+            query = query.filter(UserFeedback.id.in_(matches))
+        elif location:
+            query = query.filter(location_filter('feedback', location))
 
-        # Paginate results
-        pagination = query.order_by(UserFeedback.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        feedback_items = pagination.items
+        if search:
+            # Search results in rank order; their number is capped, so OFFSET is bounded
+            page = request.args.get('page', 1, type=int)
+            pagination = RankedPage(query, UserFeedback, matches, page, per_page)
+            feedback_items = pagination.items
+            paging = {'total': pagination.total, 'pages': pagination.pages, 'current_page': page}
+        else:
+            try:
+                feedback_items, next_cursor = keyset_page(query, UserFeedback.created_at, UserFeedback.id,
+                                                          cursor=request.args.get('cursor'), per_page=per_page)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+            if location:
+                # Exact: the index resolves the location, the count covers every match
+                total = query.count()
+            elif sentiment in SENTIMENT_BANDS:
+                total = None
+            else:
+                total = approximate_count(FEEDBACK_COUNTER)
+            paging = {'next_cursor': next_cursor, 'has_more': next_cursor is not None, 'total': total}
 
         return jsonify({
             'feedback': [{
@@ -131,14 +164,53 @@ def get_feedback():
                 'source': f.source,
                 'is_processed': f.is_processed
             } for f in feedback_items],
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': page
+            'count': len(feedback_items),
+            **paging
         })
     except Exception as e:
         current_app.logger.error(f"Error getting feedback: {str(e)}")
         return jsonify({"error": f"Failed to get feedback: {str(e)}"}), 500
 
+@api.route('/feedback/daily', methods=['GET'])
+def get_feedback_daily():
+    """Daily count and average sentiment of processed feedback, from the rollup.
+
+    Query parameters: ``days`` (default 7, e.g. 30 or 365, ending today) or
+    ``start``/``end`` (YYYY-MM-DD), and optional ``location`` and ``category``
+    filters. With ``by=location`` or ``by=category`` returns one total per
+    location or category over the range instead of one per day.
+    """
+    try:
+        days = request.args.get('days', 7, type=int)
+        by = request.args.get('by')
+        location = request.args.get('location')
+        category = request.args.get('category')
+        if by is not None and by not in GROUPINGS:
+            return jsonify({"error": "by must be location or category"}), 400
+        try:
+            if days < 1:
+                raise ValueError("days must be positive")
+            start, end = parse_range(request.args.get('start'), request.args.get('end'), days)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid range: {str(e)}"}), 400
+
+        payload = {'start': start.isoformat(), 'end': end.isoformat(), 'location': location, 'category': category}
+        if by:
+            return jsonify({**payload, 'by': by, 'groups': grouped_totals(start, end, by, location, category)})
+
+        series = daily_series(start, end, location, category)
+        count = sum(day['count'] for day in series)
+        total = sum(day['avg_sentiment'] * day['count'] for day in series)
+        return jsonify({
+            **payload,
+            'days': series,
+            'count': count,
+            'avg_sentiment': total / count if count else 0.0
+        })
+    except Exception as e:
+        current_app.logger.error(f"Error getting daily feedback: {str(e)}")
+        return jsonify({"error": "Failed to get daily feedback"}), 500
+
 @api.route('/issues', methods=['POST'])
 def create_issue():
     """Allow citizens to create new issues"""
@@ -182,7 +254,11 @@ def create_issue():
         )
 
         db.session.add(issue)
+        db.session.flush()
+        index_rows('issue', [issue])
+        bump_counters(issue_counters(issue))
         db.session.commit()
+        invalidate_responses('issues', 'dashboard')
 
         current_app.logger.info(f"Issue created successfully: ID {issue.id}")
 
@@ -209,38 +285,56 @@ def create_issue():
         return jsonify({"error": f"Failed to create issue: {str(e)}"}), 500
 
 @api.route('/issues', methods=['GET'])
+@cached_response(15, tags=('issues',))
 def get_issues():
-    """Get issues with optional filtering"""
+    """Get issues newest first, one page at a time, or ranked search results.
+
+    Query parameters: ``status`` (default Open, or ``all``), ``location``,
+    ``per_page`` (default 20, max 100) and ``cursor`` (``next_cursor`` from the
+    previous page). With ``search`` results are ranked and paged by ``page``.
+    Unfiltered totals are approximate, from ``row_counter``; location totals
+    are exact.
+    """
     try:
         location = request.args.get('location')
         search = request.args.get('search')
         status = request.args.get('status', 'Open')
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
 
         current_app.logger.info(f"Fetching issues: location={location}, search={search}, status={status}")
 
         query = Issue.query
 
-        if location:
-            query = query.filter(Issue.location.ilike(f'%{location}%'))
-
+        # Text and location matching go through the search index; a location
+        # alone filters every match rather than the capped ranked ids
         if search:
-            query = query.filter(
-                db.or_(
-                    Issue.title.ilike(f'%{search}%'),
-                    Issue.description.ilike(f'%{search}%')
-                )
-            )
+            matches = search_documents('issue', text=search, location=location)
+            query = query.filter(Issue.id.in_(matches))
+        elif location:
+            query = query.filter(location_filter('issue', location))
 
         if status != 'all':
             query = query.filter(Issue.status == status)
 
-        # Paginate results
-        pagination = query.order_by(Issue.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        issues = pagination.items
+        if search:
+            # Search results in rank order; their number is capped, so OFFSET is bounded
+            page = request.args.get('page', 1, type=int)
+            pagination = RankedPage(query, Issue, matches, page, per_page)
+            issues = pagination.items
+            paging = {'total': pagination.total, 'pages': pagination.pages, 'current_page': page}
+        else:
+            try:
+                issues, next_cursor = keyset_page(query, Issue.created_at, Issue.id,
+                                                  cursor=request.args.get('cursor'), per_page=per_page)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+            if location:
+                # Exact: the index resolves the location, the count covers every match
+                total = query.count()
+            else:
+                total = approximate_count(ISSUE_COUNTER if status == 'all' else issue_status_counter(status))
+            paging = {'next_cursor': next_cursor, 'has_more': next_cursor is not None, 'total': total}
+        counts = feedback_counts(issue.id for issue in issues)
 
         return jsonify({
             'issues': [{
@@ -253,16 +347,24 @@ def get_issues():
                 'priority': issue.priority,
                 'created_at': issue.created_at.isoformat(),
                 'updated_at': issue.updated_at.isoformat(),
-                'feedback_count': UserFeedback.query.filter_by(issue_id=issue.id).count()
+                'feedback_count': counts.get(issue.id, 0)
             } for issue in issues],
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': page
+            'count': len(issues),
+            **paging
         })
     except Exception as e:
         current_app.logger.error(f"Error getting issues: {str(e)}")
         return jsonify({"error": f"Failed to get issues: {str(e)}"}), 500
 
+def feedback_counts(issue_ids):
+    """Feedback rows per issue for a page of issues, in one grouped query"""
+    issue_ids = list(issue_ids)
+    if not issue_ids:
+        return {}
+    return dict(db.session.query(UserFeedback.issue_id, db.func.count())
+                .filter(UserFeedback.issue_id.in_(issue_ids))
+                .group_by(UserFeedback.issue_id).all())
+
 @api.route('/issues/<int:issue_id>', methods=['GET'])
 def get_issue_details(issue_id):
     """Get detailed issue information with feedback"""
@@ -297,6 +399,7 @@ def get_issue_details(issue_id):
         return jsonify({"error": f"Failed to get issue details: {str(e)}"}), 500
 
 @api.route('/scorecards/officials', methods=['GET'])
+@cached_response(60, tags=('officials',))
 def get_officials():
     """Get list of all officials for selection"""
     try:
@@ -342,44 +445,31 @@ def rate_official():
         except ValueError:
             return jsonify({"error": "Invalid score format"}), 400
 
-        # Case-insensitive search with position and constituency matching
-        official = Official.query.filter(
-            db.func.lower(Official.name) == db.func.lower(data['name'].strip()),
-            db.func.lower(Official.position) == db.func.lower(data['position'].strip()),
-            db.func.lower(Official.constituency) == db.func.lower(data['constituency'].strip())
-        ).first()
+        # Case-, accent- and spacing-insensitive match on the indexed lookup key
+        official_id = find_official_id(data['name'], data['position'], data['constituency'])
 
-        if not official:
+        # New rating row plus an O(1) update of the official's aggregates
+        if official_id is None or not record_rating(official_id, score, comment=data.get('comment', ''),
+                                                    user_id=str(data.get('user_id', 'anonymous'))):
+            if official_id is not None:
+                # Deleted by another process since it was cached
+                forget_official_key(official_id)
+                forget_official_suggestions(official_id)
             return jsonify({"error": "Official not found. Please check name and location."}), 404
-
-        # Create new rating
-        rating = {
-            'score': score,
-            'comment': data.get('comment', ''),
-            'timestamp': datetime.utcnow().isoformat(),
-            'user_id': data.get('user_id', 'anonymous')
-        }
-
-        # Update official's ratings
-        if not official.ratings:
-            official.ratings = []
-
-        official.ratings.append(rating)
-
-        # Recalculate average
-        scores = [r['score'] for r in official.ratings]
-        official.average_score = sum(scores) / len(scores)
-        official.rating_count = len(scores)
-        official.last_updated = datetime.utcnow()
-
+        official = db.session.get(Official, official_id, populate_existing=True)
+        add_to_counters(rating_deltas(official, score))
         db.session.commit()
+        invalidate_responses('officials', 'dashboard')
 
+        update_official_rating(official)
+        summary = rating_summary(official)
         return jsonify({
             "status": "success",
             "official_id": official.id,
             "official_name": official.name,
-            "new_average": round(official.average_score, 2),
-            "total_ratings": official.rating_count
+            "new_average": summary['average'],
+            "total_ratings": summary['count'],
+            "distribution": summary['distribution']
         })
     except Exception as e:
         db.session.rollback()
@@ -388,94 +478,66 @@ def rate_official():
 
 @api.route('/scorecards/search', methods=['GET'])
 def search_officials():
-    """Search officials by name (case-insensitive partial match)"""
+    """Typeahead suggestions for officials by name, position or constituency"""
     try:
         name = request.args.get('name', '').strip()
         if not name:
             return jsonify({"error": "Name parameter is required"}), 400
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 20)
 
-        officials = Official.query.filter(
-            Official.name.ilike(f'%{name}%')
-        ).limit(10).all()
-
-        return jsonify([{
-            'id': o.id,
-            'name': o.name,
-            'position': o.position,
-            'constituency': o.constituency,
-            'current_rating': round(o.average_score, 2) if o.average_score else 0
-        } for o in officials])
+        # Ranked prefix/fuzzy matches from the in-memory index
+        return jsonify(suggest_officials(name, limit=limit))
     except Exception as e:
         current_app.logger.error(f"Error searching officials: {str(e)}")
         return jsonify({"error": "Failed to search officials"}), 500
 
 @api.route('/dashboard-data', methods=['GET'])
+@cached_response(30, tags=('dashboard',))
 def get_dashboard_data():
     """Get dashboard data with proper error handling"""
     try:
-        # Get feedback stats
-        feedback_stats = db.session.query(
-            UserFeedback.location,
-            db.func.avg(UserFeedback.sentiment_score).label('avg_sentiment'),
-            db.func.count().label('count')
-        ).filter(UserFeedback.location.isnot(None)).group_by(UserFeedback.location).all()
-
-        # Get active polls
-        active_polls = Poll.query.filter(
-            Poll.expires_at > datetime.utcnow()
-        ).all()
-
-        # Format active polls
-        formatted_active_polls = []
-        for poll in active_polls:
-            options = poll.options if isinstance(poll.options, list) else []
-            total_votes = sum(opt.get('votes', 0) for opt in options if isinstance(opt, dict))
-            formatted_active_polls.append({
-                'id': poll.id,
-                'question': poll.question,
-                'options': options,
-                'total_votes': total_votes
-            })
-
-        # Get recent alerts
-        recent_alerts = Alert.query.order_by(
-            Alert.created_at.desc()
-        ).limit(5).all()
-
-        # Get counts
-        total_users = User.query.count()
-        officials_count = Official.query.count()
-        total_issues = Issue.query.count()
-        total_feedback = UserFeedback.query.count()
+        # Counts and feedback stats from one read of the row counters
+        aggregates = dashboard_aggregates()
 
         return jsonify({
-            "total_users": total_users,
-            "officials_count": officials_count,
-            "total_issues": total_issues,
-            "total_feedback": total_feedback,
+            "total_users": aggregates['total_users'],
+            "officials_count": aggregates['officials_count'],
+            "total_issues": aggregates['total_issues'],
+            "total_feedback": aggregates['total_feedback'],
             "feedback_stats": [
                 {
-                    "location": loc or "Unknown",
-                    "avg_sentiment": float(avg) if avg else 0.0,
-                    "count": cnt
+                    "location": stat['location'],
+                    "avg_sentiment": stat['avg_sentiment'],
+                    "count": stat['count']
                 }
-                for loc, avg, cnt in feedback_stats
+                for stat in aggregates['feedback_stats'] if stat['location'] is not None
+            ],
+            "active_polls": [
+                {
+                    "id": poll['id'],
+                    "question": poll['question'],
+                    "options": poll['options'],
+                    "total_votes": poll['total_votes']
+                }
+                for poll in active_poll_snapshots()
             ],
-            "active_polls": formatted_active_polls,
             "recent_alerts": [
                 {
                     "topic": a.topic,
                     "severity": a.severity,
                     "created_at": a.created_at.isoformat()
                 }
-                for a in recent_alerts
-            ]
+                for a in recent_alerts()
+            ],
+            "updated_at": aggregates['updated_at'],
+            "recounted_at": aggregates['recounted_at']
         })
     except Exception as e:
         current_app.logger.error(f"Error getting dashboard data: {str(e)}")
         return jsonify({"error": "Failed to get dashboard data"}), 500
 
 @api.route('/scorecards/top')
+@cached_response(60, tags=('officials',))
 def get_top_officials():
     """Return the top N officials by average_score (descending)."""
     try:
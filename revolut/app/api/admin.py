@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 from app import db
 from app.models import User, Role, Official, Poll, UserFeedback, Issue, Alert, user_roles
 from app.auth import role_required
+from app.utils.official_lookup import set_lookup_key
 import json
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -201,10 +202,10 @@ def create_official():
             position=data['position'],
             constituency=data['constituency'],
             department=data.get('department'),
-            ratings=[],
             average_score=0.0,
             rating_count=0
         )
+        set_lookup_key(official)
 
         db.session.add(official)
         db.session.commit()
@@ -232,6 +233,7 @@ def update_official(official_id):
             official.constituency = data['constituency']
         if 'department' in data:
             official.department = data['department']
+        set_lookup_key(official)
 
         official.last_updated = datetime.utcnow()
         db.session.commit()
@@ -1,15 +1,30 @@
 # app/api/polls.py - FIXED Poll Management System
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models import Poll, User, UserFeedback
 from app.auth import role_required
+from app.utils.pagination import keyset_page
+from app.utils.poll_dedup import claim_voter, forget_poll, get_voter_index, voter_key_for_request
+from app.utils.poll_results import conditional_json, invalidate_poll, poll_snapshots, with_status
+from app.utils.poll_stream import RETRY_MS, format_event, get_stream_hub
+from app.utils.poll_votes import build_option_rows, load_options, record_vote, upgrade_polls, with_percentages
+from app.utils.response_cache import cached_response
+from app.utils.row_counts import POLL_COUNTER, bump_counters
+from app.utils.vote_buffer import get_vote_buffer
 from datetime import datetime, timedelta
+from sqlalchemy import or_
 import re
+import time
 
 # FIXED: Remove the url_prefix to avoid double /api/polls path
 polls_bp = Blueprint('polls', __name__)
 
+POLL_LIST_FIELDS = ('id', 'question', 'options', 'total_votes', 'expires_at', 'created_at',
+                    'days_remaining', 'is_active')
+POLL_RESULT_FIELDS = ('id', 'question', 'options', 'total_votes', 'expires_at', 'created_at',
+                      'is_active', 'status')
+
 def validate_poll_data(data):
     """Validate poll creation data"""
     errors = []
@@ -48,36 +63,6 @@ def validate_poll_data(data):
 
     return errors
 
-def fix_poll_options_format(poll):
-    """Fix poll options format to ensure they have proper IDs"""
-    if not isinstance(poll.options, list):
-        poll.options = []
-        return poll
-
-    fixed_options = []
-    for i, option in enumerate(poll.options):
-        if isinstance(option, dict):
-            # Ensure the option has an ID
-            if 'id' not in option:
-                option['id'] = i + 1
-            # Ensure it has a votes count
-            if 'votes' not in option:
-                option['votes'] = 0
-            # Ensure it has text
-            if 'text' not in option:
-                option['text'] = f"Option {i + 1}"
-            fixed_options.append(option)
-        elif isinstance(option, str):
-            # Convert string option to dict format
-            fixed_options.append({
-                'id': i + 1,
-                'text': option,
-                'votes': 0
-            })
-
-    poll.options = fixed_options
-    return poll
-
 @polls_bp.route('/api/polls', methods=['POST'])
 @login_required
 @role_required('cso')  # Only CSOs and admins can create polls
@@ -111,9 +96,12 @@ def create_poll():
             created_by=current_user.id,
             expires_at=expires_at
         )
+        poll.option_rows = build_option_rows([option['text'] for option in options])
 
         db.session.add(poll)
+        bump_counters([POLL_COUNTER])
         db.session.commit()
+        invalidate_poll(poll.id)
 
         # Send SMS notifications if requested
         if data.get('notify_citizens', False):
@@ -149,10 +137,6 @@ def vote_on_poll(poll_id):
         data = request.get_json()
         poll = Poll.query.get_or_404(poll_id)
 
-        # Debug logging
-        current_app.logger.info(f"Vote request for poll {poll_id}: {data}")
-        current_app.logger.info(f"Current poll options: {poll.options}")
-
         # Check if poll is still active
         if poll.expires_at and poll.expires_at < datetime.utcnow():
             return jsonify({"error": "Poll has expired"}), 400
@@ -167,61 +151,38 @@ def vote_on_poll(poll_id):
         except (ValueError, TypeError):
             return jsonify({"error": "Invalid option ID format"}), 400
 
-        # Fix poll options format if needed
-        poll = fix_poll_options_format(poll)
-        current_app.logger.info(f"Fixed poll options: {poll.options}")
-
-        # Find the option and increment vote count
-        option_found = False
-        updated_options = []
-
-        for option in poll.options:
-            # Ensure option is a dictionary
-            if not isinstance(option, dict):
-                current_app.logger.warning(f"Skipping invalid option in poll {poll_id}: {option}")
-                continue
-
-            # Create a copy of the option
-            updated_option = option.copy()
-
-            # Check if this is the voted option
-            if updated_option.get('id') == option_id:
-                updated_option['votes'] = updated_option.get('votes', 0) + 1
-                option_found = True
-                current_app.logger.info(f"Vote recorded for option {option_id} in poll {poll_id}")
-
-            updated_options.append(updated_option)
-
-        if not option_found:
+        # Repeat voters this process has seen are turned away without a query
+        voter_key = voter_key_for_request(data)
+        voters = get_voter_index()
+        if voters.seen(poll.id, voter_key):
+            return jsonify({"error": "You have already voted in this poll"}), 409
+
+        # Claim the voter row in every mode, so a repeat vote is refused before
+        # it is acknowledged or streamed. Buffered counts are added in memory
+        # once the claim commits and written by the flusher; otherwise one
+        # atomic counter increment, so concurrent votes can't overwrite each other
+        if not claim_voter(poll.id, voter_key, option_id):
+            voters.add(poll.id, voter_key)
+            return jsonify({"error": "You have already voted in this poll"}), 409
+        buffer = get_vote_buffer()
+        if buffer is not None:
+            recorded = buffer.has_option(poll, option_id)
+        else:
+            recorded = record_vote(poll, option_id)
+        if not recorded:
+            db.session.rollback()
             return jsonify({"error": f"Option {option_id} not found in poll"}), 400
 
-        # Update the poll with new options
-        poll.options = updated_options
-
-        # Use flag_modified to ensure SQLAlchemy detects the change
-        from sqlalchemy.orm.attributes import flag_modified
-        flag_modified(poll, "options")
-
         db.session.commit()
-        current_app.logger.info(f"Poll {poll_id} updated successfully")
+        if buffer is not None:
+            buffer.add(poll, option_id)
+        voters.add(poll.id, voter_key)
+        invalidate_poll(poll.id)
+        get_stream_hub().publish(poll.id, {option_id: 1})
+        current_app.logger.info(f"Vote recorded for option {option_id} in poll {poll_id}")
 
         # Calculate total votes and percentages
-        total_votes = sum(opt.get('votes', 0) for opt in poll.options if isinstance(opt, dict))
-
-        # Add percentages to options for response
-        options_with_percentage = []
-        for option in poll.options:
-            if not isinstance(option, dict):
-                continue
-
-            votes = option.get('votes', 0)
-            percentage = (votes / total_votes * 100) if total_votes > 0 else 0
-            options_with_percentage.append({
-                'id': option.get('id'),
-                'text': option.get('text', ''),
-                'votes': votes,
-                'percentage': round(percentage, 1)
-            })
+        options_with_percentage, total_votes = with_percentages(load_options([poll])[poll.id])
 
         return jsonify({
             "status": "success",
@@ -241,74 +202,42 @@ def vote_on_poll(poll_id):
 
 # FIXED: Show all polls to citizens, not just active ones
 @polls_bp.route('/api/polls', methods=['GET'])
+@cached_response(10, tags=('polls',))
 def get_polls():
-    """Get all polls for citizens"""
+    """Get polls for citizens, newest first, one page at a time.
+
+    Query parameters: ``per_page`` (default 20, max 100), ``status``
+    (``active``, ``expired`` or ``all``) and ``cursor`` (``next_cursor`` from
+    the previous page).
+    """
     try:
-        # Get all polls, ordered by creation date (newest first)
-        all_polls = Poll.query.order_by(Poll.created_at.desc()).all()
-
-        # If no polls exist, return empty response
-        if not all_polls:
-            return jsonify({
-                "polls": [],
-                "count": 0
-            })
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+        status = request.args.get('status', 'all')
+        if status not in ('active', 'expired', 'all'):
+            return jsonify({"error": "status must be one of active, expired, all"}), 400
+
+        now = datetime.utcnow()
+        query = db.session.query(Poll.id, Poll.created_at)
+        if status == 'active':
+            query = query.filter(or_(Poll.expires_at.is_(None), Poll.expires_at > now))
+        elif status == 'expired':
+            query = query.filter(Poll.expires_at <= now)
 
-        polls_data = []
-        for poll in all_polls:
-            try:
-                # Fix poll options format
-                poll = fix_poll_options_format(poll)
-
-                # Calculate total votes
-                total_votes = sum(opt.get('votes', 0) for opt in poll.options if isinstance(opt, dict))
-
-                # Check if poll is still active
-                is_active = True
-                days_remaining = 0
-                if poll.expires_at:
-                    now = datetime.utcnow()
-                    is_active = poll.expires_at > now
-                    if is_active:
-                        days_remaining = (poll.expires_at - now).days
-                    else:
-                        days_remaining = 0
-
-                # Add percentage to each option
-                options_with_percentage = []
-                for option in poll.options:
-                    if not isinstance(option, dict):
-                        continue
-
-                    votes = option.get('votes', 0)
-                    percentage = (votes / total_votes * 100) if total_votes > 0 else 0
-                    options_with_percentage.append({
-                        "id": option.get('id', 0),
-                        "text": option.get('text', ''),
-                        "votes": votes,
-                        "percentage": round(percentage, 1)
-                    })
-
-                poll_data = {
-                    "id": poll.id,
-                    "question": poll.question,
-                    "options": options_with_percentage,
-                    "total_votes": total_votes,
-                    "expires_at": poll.expires_at.isoformat() if poll.expires_at else None,
-                    "created_at": poll.created_at.isoformat() if poll.created_at else None,
-                    "days_remaining": days_remaining,
-                    "is_active": is_active
-                }
-                
-                polls_data.append(poll_data)
-                
-            except Exception as e:
-                current_app.logger.error(f"Error processing poll {poll.id}: {str(e)}")
-                continue
+        try:
+            page, next_cursor = keyset_page(query, Poll.created_at, Poll.id,
+                                            cursor=request.args.get('cursor'), per_page=per_page)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        # Cached result snapshots; only the status is computed here
+        snapshots = poll_snapshots([row.id for row in page])
+        polls_data = [with_status(snapshot, POLL_LIST_FIELDS, now) for snapshot in snapshots]
 
         return jsonify({
             "polls": polls_data,
-            "count": len(polls_data)
+            "count": len(polls_data),
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
         })
 
     except Exception as e:
@@ -325,23 +254,7 @@ def get_poll_details(poll_id):
     try:
         poll = Poll.query.get_or_404(poll_id)
 
-        # Fix poll options format
-        poll = fix_poll_options_format(poll)
-
-        total_votes = sum(opt.get('votes', 0) for opt in poll.options if isinstance(opt, dict))
-
-        # Add percentage to each option
-        options_with_stats = []
-        for option in poll.options:
-            if not isinstance(option, dict):
-                continue
-
-            votes = option.get('votes', 0)
-            percentage = (votes / total_votes * 100) if total_votes > 0 else 0
-            options_with_stats.append({
-                **option,
-                "percentage": round(percentage, 1)
-            })
+        options_with_stats, total_votes = with_percentages(load_options([poll])[poll.id])
 
         # Get creator information
         creator = User.query.get(poll.created_by)
@@ -365,49 +278,68 @@ def get_poll_details(poll_id):
         current_app.logger.error(f"Error fetching poll {poll_id}: {str(e)}")
         return jsonify({"error": "Failed to fetch poll details"}), 500
 
+@polls_bp.route('/api/polls/<int:poll_id>/stream', methods=['GET'])
+def stream_poll(poll_id):
+    """Server-Sent Events stream of vote deltas for one poll.
+
+    Starts with a ``snapshot`` event (full results) unless ``Last-Event-ID``
+    lets the missed deltas be replayed; then one event per vote and a
+    heartbeat comment every ``POLL_STREAM_HEARTBEAT`` seconds. The stream
+    ends after ``POLL_STREAM_MAX_SECONDS`` so it doesn't hold a worker thread
+    for good; EventSource reconnects and resumes from its last event id.
+    """
+    poll = Poll.query.get_or_404(poll_id)
+    hub = get_stream_hub()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription, replay, current_id = hub.subscribe(poll_id, last_event_id)
+    if subscription is None:
+        # Every stream slot in this worker is taken; leave threads for other requests
+        return jsonify({"error": "Too many live result streams, try again shortly"}), 503, \
+            {'Retry-After': str(RETRY_MS // 1000)}
+
+    snapshot = None
+    if replay is None:
+        options, total_votes = with_percentages(load_options([poll])[poll_id])
+        snapshot = {"poll_id": poll_id, "options": options, "total_votes": total_votes}
+    heartbeat = current_app.config['POLL_STREAM_HEARTBEAT']
+    deadline = time.monotonic() + current_app.config['POLL_STREAM_MAX_SECONDS']
+
+    # Runs after the request context is gone, so it must not touch the database
+    def events():
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            if snapshot is not None:
+                yield format_event(snapshot, current_id, event='snapshot')
+            for event_id, data in replay or ():
+                yield format_event(data, event_id)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                event = subscription.get(timeout=min(heartbeat, remaining))
+                if event is None:
+                    if subscription.closed:
+                        return
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_event(event[1], event[0])
+        finally:
+            hub.unsubscribe(subscription)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @polls_bp.route('/api/polls/results', methods=['GET'])
 @login_required
 @role_required('cso')
 def get_poll_results():
     """Get results for all polls (admin/CSO access)"""
     try:
-        # Get all polls (including expired ones)
-        all_polls = Poll.query.order_by(Poll.created_at.desc()).all()
-
-        results = []
-        for poll in all_polls:
-            # Fix poll options format
-            poll = fix_poll_options_format(poll)
-
-            total_votes = sum(opt.get('votes', 0) for opt in poll.options if isinstance(opt, dict))
-
-            # Calculate statistics
-            options_with_stats = []
-            for option in poll.options:
-                if not isinstance(option, dict):
-                    continue
-
-                votes = option.get('votes', 0)
-                percentage = (votes / total_votes * 100) if total_votes > 0 else 0
-                options_with_stats.append({
-                    **option,
-                    "percentage": round(percentage, 1)
-                })
+        # All polls (including expired ones) from the snapshot cache
+        now = datetime.utcnow()
+        results = [with_status(snapshot, POLL_RESULT_FIELDS, now) for snapshot in poll_snapshots()]
 
-            is_active = poll.expires_at > datetime.utcnow() if poll.expires_at else True
-
-            results.append({
-                "id": poll.id,
-                "question": poll.question,
-                "options": options_with_stats,
-                "total_votes": total_votes,
-                "expires_at": poll.expires_at.isoformat() if poll.expires_at else None,
-                "created_at": poll.created_at.isoformat() if poll.created_at else None,
-                "is_active": is_active,
-                "status": "Active" if is_active else "Expired"
-            })
-
-        return jsonify({
+        return conditional_json({
             "polls": results,
             "total_count": len(results),
             "active_count": len([p for p in results if p['is_active']])
@@ -429,8 +361,11 @@ def delete_poll(poll_id):
         if poll.created_by != current_user.id and 'admin' not in current_user.get_role_names():
             return jsonify({"error": "You don't have permission to delete this poll"}), 403
         
+        forget_poll(poll.id)
         db.session.delete(poll)
+        bump_counters([POLL_COUNTER], -1)
         db.session.commit()
+        invalidate_poll(poll_id)
         
         current_app.logger.info(f"Poll {poll_id} deleted by user {current_user.id}")
         
@@ -444,34 +379,20 @@ def delete_poll(poll_id):
         current_app.logger.error(f"Error deleting poll {poll_id}: {str(e)}")
         return jsonify({"error": "Failed to delete poll"}), 500
 
-# Database migration script to fix existing polls
+# Upgrade polls still on the legacy options format (same as `flask polls migrate-options`)
 @polls_bp.route('/api/polls/fix-existing-polls', methods=['POST'])
 @login_required
 @role_required('admin')  # Only admins can run this
 def fix_existing_polls():
-    """Fix existing polls that don't have proper option IDs"""
+    """Upgrade polls below the current options version"""
     try:
-        all_polls = Poll.query.all()
-        fixed_count = 0
-
-        for poll in all_polls:
-            original_options = poll.options
-            poll = fix_poll_options_format(poll)
-
-            # Check if anything changed
-            if poll.options != original_options:
-                from sqlalchemy.orm.attributes import flag_modified
-                flag_modified(poll, "options")
-                fixed_count += 1
-                current_app.logger.info(f"Fixed poll {poll.id}: {poll.options}")
-
-        if fixed_count > 0:
-            db.session.commit()
+        fixed_count = upgrade_polls()
+        invalidate_poll()
 
         return jsonify({
             "status": "success",
             "message": f"Fixed {fixed_count} polls",
-            "total_polls": len(all_polls),
+            "total_polls": Poll.query.count(),
             "fixed_polls": fixed_count
         })
 
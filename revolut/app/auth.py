@@ -4,6 +4,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from app.models import User, Role
+from app.utils.row_counts import USER_COUNTER, bump_counters
 from functools import wraps
 from datetime import datetime
 import re
@@ -178,6 +179,7 @@ def handle_register():
 
         # Save to database
         db.session.add(user)
+        bump_counters([USER_COUNTER])
         db.session.commit()
 
         print(f"User created: {user.username}, Password hash: {user.password_hash[:20]}...")
@@ -0,0 +1,197 @@
+# app/cli.py - Flask CLI commands (flask counts ..., flask nlp ..., flask officials ..., flask polls ..., flask search ...)
+import click
+from flask.cli import AppGroup
+
+counts_cli = AppGroup('counts', help='Listing total and dashboard counter commands.')
+nlp_cli = AppGroup('nlp', help='Feedback NLP processing commands.')
+officials_cli = AppGroup('officials', help='Official scorecard commands.')
+polls_cli = AppGroup('polls', help='Poll maintenance commands.')
+search_cli = AppGroup('search', help='Full-text search index commands.')
+
+
+@counts_cli.command('recount')
+def recount_command():
+    """Recompute the listing totals and dashboard aggregates exactly."""
+    from app import db
+    from app.utils.response_cache import invalidate_responses
+    from app.utils.row_counts import recount
+
+    counts = recount()
+    db.session.commit()
+    invalidate_responses('dashboard')
+    for name, (count, total) in sorted(counts.items()):
+        click.echo(f"{name}: {count}" + (f" (sum {total:g})" if total else ''))
+
+
+@nlp_cli.command('worker')
+@click.option('--worker-id', default=None, help='Name reported in claims (defaults to host:pid).')
+@click.option('--batch-size', type=int, default=None, help='Rows claimed per batch.')
+@click.option('--poll-interval', type=float, default=None, help='Seconds to sleep when the queue is empty.')
+@click.option('--once', is_flag=True, help='Process a single batch and exit.')
+def worker_command(worker_id, batch_size, poll_interval, once):
+    """Process unprocessed feedback in the background."""
+    from app.utils.nlp_queue import run_worker
+
+    total = run_worker(worker_id=worker_id, batch_size=batch_size,
+                       poll_interval=poll_interval, once=once)
+    if once:
+        click.echo(f"Processed {total} feedback rows")
+
+
+@nlp_cli.command('stats')
+def stats_command():
+    """Show NLP queue depth."""
+    from app.utils.nlp_queue import queue_stats
+
+    for name, count in queue_stats().items():
+        click.echo(f"{name}: {count}")
+
+
+@nlp_cli.command('requeue')
+@click.argument('feedback_ids', nargs=-1, type=int)
+def requeue_command(feedback_ids):
+    """Retry quarantined feedback (all of it unless IDs are given)."""
+    from app.utils.nlp_queue import requeue_quarantined
+
+    released = requeue_quarantined(list(feedback_ids))
+    click.echo(f"Requeued {released} quarantined feedback rows")
+
+
+@nlp_cli.command('warmup')
+def warmup_command():
+    """Load the NLP processor and report load time and memory."""
+    from app.utils.nlp_processor import warm_up
+
+    report = warm_up()
+    click.echo(f"Warmed up in {report['seconds'] * 1000:.1f} ms (pid {report['pid']})")
+    if report.get('rss_delta_kb') is not None:
+        click.echo(f"Resident memory: {report['rss_after_kb'] / 1024:.1f} MB "
+                   f"(+{report['rss_delta_kb'] / 1024:.1f} MB)")
+
+
+@nlp_cli.command('backfill')
+@click.option('--workers', type=int, default=None, help='Scoring processes (defaults to CPU count).')
+@click.option('--chunk-size', type=int, default=500, show_default=True, help='Rows per chunk and per commit.')
+@click.option('--all', 'rescore_all', is_flag=True, help='Re-score processed feedback too.')
+def backfill_command(workers, chunk_size, rescore_all):
+    """Score feedback in bulk with a process pool."""
+    from app.models import UserFeedback
+    from app.utils.nlp_backfill import backfill
+
+    query = UserFeedback.query
+    if not rescore_all:
+        query = query.filter(UserFeedback.is_processed == False)  # noqa: E712
+    total = query.count()
+    click.echo(f"Backfilling {total} feedback rows")
+
+    def progress(stats):
+        click.echo(f"  {stats['processed'] + stats['failed']}/{total} rows, "
+                   f"{stats['rows_per_sec']:.0f} rows/sec, {stats['failed']} failed")
+
+    stats = backfill(query=query, workers=workers, chunk_size=chunk_size, progress=progress)
+    click.echo(f"Done: {stats['processed']} processed, {stats['failed']} failed in "
+               f"{stats['elapsed']:.1f}s with {stats['workers']} workers "
+               f"({stats['rows_per_sec']:.0f} rows/sec)")
+
+
+@nlp_cli.command('cache')
+@click.option('--purge-stale', is_flag=True, help='Delete persisted results from older keyword tables.')
+def cache_command(purge_stale):
+    """Show persisted NLP result cache size."""
+    from app.utils.nlp_cache import persisted_stats, purge_stale as purge
+    from app.utils.nlp_processor import get_processor
+
+    fingerprint = get_processor().fingerprint
+    if purge_stale:
+        click.echo(f"Purged {purge(fingerprint)} stale cached results")
+    counts = persisted_stats(fingerprint)
+    click.echo(f"fingerprint: {fingerprint}")
+    click.echo(f"current: {counts['current']}")
+    click.echo(f"stale: {counts['stale']}")
+
+
+@nlp_cli.command('trends')
+@click.option('--rebuild', is_flag=True, help='Recount trend buckets for the retention window from feedback.')
+@click.option('--prune', is_flag=True, help='Delete buckets older than TRENDING_RETENTION_HOURS.')
+def trends_command(rebuild, prune):
+    """Show tag counts for the trending window."""
+    from flask import current_app
+    from app import db
+    from app.utils.trends import prune_buckets, rebuild_buckets, tag_counts
+
+    if rebuild:
+        rebuild_buckets(current_app.config['TRENDING_RETENTION_HOURS'])
+        click.echo("Rebuilt trend buckets")
+    if prune:
+        deleted = prune_buckets(current_app.config['TRENDING_RETENTION_HOURS'])
+        db.session.commit()
+        click.echo(f"Pruned {deleted} old trend buckets")
+
+    window = current_app.config['TRENDING_WINDOW_HOURS']
+    threshold = current_app.config['TRENDING_THRESHOLD']
+    click.echo(f"Last {window}h (alert threshold {threshold}):")
+    for tag, count in sorted(tag_counts(window).items(), key=lambda item: -item[1]):
+        click.echo(f"  {tag}: {count}")
+
+
+@nlp_cli.command('rollup')
+@click.option('--rebuild', is_flag=True, help='Recount the daily rollup from processed feedback.')
+@click.option('--days', type=int, default=None, help='Only rebuild and show the last N days.')
+def rollup_command(rebuild, days):
+    """Show daily feedback counts and average sentiment."""
+    from app import db
+    from app.utils.feedback_rollup import daily_series, last_days, rebuild_rollup
+
+    if rebuild:
+        counted = rebuild_rollup(days)
+        db.session.commit()
+        click.echo(f"Rebuilt the daily rollup from {counted} processed feedback rows")
+
+    for day in daily_series(*last_days(days or 7)):
+        click.echo(f"  {day['date']}: {day['count']} (avg sentiment {day['avg_sentiment']:.2f})")
+
+
+@officials_cli.command('typeahead')
+@click.argument('query', required=False)
+def typeahead_command(query):
+    """Build the official typeahead index and report its size; optionally try a QUERY."""
+    from app.utils.official_typeahead import get_official_typeahead
+
+    index = get_official_typeahead()
+    stats = index.stats()
+    click.echo(f"{stats['officials']} officials indexed in {stats['build_ms']:.1f} ms")
+    click.echo(f"{stats['words']} words, {stats['postings']} postings, {stats['fuzzy_keys']} fuzzy keys, "
+               f"{stats['bytes'] / 1024:.1f} KB")
+    if query:
+        for suggestion in index.suggest(query):
+            click.echo(f"  {suggestion['name']} ({suggestion['position']}, {suggestion['constituency']})")
+
+
+@polls_cli.command('migrate-options')
+@click.option('--batch-size', type=int, default=500, show_default=True, help='Polls per commit.')
+def migrate_options_command(batch_size):
+    """Upgrade legacy poll options to the current format (resumable)."""
+    from app.models import POLL_OPTIONS_VERSION, Poll
+    from app.utils.poll_votes import upgrade_polls
+
+    pending = Poll.query.filter(Poll.options_version < POLL_OPTIONS_VERSION).count()
+    click.echo(f"Upgrading {pending} polls to options version {POLL_OPTIONS_VERSION}")
+    upgraded = upgrade_polls(batch_size=batch_size,
+                             progress=lambda done: click.echo(f"  {done}/{pending} polls"))
+    click.echo(f"Done: {upgraded} polls upgraded")
+
+
+@search_cli.command('rebuild')
+@click.option('--type', 'doc_type', type=click.Choice(['issue', 'feedback']), default=None,
+              help='Only rebuild one document type.')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Rows per commit.')
+@click.option('--if-empty', is_flag=True, help='Only fill document types with nothing indexed yet.')
+def search_rebuild_command(doc_type, batch_size, if_empty):
+    """Index every issue and feedback row from scratch."""
+    from app.utils.search import get_search_backend, rebuild_index
+
+    click.echo(f"Rebuilding the {get_search_backend().name} search index")
+    counts = rebuild_index(doc_type, batch_size=batch_size, if_empty=if_empty,
+                           progress=lambda name, done: click.echo(f"  {name}: {done} rows"))
+    for name, count in counts.items():
+        click.echo(f"Done: {count} {name} rows indexed")
@@ -1,6 +1,7 @@
 # init_db.py - Run this script to initialize your database
 from app import create_app, db
 from app.models import User, Role, Official
+from app.utils.official_lookup import set_lookup_key
 from werkzeug.security import generate_password_hash
 
 def init_database():
@@ -67,7 +68,6 @@ def init_database():
                 'position': 'Governor',
                 'constituency': 'Nairobi County',
                 'department': 'County Government',
-                'ratings': [],
                 'average_score': 0.0,
                 'rating_count': 0
             },
@@ -76,7 +76,6 @@ def init_database():
                 'position': 'MP',
                 'constituency': 'Westlands',
                 'department': 'Parliament',
-                'ratings': [],
                 'average_score': 0.0,
                 'rating_count': 0
             },
@@ -85,7 +84,6 @@ def init_database():
                 'position': 'Senator',
                 'constituency': 'Kisumu County',
                 'department': 'Senate',
-                'ratings': [],
                 'average_score': 0.0,
                 'rating_count': 0
             }
@@ -98,6 +96,7 @@ def init_database():
             ).first()
             if not official:
                 official = Official(**official_data)
+                set_lookup_key(official)
                 db.session.add(official)
                 print(f"Created official: {official_data['name']}")
 
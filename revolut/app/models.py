@@ -2,7 +2,7 @@ from app import db
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from sqlalchemy import JSON
+from sqlalchemy import DDL, JSON, event
 
 # Association table for many-to-many roles
 user_roles = db.Table('user_roles',
@@ -71,6 +71,93 @@ class UserFeedback(db.Model):
     is_processed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Lets the NLP worker find unprocessed rows without scanning the table
+        db.Index('ix_user_feedback_is_processed_id', 'is_processed', 'id'),
+        # Per-issue feedback counts and the issue detail page
+        db.Index('ix_user_feedback_issue_id', 'issue_id'),
+        # Keyset pagination of the feedback listing, newest first
+        db.Index('ix_user_feedback_created_at_id', 'created_at', 'id'),
+    )
+
+# Sentiment filters of the feedback listing. The bounds are SQL literals so the
+# partial indexes below match the query predicates exactly.
+SENTIMENT_BANDS = {
+    'positive': UserFeedback.sentiment_score > db.literal_column('0.1'),
+    'negative': UserFeedback.sentiment_score < db.literal_column('-0.1'),
+    'neutral': UserFeedback.sentiment_score.between(db.literal_column('-0.1'), db.literal_column('0.1')),
+}
+for _band, _predicate in SENTIMENT_BANDS.items():
+    db.Index(f'ix_user_feedback_{_band}_created_at_id', UserFeedback.created_at, UserFeedback.id,
+             sqlite_where=_predicate, postgresql_where=_predicate)
+del _band, _predicate
+
+class NLPTask(db.Model):
+    """Claim/retry bookkeeping for the background NLP worker.
+
+    A row only exists while a feedback item is claimed by a worker, waiting
+    for a retry or quarantined, so submitting feedback never writes here.
+    """
+    __tablename__ = 'nlp_task'
+
+    feedback_id = db.Column(db.Integer, db.ForeignKey('user_feedback.id', ondelete='CASCADE'), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='claimed')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    claim_token = db.Column(db.String(32), index=True)
+    worker_id = db.Column(db.String(100))
+    claimed_at = db.Column(db.DateTime)
+    available_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class NLPResultCache(db.Model):
+    """Persisted NLP results keyed by a hash of the normalised message text.
+
+    ``key`` also covers the keyword-table fingerprint, so rows written before
+    the tables changed are never read again and can be purged.
+    """
+    __tablename__ = 'nlp_result_cache'
+
+    key = db.Column(db.String(64), primary_key=True)
+    fingerprint = db.Column(db.String(16), nullable=False, index=True)
+    sentiment_score = db.Column(db.Float)
+    tags = db.Column(JSON)
+    location = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TrendBucket(db.Model):
+    """Processed feedback counts per tag, hour and location.
+
+    Maintained by the NLP batch write path so trend checks read a handful of
+    counters instead of scanning feedback. ``location`` is '' when unknown.
+    """
+    __tablename__ = 'trend_bucket'
+
+    tag = db.Column(db.String(50), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    location = db.Column(db.String(100), primary_key=True, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_trend_bucket_bucket_tag', 'bucket', 'tag'),
+    )
+
+class FeedbackDaily(db.Model):
+    """Processed feedback count and sentiment sum per day, location and category.
+
+    Maintained by the NLP batch write path so sentiment time series read one
+    row per day instead of scanning feedback. A row counts under each of its
+    tags and once under the ``'*'`` category, the day's total; ``location``
+    and ``category`` are '' when unknown.
+    """
+    __tablename__ = 'feedback_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    location = db.Column(db.String(100), primary_key=True, default='')
+    category = db.Column(db.String(50), primary_key=True, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    sum_sentiment = db.Column(db.Float, nullable=False, default=0.0)
+
 class Issue(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -87,25 +174,146 @@ class Issue(db.Model):
     # Relationship to feedback
     feedback = db.relationship('UserFeedback', backref='related_issue', lazy=True)
 
+    __table_args__ = (
+        # Keyset pagination of the issue listing, with and without a status filter
+        db.Index('ix_issue_created_at_id', 'created_at', 'id'),
+        db.Index('ix_issue_status_created_at_id', 'status', 'created_at', 'id'),
+    )
+
+class RowCounter(db.Model):
+    """Approximate row counts and sums for listing totals and dashboards, split over shards.
+
+    Inserts bump a random shard so concurrent writers rarely wait on the
+    same row; a count is the sum of its shards. See app.utils.row_counts.
+    """
+    __tablename__ = 'row_counter'
+
+    name = db.Column(db.String(100), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, default=0)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    updated_at = db.Column(db.DateTime)
+
+# Full-text search index tables written by app.utils.search. They are not
+# models: SQLite gets FTS5 virtual tables (rowid = row id), PostgreSQL one
+# table with a weighted tsvector per document.
+SEARCH_TABLES = ('issue_search', 'feedback_search', 'search_document')
+SEARCH_FTS5_COLUMNS = {'issue_search': 'title, description, location', 'feedback_search': 'content, location'}
+
+
+def _fts5_available(ddl, target, bind, **kw):
+    return bool(bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+for _table, _search_table in ((Issue.__table__, 'issue_search'), (UserFeedback.__table__, 'feedback_search')):
+    event.listen(_table, 'after_create', DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {_search_table} "
+        f"USING fts5({SEARCH_FTS5_COLUMNS[_search_table]}, tokenize='unicode61 remove_diacritics 2')"
+    ).execute_if(dialect='sqlite', callable_=_fts5_available))
+    event.listen(_table, 'before_drop', DDL(f"DROP TABLE IF EXISTS {_search_table}").execute_if(dialect='sqlite'))
+
+event.listen(Issue.__table__, 'after_create', DDL(
+    "CREATE TABLE IF NOT EXISTS search_document (doc_type VARCHAR(20) NOT NULL, doc_id INTEGER NOT NULL, "
+    "vector TSVECTOR NOT NULL, PRIMARY KEY (doc_type, doc_id))"
+).execute_if(dialect='postgresql'))
+event.listen(Issue.__table__, 'after_create', DDL(
+    "CREATE INDEX IF NOT EXISTS ix_search_document_vector ON search_document USING gin (vector)"
+).execute_if(dialect='postgresql'))
+event.listen(Issue.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS search_document").execute_if(dialect='postgresql'))
+
 class Official(db.Model):
+    """An official and running aggregates of their ``OfficialRating`` rows.
+
+    ``rating_count``, ``rating_sum``, ``rating_sum_sq`` and the ``score_<n>``
+    histogram are bumped by one UPDATE per rating, so the average, spread and
+    distribution never need the individual ratings.
+    """
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     position = db.Column(db.String(100), nullable=False)
     constituency = db.Column(db.String(100), nullable=False)
     department = db.Column(db.String(100))
-    ratings = db.Column(JSON)
+    # Normalised "name|position|constituency" for rating lookups; see official_lookup
+    lookup_key = db.Column(db.String(320), index=True)
     average_score = db.Column(db.Float)
     rating_count = db.Column(db.Integer, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum_sq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    score_1 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    score_2 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    score_3 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    score_4 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    score_5 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
 
+class OfficialRating(db.Model):
+    """One scorecard rating (1-5) of an official"""
+    __tablename__ = 'official_rating'
+
+    id = db.Column(db.Integer, primary_key=True)
+    official_id = db.Column(db.Integer, db.ForeignKey('official.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.SmallInteger, nullable=False)
+    comment = db.Column(db.Text)
+    user_id = db.Column(db.String(50), default='anonymous')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_official_rating_official_id_created_at', 'official_id', 'created_at'),
+    )
+
+# Poll.options_version: 1 = legacy JSON options that may need normalising,
+# 2 = normalised JSON with vote counts in poll_option rows
+POLL_OPTIONS_VERSION = 2
+
 class Poll(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.Text, nullable=False)
     options = db.Column(JSON, nullable=False)
+    options_version = db.Column(db.Integer, nullable=False, default=POLL_OPTIONS_VERSION, server_default='1')
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     expires_at = db.Column(db.DateTime)
     user = db.relationship('User', backref=db.backref('polls', lazy='dynamic'))
+    option_rows = db.relationship('PollOption', order_by='PollOption.option_id',
+                                  cascade='all, delete-orphan')
+
+    __table_args__ = (
+        # Keyset pagination of GET /api/polls
+        db.Index('ix_poll_created_at_id', 'created_at', 'id'),
+    )
+
+class PollOption(db.Model):
+    """One poll option and its vote counter.
+
+    Votes are counted with ``UPDATE ... SET votes = votes + 1`` on this row, so
+    concurrent votes never overwrite each other. ``Poll.options`` keeps the
+    option definitions; its ``votes`` values are no longer maintained.
+    """
+    __tablename__ = 'poll_option'
+
+    id = db.Column(db.Integer, primary_key=True)
+    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id', ondelete='CASCADE'), nullable=False)
+    option_id = db.Column(db.Integer, nullable=False)
+    text = db.Column(db.String(500), nullable=False)
+    votes = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('poll_id', 'option_id', name='uq_poll_option_poll_id_option_id'),
+    )
+
+class PollVoter(db.Model):
+    """Who has voted in a poll.
+
+    The ``(poll_id, voter_key)`` primary key is the unique index that stops
+    repeat votes: a vote only counts if its row can be inserted. The key is
+    ``user:<id>``, ``phone:<digits>`` or ``session:<token>``.
+    """
+    __tablename__ = 'poll_voter'
+
+    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id', ondelete='CASCADE'), primary_key=True)
+    voter_key = db.Column(db.String(64), primary_key=True)
+    option_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Alert(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -114,4 +322,7 @@ class Alert(db.Model):
     affected_locations = db.Column(JSON)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set by automatic alerts so every process raises each one at most once;
+    # NULL (allowed repeatedly) for alerts created by hand
+    dedup_key = db.Column(db.String(255), index=True, unique=True)
     user = db.relationship('User', backref=db.backref('alerts', lazy='dynamic'))
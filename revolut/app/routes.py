@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify,Response,current_app, session, redirect, url_for
 from flask_login import login_required, current_user
 from app.auth import role_required
+from app.utils.response_cache import cached_response
 from app import db
 import logging
 from flask_babel import gettext, ngettext
@@ -37,54 +38,30 @@ def scorecards():
     return render_template('scorecards.html')
 
 @main.route('/api/dashboard-data')
+@cached_response(30, tags=('dashboard',))
 def dashboard_data():
     """Get dashboard data"""
-    from app.models import Poll, UserFeedback, Issue, Official, User
-    from datetime import datetime
+    from app.utils.dashboard import active_poll_snapshots, dashboard_aggregates, recent_alerts
 
     try:
-        # Get basic statistics
-        total_users = User.query.count()
-        total_polls = Poll.query.count()
-        active_polls = Poll.query.filter(Poll.expires_at > datetime.utcnow()).all()
-        total_feedback = UserFeedback.query.count()
-        total_issues = Issue.query.count()
-        total_officials = Official.query.count()
-
-        # Get feedback stats by location
-        feedback_stats = db.session.query(
-            UserFeedback.location,
-            db.func.avg(UserFeedback.sentiment_score).label('avg_sentiment'),
-            db.func.count().label('count')
-        ).filter(UserFeedback.location.isnot(None)).group_by(UserFeedback.location).all()
-
-        # Format feedback stats
-        formatted_feedback_stats = []
-        for location, avg_sentiment, count in feedback_stats:
-            formatted_feedback_stats.append({
-                'location': location,
-                'avg_sentiment': float(avg_sentiment) if avg_sentiment else 0.0,
-                'count': count
-            })
+        # Every count and average comes from one read of the row counters
+        aggregates = dashboard_aggregates()
 
         # Format active polls with vote counts
         formatted_active_polls = []
-        for poll in active_polls:
-            total_votes = sum(opt.get('votes', 0) for opt in poll.options if isinstance(opt, dict))
+        for poll in active_poll_snapshots():
             formatted_active_polls.append({
-                'id': poll.id,
-                'question': poll.question,
-                'options': poll.options,
-                'total_votes': total_votes,
-                'expires_at': poll.expires_at.isoformat(),
-                'created_at': poll.created_at.isoformat()
+                'id': poll['id'],
+                'question': poll['question'],
+                'options': poll['options'],
+                'total_votes': poll['total_votes'],
+                'expires_at': poll['expires_at'].isoformat() if poll['expires_at'] else None,
+                'created_at': poll['created_at'].isoformat() if poll['created_at'] else None
             })
 
         # Get recent alerts
-        from app.models import Alert
-        recent_alerts = Alert.query.order_by(Alert.created_at.desc()).limit(5).all()
         formatted_alerts = []
-        for alert in recent_alerts:
+        for alert in recent_alerts():
             formatted_alerts.append({
                 'topic': alert.topic,
                 'severity': alert.severity,
@@ -92,69 +69,35 @@ def dashboard_data():
                 'created_at': alert.created_at.isoformat()
             })
 
-        # Calculate positive sentiment percentage
-        positive_count = UserFeedback.query.filter(UserFeedback.sentiment_score > 0.3).count()
-        positive_sentiment = int((positive_count / total_feedback) * 100) if total_feedback > 0 else 0
-
-        # Get active issues count
-        active_issues = Issue.query.filter_by(status='Open').count()
-
-        # Calculate average official rating
-        avg_rating = db.session.query(db.func.avg(Official.average_score)).scalar() or 0.0
-
-        # Prepare sentiment chart data (last 7 days)
-        from datetime import datetime, timedelta
-        sentiment_data = []
-        sentiment_labels = []
-        for i in range(7, 0, -1):
-            day = datetime.utcnow() - timedelta(days=i)
-            day_str = day.strftime('%Y-%m-%d')
-            sentiment_labels.append(day_str)
-
-            # Get average sentiment for this day
-            day_sentiment = db.session.query(
-                db.func.avg(UserFeedback.sentiment_score)
-            ).filter(
-                db.func.date(UserFeedback.created_at) == day.date()
-            ).scalar() or 0
-
-            sentiment_data.append(float(day_sentiment))
-
-        # Prepare issue categories data
-        issue_categories = db.session.query(
-            Issue.category, db.func.count().label('count')
-        ).group_by(Issue.category).all()
-
-        issue_labels = [category for category, _ in issue_categories]
-        issue_data = [count for _, count in issue_categories]
-
         return jsonify({
-            'total_users': total_users,
-            'total_polls': total_polls,
+            'total_users': aggregates['total_users'],
+            'total_polls': aggregates['total_polls'],
             'polls': formatted_active_polls,
-            'total_feedback': total_feedback,
-            'total_issues': total_issues,
-            'officials_count': total_officials,
-            'feedback_stats': formatted_feedback_stats,
+            'total_feedback': aggregates['total_feedback'],
+            'total_issues': aggregates['total_issues'],
+            'officials_count': aggregates['officials_count'],
+            'feedback_stats': [stat for stat in aggregates['feedback_stats'] if stat['location'] is not None],
             'alerts': formatted_alerts,
             'stats': {
-                'total_polls': total_polls,
-                'total_feedback': total_feedback,
-                'active_issues': active_issues,
-                'positive_sentiment': positive_sentiment,
-                'avg_rating': float(avg_rating)
+                'total_polls': aggregates['total_polls'],
+                'total_feedback': aggregates['total_feedback'],
+                'active_issues': aggregates['active_issues'],
+                'positive_sentiment': aggregates['positive_sentiment'],
+                'avg_rating': aggregates['avg_rating']
             },
             'charts': {
                 'sentiment': {
-                    'labels': sentiment_labels,
-                    'data': sentiment_data
+                    'labels': [day for day, _ in aggregates['sentiment_days']],
+                    'data': [average for _, average in aggregates['sentiment_days']]
                 },
                 'issues': {
-                    'labels': issue_labels,
-                    'data': issue_data
+                    'labels': [category for category, _ in aggregates['issue_categories']],
+                    'data': [count for _, count in aggregates['issue_categories']]
                 }
             },
-            'recent_activity': []
+            'recent_activity': [],
+            'updated_at': aggregates['updated_at'],
+            'recounted_at': aggregates['recounted_at']
         })
     except Exception as e:
         logger.error(f"Dashboard data error: {str(e)}")
@@ -29,8 +29,17 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
 
-    function loadPolls() {
-        fetch('/api/polls')
+    // Polls are fetched a page at a time; "Load more" follows next_cursor
+    const POLLS_PER_PAGE = 10;
+
+    function loadPolls(cursor) {
+        const params = new URLSearchParams({ status: 'active', per_page: POLLS_PER_PAGE });
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+
+        // Revalidate with the ETag every time; unchanged results come back as a 304
+        fetch(`/api/polls?${params}`, { cache: 'no-cache' })
             .then(response => {
                 if (!response.ok) {
                     throw new Error(`HTTP error! status: ${response.status}`);
@@ -39,7 +48,7 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .then(data => {
                 console.log('Polls data loaded:', data);
-                updatePolls(data.polls || []);
+                updatePolls(data.polls || [], Boolean(cursor), data.next_cursor);
             })
             .catch(error => {
                 console.error('Error loading polls:', error);
@@ -113,16 +122,21 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    function updatePolls(polls) {
+    function updatePolls(polls, append, nextCursor) {
         const pollsContainer = document.getElementById('polls-container');
         if (!pollsContainer) return;
 
-        if (!polls || polls.length === 0) {
+        const loadMore = document.getElementById('polls-load-more');
+        if (loadMore) {
+            loadMore.remove();
+        }
+
+        if (!append && (!polls || polls.length === 0)) {
             pollsContainer.innerHTML = '<div class="alert alert-info">No active polls available</div>';
             return;
         }
 
-        pollsContainer.innerHTML = polls.map(poll => {
+        const cards = polls.map(poll => {
             const totalVotes = poll.total_votes || 0;
             return `
                 <div class="card mb-3" id="poll-${poll.id}">
@@ -165,6 +179,18 @@ document.addEventListener('DOMContentLoaded', function() {
                 </div>
             `;
         }).join('');
+
+        if (append) {
+            pollsContainer.insertAdjacentHTML('beforeend', cards);
+        } else {
+            pollsContainer.innerHTML = cards;
+        }
+
+        if (nextCursor) {
+            pollsContainer.insertAdjacentHTML('beforeend',
+                '<button class="btn btn-outline-secondary btn-sm w-100" id="polls-load-more">Load more polls</button>');
+            document.getElementById('polls-load-more').addEventListener('click', () => loadPolls(nextCursor));
+        }
     }
 
     function updateAlerts(alerts) {
@@ -1,36 +1,36 @@
 from app import db
-from app.models import UserFeedback, Alert
-from datetime import datetime, timedelta
-from collections import Counter
+from app.models import Alert
+from app.utils.trends import tag_counts, tag_locations
+from flask import current_app
 
-def check_for_trending_issues():
-    # Check feedback from last 24 hours
-    time_threshold = datetime.utcnow() - timedelta(hours=24)
-    recent_feedback = UserFeedback.query.filter(
-        UserFeedback.created_at >= time_threshold,
-        UserFeedback.is_processed == True
-    ).all()
 
-    # Count tags
-    tag_counter = Counter()
-    for feedback in recent_feedback:
-        if feedback.tags:
-            tag_counter.update(feedback.tags)
+def check_for_trending_issues(threshold=None, window_hours=None):
+    """Raise an alert for each tag seen at least ``threshold`` times in the window.
 
-    # Check for tags that appear more than threshold (e.g., 10 times)
-    trending_tags = [tag for tag, count in tag_counter.items() if count >= 10]
+    Counts come from the hourly trend buckets kept by the NLP worker, so the
+    check costs the same however much feedback arrived. Returns the new alerts.
+    """
+    if threshold is None:
+        threshold = current_app.config['TRENDING_THRESHOLD']
+    if window_hours is None:
+        window_hours = current_app.config['TRENDING_WINDOW_HOURS']
 
-    for tag in trending_tags:
-        # Check if alert already exists
-        existing_alert = Alert.query.filter_by(topic=tag).first()
-        if not existing_alert:
-            # Get affected locations
-            locations = [f.location for f in recent_feedback
-                        if tag in f.tags and f.location]
-            alert = Alert(
-                topic=tag,
-                severity='medium',
-                affected_locations=list(set(locations)))
-            db.session.add(alert)
+    trending_tags = tag_counts(window_hours, min_count=threshold)
+    if not trending_tags:
+        return []
 
-    db.session.commit()
\ No newline at end of file
+    # One query for the topics that already have an alert
+    existing = {topic for (topic,) in db.session.query(Alert.topic).filter(
+        Alert.topic.in_(list(trending_tags))
+    ).distinct()}
+    new_tags = [tag for tag in trending_tags if tag not in existing]
+    if not new_tags:
+        return []
+
+    # Get affected locations
+    locations = tag_locations(new_tags, window_hours)
+    alerts = [Alert(topic=tag, severity='medium', affected_locations=locations[tag])
+              for tag in new_tags]
+    db.session.add_all(alerts)
+    db.session.commit()
+    return alerts
@@ -0,0 +1,238 @@
+# app/utils/anomaly.py - Per-location streaming anomaly detection for alerts
+"""Rolling hourly baselines per ``(tag, location)``.
+
+Each key keeps an exponentially weighted mean and variance of its hourly
+feedback count (``Baseline``, six slots, a couple of hundred bytes with the
+dict entry, so tens of thousands of keys fit in a few MB). When a batch is
+written the worker passes the trend-bucket deltas it just applied; the
+detector reads the current hour's totals for the touched keys in one query,
+so every worker sees the combined counts, and compares them with the
+baseline. A count far enough above its own baseline raises an ``Alert`` whose
+severity grows with the deviation, which is quiet for busy places like
+Nairobi and still sensitive for small wards.
+
+Baselines are kept in memory and seeded from ``trend_bucket`` history the
+first time a key is seen, so a restarted worker picks up where it left off.
+Each alert carries a ``dedup_key`` of its tag, location and hour under a
+unique index, so however many workers (or restarts) flag the same hour only
+the first insert lands.
+"""
+import logging
+import math
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Alert, TrendBucket
+from app.utils.db_helpers import dialect_insert
+from app.utils.trends import hour_bucket
+
+logger = logging.getLogger(__name__)
+
+# Gaps longer than this are treated as this many empty hours
+MAX_GAP_HOURS = 24 * 7
+
+
+class Baseline:
+    """EWMA of one key's hourly counts plus the hour currently being filled"""
+    __slots__ = ('mean', 'var', 'samples', 'bucket', 'count', 'alerted')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.samples = 0
+        self.bucket = None
+        self.count = 0
+        self.alerted = None
+
+    def fold(self, value, alpha):
+        """Add one completed hour to the running mean and variance"""
+        diff = value - self.mean
+        increment = alpha * diff
+        self.mean += increment
+        self.var = (1 - alpha) * (self.var + diff * increment)
+        self.samples += 1
+
+    def advance(self, bucket, alpha):
+        """Close the current hour (and any empty hours) before ``bucket``"""
+        if self.bucket is not None and bucket > self.bucket:
+            self.fold(self.count, alpha)
+            gap = int((bucket - self.bucket).total_seconds() // 3600) - 1
+            for _ in range(min(gap, MAX_GAP_HOURS)):
+                self.fold(0, alpha)
+            self.count = 0
+        if self.bucket is None or bucket > self.bucket:
+            self.bucket = bucket
+
+
+class AnomalyDetector:
+    def __init__(self, alpha=0.1, z_threshold=3.0, min_count=5, min_samples=24, history_hours=168):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_count = min_count
+        self.min_samples = min_samples
+        self.history_hours = history_hours
+        self.baselines = {}
+        self._lock = threading.Lock()
+
+    def score(self, baseline):
+        """z-score of the current hour; the spread never drops below Poisson noise"""
+        spread = math.sqrt(max(baseline.var, baseline.mean, 1.0))
+        return (baseline.count - baseline.mean) / spread
+
+    def severity(self, z):
+        if z >= self.z_threshold * 3:
+            return 'high'
+        if z >= self.z_threshold * 2:
+            return 'medium'
+        return 'low'
+
+    def observe(self, key, bucket, count):
+        """Set ``key``'s count for ``bucket``; returns ``(severity, z)`` or None. O(1)."""
+        with self._lock:
+            baseline = self.baselines.get(key)
+            if baseline is None:
+                baseline = self.baselines[key] = Baseline()
+            baseline.advance(bucket, self.alpha)
+            if bucket < baseline.bucket:
+                return None  # late update for an hour already folded
+            baseline.count = count
+
+            if (baseline.samples < self.min_samples or count < self.min_count
+                    or baseline.alerted == bucket):
+                return None
+            z = self.score(baseline)
+            if z < self.z_threshold:
+                return None
+            baseline.alerted = bucket
+            return self.severity(z), z
+
+    def seed(self, keys, now):
+        """Replay up to ``history_hours`` of buckets for keys seen for the first time.
+
+        Hours since the oldest bucket on record count as zero for keys with
+        no rows, so a quiet ward has a genuine zero baseline rather than none.
+        """
+        new_keys = {key for key in keys if key not in self.baselines}
+        if not new_keys:
+            return
+        current = hour_bucket(now)
+        oldest = db.session.query(db.func.min(TrendBucket.bucket)).scalar()
+        start = max(oldest, current - timedelta(hours=self.history_hours)) if oldest else None
+
+        rows = []
+        if start is not None:
+            rows = db.session.execute(
+                select(TrendBucket.tag, TrendBucket.location, TrendBucket.bucket, TrendBucket.count)
+                .where(TrendBucket.tag.in_(list({tag for tag, _ in new_keys})),
+                       TrendBucket.location.in_(list({location for _, location in new_keys})),
+                       TrendBucket.bucket >= start,
+                       TrendBucket.bucket < current)
+                .order_by(TrendBucket.bucket)
+            ).all()
+
+        with self._lock:
+            for key in new_keys:
+                baseline = self.baselines[key] = Baseline()
+                baseline.bucket = start
+            for tag, location, bucket, count in rows:
+                if (tag, location) in new_keys:
+                    baseline = self.baselines[(tag, location)]
+                    baseline.advance(bucket, self.alpha)
+                    baseline.count = count
+
+    def stats(self):
+        return {
+            'keys': len(self.baselines),
+            'approx_bytes': len(self.baselines) * 260
+        }
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector():
+    """Process-wide detector configured from the app config"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                config = current_app.config
+                _detector = AnomalyDetector(
+                    alpha=config['ANOMALY_ALPHA'],
+                    z_threshold=config['ANOMALY_Z_THRESHOLD'],
+                    min_count=config['ANOMALY_MIN_COUNT'],
+                    min_samples=config['ANOMALY_MIN_HOURS'],
+                    history_hours=config['ANOMALY_HISTORY_HOURS']
+                )
+    return _detector
+
+
+def reset_detector():
+    global _detector
+    with _detector_lock:
+        _detector = None
+
+
+def alert_dedup_key(tag, location, bucket):
+    return f"anomaly:{tag}:{location}:{bucket:%Y-%m-%dT%H}"
+
+
+def _insert_alert(row):
+    """Insert one alert row unless its dedup_key exists; True when inserted"""
+    stmt = dialect_insert(Alert.__table__)
+    if stmt is not None:
+        result = db.session.execute(stmt.values(**row).on_conflict_do_nothing(index_elements=['dedup_key']))
+        return result.rowcount == 1
+    try:
+        with db.session.begin_nested():
+            db.session.execute(Alert.__table__.insert().values(**row))
+    except IntegrityError:
+        # Another worker raised it first
+        return False
+    return True
+
+
+def detect_anomalies(deltas, now=None, detector=None):
+    """Check the keys a batch just incremented and raise alerts; returns them.
+
+    ``deltas`` is the ``{(tag, bucket, location): delta}`` mapping returned by
+    ``trends.record_results``. Only keys in the current hour are considered.
+    """
+    detector = detector or get_detector()
+    current = hour_bucket(now)
+    keys = {(tag, location) for (tag, bucket, location), delta in deltas.items()
+            if delta > 0 and bucket == current and location}
+    if not keys:
+        return []
+
+    detector.seed(keys, current)
+    counts = db.session.execute(
+        select(TrendBucket.tag, TrendBucket.location, TrendBucket.count)
+        .where(TrendBucket.bucket == current,
+               TrendBucket.tag.in_(list({tag for tag, _ in keys})),
+               TrendBucket.location.in_(list({location for _, location in keys})))
+    ).all()
+
+    raised = []
+    for tag, location, count in counts:
+        if (tag, location) not in keys:
+            continue
+        flagged = detector.observe((tag, location), current, count)
+        if flagged:
+            severity, z = flagged
+            dedup_key = alert_dedup_key(tag, location, current)
+            if _insert_alert({'topic': tag, 'severity': severity, 'affected_locations': [location],
+                              'created_at': datetime.utcnow(), 'dedup_key': dedup_key}):
+                logger.info(f"Anomaly: {tag} in {location} at {count}/h (z={z:.1f}, {severity})")
+                raised.append(dedup_key)
+
+    if not raised:
+        return []
+    db.session.commit()
+    return Alert.query.filter(Alert.dedup_key.in_(raised)).order_by(Alert.id).all()
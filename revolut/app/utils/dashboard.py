@@ -0,0 +1,121 @@
+# app/utils/dashboard.py - Dashboard figures from the row counters
+"""Everything the dashboards count, from one grouped read of ``row_counter``.
+
+The write paths keep the counters current (see app.utils.row_counts) and a
+periodic recount corrects whatever they miss, so a dashboard load no longer
+scans the feedback, issue and official tables. Responses carry the
+counters' ``updated_at`` and ``recounted_at`` so clients can tell how fresh
+the figures are.
+
+The sentiment chart is one range scan of the daily rollup (see
+app.utils.feedback_rollup). Active polls come from the cached poll
+snapshots and recent alerts from one small indexed query; neither is an
+aggregate.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Alert, RowCounter
+from app.utils.feedback_rollup import daily_series
+from app.utils.poll_results import poll_snapshots
+from app.utils.row_counts import (FEEDBACK_COUNTER, ISSUE_COUNTER, OFFICIAL_COUNTER, POLL_COUNTER,
+                                  POSITIVE_FEEDBACK_COUNTER, RECOUNT_MARKER, SCORED_OFFICIAL_COUNTER,
+                                  USER_COUNTER, counter_snapshot, issue_status_counter, recount)
+
+logger = logging.getLogger(__name__)
+
+LOCATION_PREFIX = 'user_feedback:location='
+CATEGORY_PREFIX = 'issue:category='
+# Full days shown on the sentiment chart
+DASHBOARD_DAYS = 7
+
+
+def _average(count, total):
+    return total / count if count else 0.0
+
+
+def _isoformat(moment):
+    return moment.isoformat() if moment else None
+
+
+def dashboard_aggregates():
+    """Counts, per-location sentiment, issue categories and daily sentiment.
+
+    Seeds the counters with a recount the first time, so a new deployment
+    starts from exact figures.
+    """
+    counters, recounted_at, updated_at = counter_snapshot()
+    if recounted_at is None:
+        try:
+            recount()
+            db.session.commit()
+        except Exception as e:
+            # Another process got there first
+            db.session.rollback()
+            logger.warning(f"Seeding dashboard counters failed: {str(e)}")
+        counters, recounted_at, updated_at = counter_snapshot()
+
+    def count(name):
+        return counters.get(name, (0, 0.0))[0]
+
+    total_feedback = count(FEEDBACK_COUNTER)
+    scored, score_sum = counters.get(SCORED_OFFICIAL_COUNTER, (0, 0.0))
+    locations = sorted((
+        (name[len(LOCATION_PREFIX):] or None, location_count, _average(location_count, total))
+        for name, (location_count, total) in counters.items()
+        if name.startswith(LOCATION_PREFIX) and location_count > 0
+    ), key=lambda row: (row[0] is None, row[0] or ''))
+    categories = sorted(
+        (name[len(CATEGORY_PREFIX):], category_count) for name, (category_count, _) in counters.items()
+        if name.startswith(CATEGORY_PREFIX) and category_count > 0
+    )
+    # The last DASHBOARD_DAYS full days, oldest first
+    today = datetime.utcnow().date()
+    days = daily_series(today - timedelta(days=DASHBOARD_DAYS), today - timedelta(days=1))
+
+    return {
+        'total_users': count(USER_COUNTER),
+        'total_polls': count(POLL_COUNTER),
+        'total_feedback': total_feedback,
+        'total_issues': count(ISSUE_COUNTER),
+        'officials_count': count(OFFICIAL_COUNTER),
+        'active_issues': count(issue_status_counter('Open')),
+        'positive_sentiment': int(count(POSITIVE_FEEDBACK_COUNTER) * 100 / total_feedback) if total_feedback else 0,
+        'avg_rating': _average(scored, score_sum),
+        'feedback_stats': [{'location': location, 'avg_sentiment': avg_sentiment, 'count': location_count}
+                           for location, location_count, avg_sentiment in locations],
+        'issue_categories': categories,
+        'sentiment_days': [(day['date'], day['avg_sentiment']) for day in days],
+        'updated_at': _isoformat(updated_at),
+        'recounted_at': _isoformat(recounted_at),
+    }
+
+
+def active_poll_snapshots(now=None):
+    """Cached result snapshots of the polls still open for voting, newest first"""
+    now = now or datetime.utcnow()
+    return [snapshot for snapshot in poll_snapshots()
+            if snapshot['expires_at'] is None or snapshot['expires_at'] > now]
+
+
+def recent_alerts(limit=5):
+    return Alert.query.order_by(Alert.created_at.desc()).limit(limit).all()
+
+
+def recount_if_stale(interval):
+    """Recount when the last recount is older than ``interval`` seconds.
+
+    Workers share the schedule through the recount marker, so running several
+    does not multiply the scans. Returns True when it recounted; the caller
+    commits.
+    """
+    if not interval:
+        return False
+    recounted_at = db.session.query(db.func.max(RowCounter.updated_at)).filter(
+        RowCounter.name == RECOUNT_MARKER
+    ).scalar()
+    if recounted_at is not None and recounted_at > datetime.utcnow() - timedelta(seconds=interval):
+        return False
+    recount()
+    return True
@@ -0,0 +1,19 @@
+# app/utils/db_helpers.py - Small SQL helpers shared by the batch write paths
+from app import db
+
+
+def dialect_insert(table):
+    """Return an INSERT into ``table`` that supports ON CONFLICT clauses.
+
+    Callers add ``.on_conflict_do_nothing()`` or ``.on_conflict_do_update()``.
+    ``None`` means the dialect has no such clause and the caller must fall
+    back to handling ``IntegrityError`` itself.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table)
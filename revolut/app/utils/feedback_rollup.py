@@ -0,0 +1,191 @@
+# app/utils/feedback_rollup.py - Daily feedback sentiment per location and category
+"""Daily ``(day, location, category) -> count, sum_sentiment`` rollup.
+
+``record_rollup`` runs in the NLP batch write path next to the trend
+buckets: a scored row adds one to its day and location under each of its
+tags (``''`` when it has none) and once under ``ALL_CATEGORIES``, and a
+re-scored row first takes back what it counted before. Queries without a
+category read the ``ALL_CATEGORIES`` rows, so a row with several tags is
+still counted once. Only processed feedback is counted, so unscored rows
+never drag averages towards zero.
+
+A sentiment series for any date range is one grouped range scan over the
+table's ``(day, location, category)`` primary key, reading at most one row
+per day, location and category however much feedback arrived.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from app import db
+from app.models import FeedbackDaily, UserFeedback
+from app.utils.db_helpers import dialect_insert
+
+REBUILD_CHUNK = 1000
+# Longest range a series may cover
+MAX_RANGE_DAYS = 3660
+GROUPINGS = {'location': FeedbackDaily.location, 'category': FeedbackDaily.category}
+# Category of the per-day, per-location total; not a tag the NLP emits
+ALL_CATEGORIES = '*'
+
+
+def rollup_keys(created_at, location, tags):
+    """``(day, location, category)`` buckets a feedback row counts under"""
+    day, location = (created_at or datetime.utcnow()).date(), location or ''
+    categories = list(dict.fromkeys(tag or '' for tag in tags or ())) or ['']
+    return [(day, location, ALL_CATEGORIES)] + [(day, location, category) for category in categories]
+
+
+def add_to_rollup(deltas, created_at, location, tags, count, sentiment):
+    """Add ``count`` rows of ``sentiment`` to every bucket of one feedback row"""
+    for key in rollup_keys(created_at, location, tags):
+        deltas[key][0] += count
+        deltas[key][1] += count * (sentiment or 0.0)
+
+
+def record_rollup(results, previous):
+    """Add rollup deltas for scored rows; the caller commits with the UPDATE.
+
+    ``previous`` maps feedback id to the stored row, as from
+    ``trends.previous_rows``. Returns the applied deltas.
+    """
+    deltas = defaultdict(lambda: [0, 0.0])
+    for result in results:
+        old = previous.get(result['id'])
+        if old is None:
+            continue
+        if old.is_processed:
+            add_to_rollup(deltas, old.created_at, old.location, old.tags, -1, old.sentiment_score)
+        add_to_rollup(deltas, old.created_at, result['location'], result['tags'], 1, result['sentiment_score'])
+    apply_rollup_deltas(deltas)
+    return deltas
+
+
+def apply_rollup_deltas(deltas):
+    """Upsert ``{(day, location, category): [count, sum_sentiment]}`` into feedback_daily"""
+    rows = [{'day': day, 'location': location, 'category': category, 'count': count, 'sum_sentiment': total}
+            for (day, location, category), (count, total) in deltas.items() if count or total]
+    if not rows:
+        return
+
+    table = FeedbackDaily.__table__
+    stmt = dialect_insert(table)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['day', 'location', 'category'],
+            set_={'count': table.c.count + stmt.excluded['count'],
+                  'sum_sentiment': table.c.sum_sentiment + stmt.excluded['sum_sentiment']}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.day == row['day'], table.c.location == row['location'],
+                   table.c.category == row['category'])
+            .values(count=table.c.count + row['count'],
+                    sum_sentiment=table.c.sum_sentiment + row['sum_sentiment'])
+        ).rowcount
+        if not updated:
+            db.session.execute(table.insert().values(**row))
+
+
+def _filtered(stmt, start, end, location=None, category=None, per_category=False):
+    """Restrict to the range and filters; without a category, to the totals or (``per_category``) the tags"""
+    stmt = stmt.where(FeedbackDaily.day >= start, FeedbackDaily.day <= end)
+    if location is not None:
+        stmt = stmt.where(FeedbackDaily.location == location)
+    if category is not None:
+        return stmt.where(FeedbackDaily.category == category)
+    if per_category:
+        return stmt.where(FeedbackDaily.category != ALL_CATEGORIES)
+    return stmt.where(FeedbackDaily.category == ALL_CATEGORIES)
+
+
+def _average(count, total):
+    return total / count if count else 0.0
+
+
+def daily_series(start, end, location=None, category=None):
+    """One ``{'date', 'count', 'avg_sentiment'}`` per day from ``start`` to ``end`` inclusive.
+
+    Days without feedback have a count and average of 0.
+    """
+    rows = db.session.execute(_filtered(
+        select(FeedbackDaily.day, db.func.sum(FeedbackDaily.count), db.func.sum(FeedbackDaily.sum_sentiment)),
+        start, end, location, category
+    ).group_by(FeedbackDaily.day)).all()
+    by_day = {day: (count or 0, total or 0.0) for day, count, total in rows}
+
+    series = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        count, total = by_day.get(day, (0, 0.0))
+        series.append({'date': day.isoformat(), 'count': count, 'avg_sentiment': _average(count, total)})
+    return series
+
+
+def grouped_totals(start, end, by, location=None, category=None):
+    """``{'location' or 'category', 'count', 'avg_sentiment'}`` per group over the range, largest first"""
+    column = GROUPINGS[by]
+    rows = db.session.execute(_filtered(
+        select(column, db.func.sum(FeedbackDaily.count), db.func.sum(FeedbackDaily.sum_sentiment)),
+        start, end, location, category, per_category=(by == 'category')
+    ).group_by(column)).all()
+    groups = [{by: name or None, 'count': count, 'avg_sentiment': _average(count, total)}
+              for name, count, total in rows if count]
+    return sorted(groups, key=lambda group: (-group['count'], group[by] or ''))
+
+
+def last_days(days, today=None):
+    """``(start, end)`` covering ``days`` days up to and including ``today``"""
+    today = today or datetime.utcnow().date()
+    return today - timedelta(days=days - 1), today
+
+
+def parse_range(start=None, end=None, days=7):
+    """``(start, end)`` dates from ISO strings or a day count; ValueError when invalid"""
+    if start or end:
+        end_day = date.fromisoformat(end) if end else datetime.utcnow().date()
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=days - 1)
+    else:
+        start_day, end_day = last_days(days)
+    if start_day > end_day:
+        raise ValueError("start is after end")
+    if (end_day - start_day).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"ranges are limited to {MAX_RANGE_DAYS} days")
+    return start_day, end_day
+
+
+def rebuild_rollup(days=None, now=None):
+    """Recount the last ``days`` days of processed feedback (all of it by default).
+
+    Processed rows are read in id order, ``REBUILD_CHUNK`` at a time. The
+    caller commits.
+    """
+    stmt = delete(FeedbackDaily).execution_options(synchronize_session=False)
+    query = db.session.query(
+        UserFeedback.id, UserFeedback.created_at, UserFeedback.location,
+        UserFeedback.tags, UserFeedback.sentiment_score
+    ).filter(UserFeedback.is_processed == True)  # noqa: E712
+    if days is not None:
+        start, _ = last_days(days, (now or datetime.utcnow()).date())
+        stmt = stmt.where(FeedbackDaily.day >= start)
+        query = query.filter(UserFeedback.created_at >= datetime.combine(start, datetime.min.time()))
+    db.session.execute(stmt)
+
+    counted = 0
+    last_id = 0
+    while True:
+        rows = query.filter(UserFeedback.id > last_id).order_by(UserFeedback.id).limit(REBUILD_CHUNK).all()
+        if not rows:
+            break
+        deltas = defaultdict(lambda: [0, 0.0])
+        for row in rows:
+            add_to_rollup(deltas, row.created_at, row.location, row.tags, 1, row.sentiment_score)
+        apply_rollup_deltas(deltas)
+        counted += len(rows)
+        last_id = rows[-1].id
+    return counted
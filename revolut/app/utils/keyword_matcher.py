@@ -0,0 +1,226 @@
+# app/utils/keyword_matcher.py - Precompiled keyword index for feedback NLP
+"""Inverted index over every keyword table used by the NLP processor.
+
+The index is built once and maps a token to everything it means: a category
+keyword, a sentiment indicator, a location, an issue pattern or a pattern
+subject. Multi-word phrases ("not working", "lack of") are stored under
+their first token. ``match()`` tokenises a message once and returns every
+hit in a ``KeywordMatch``, so categorisation, location extraction and the
+sentiment indicator adjustment all come from a single pass.
+"""
+import re
+
+TOKEN_RE = re.compile(r"\w+(?:-\w+)*")
+
+CATEGORY = 'category'
+POSITIVE = 'positive'
+NEGATIVE = 'negative'
+CITY = 'city'
+ADMIN_UNIT = 'admin_unit'
+PATTERN = 'pattern'
+SUBJECT = 'subject'
+
+
+def tokenize(text):
+    """Lowercase word tokens; hyphenated words stay whole ("sub-county")"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class KeywordMatch:
+    """Everything the index found in one message"""
+    __slots__ = ('tokens', 'category_hits', 'positive', 'negative',
+                 'location', 'patterns', 'subjects')
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.category_hits = {}
+        self.positive = set()
+        self.negative = set()
+        self.location = None
+        self.patterns = set()
+        self.subjects = set()
+
+
+class KeywordMatcher:
+    def __init__(self, category_keywords, positive_indicators, negative_indicators,
+                 cities=(), admin_units=(), issue_patterns=None, pattern_subjects=None):
+        """Build the index.
+
+        ``issue_patterns`` maps a pattern name to phrases (e.g. ``'damage'`` to
+        ``['not working', 'broken']``); ``pattern_subjects`` is an ordered list
+        of ``(pattern, category, words)`` rules used when no category keyword
+        matched.
+        """
+        self.category_sizes = {
+            category: len(set(keywords)) for category, keywords in category_keywords.items()
+        }
+        self.pattern_subjects = list(pattern_subjects or [])
+
+        self._tokens = {}
+        self._phrases = {}
+
+        for category, keywords in category_keywords.items():
+            for keyword in keywords:
+                self._add(keyword, CATEGORY, category)
+        for word in positive_indicators:
+            self._add(word, POSITIVE, word)
+        for word in negative_indicators:
+            self._add(word, NEGATIVE, word)
+        for city in cities:
+            self._add(city, CITY, city.title())
+        for unit in admin_units:
+            self._add(unit, ADMIN_UNIT, unit.title())
+        for pattern, phrases in (issue_patterns or {}).items():
+            for phrase in phrases:
+                self._add(phrase, PATTERN, pattern)
+        for pattern, category, words in self.pattern_subjects:
+            for word in words:
+                self._add(word, SUBJECT, category)
+
+        # Plural forms ("roads", "doctors") resolve to their singular entries
+        for token, entries in list(self._tokens.items()):
+            if len(token) > 2 and not token.endswith('s'):
+                self._tokens.setdefault(token + 's', list(entries))
+
+        self._index = {token: self._compile(entries) for token, entries in self._tokens.items()}
+        del self._tokens
+        self._phrases = {
+            first: tuple(sorted(entries, key=lambda e: -len(e[0])))
+            for first, entries in self._phrases.items()
+        }
+        self._phrase_starts = frozenset(self._phrases)
+
+    @staticmethod
+    def _compile(entries):
+        """Group a token's entries by kind so matching does no dispatch"""
+        categories, positive, negative, patterns, subjects, locations = [], [], [], [], [], []
+        for kind, value, term in entries:
+            if kind == CATEGORY:
+                categories.append((value, term))
+            elif kind == POSITIVE:
+                positive.append(term)
+            elif kind == NEGATIVE:
+                negative.append(term)
+            elif kind == PATTERN:
+                patterns.append(value)
+            elif kind == SUBJECT:
+                subjects.append(value)
+            else:
+                locations.append((kind, value))
+        return (tuple(categories), tuple(positive), tuple(negative),
+                tuple(patterns), tuple(subjects), tuple(locations))
+
+    def _add(self, term, kind, value):
+        words = tokenize(term)
+        if not words:
+            return
+        entry = (kind, value, term)
+        if len(words) == 1:
+            self._tokens.setdefault(words[0], []).append(entry)
+        else:
+            self._phrases.setdefault(words[0], []).append((tuple(words), entry))
+
+    def _lookup(self, token):
+        info = self._index.get(token)
+        if info is None and '-' in token:
+            # "well-maintained": fall back to the parts of a compound
+            parts = [self._index[part] for part in token.split('-') if part in self._index]
+            if parts:
+                info = tuple(sum((p[k] for p in parts), ()) for k in range(6))
+        return info
+
+    def match(self, text, tokens=None):
+        """Scan ``text`` once and collect every index hit"""
+        if tokens is None:
+            tokens = tokenize(text)
+        result = KeywordMatch(tokens)
+        index = self._index
+        category_hits = result.category_hits
+
+        # Each distinct token is looked up once
+        token_set = set(tokens)
+        has_location = False
+        for token in token_set:
+            info = index.get(token)
+            if info is None:
+                if '-' not in token:
+                    continue
+                info = self._lookup(token)
+                if info is None:
+                    continue
+            categories, positive, negative, patterns, subjects, locations = info
+            for category, term in categories:
+                if category in category_hits:
+                    category_hits[category].add(term)
+                else:
+                    category_hits[category] = {term}
+            if positive:
+                result.positive.update(positive)
+            if negative:
+                result.negative.update(negative)
+            if patterns:
+                result.patterns.update(patterns)
+            if subjects:
+                result.subjects.update(subjects)
+            if locations:
+                has_location = True
+
+        if has_location:
+            result.location = self._first_location(tokens)
+
+        return self._match_phrases(result, tokens, token_set)
+
+    def _first_location(self, tokens):
+        # Location depends on position ("<name> ward"), so walk in order
+        for i, token in enumerate(tokens):
+            info = self._lookup(token)
+            if not info:
+                continue
+            for kind, value in info[5]:
+                if kind == CITY:
+                    return value
+                if kind == ADMIN_UNIT and i > 0:
+                    # "Kibra ward" -> "Kibra Ward"
+                    return f"{tokens[i - 1].title()} {value}"
+        return None
+
+    def _match_phrases(self, result, tokens, token_set):
+        starts = token_set & self._phrase_starts
+        if starts:
+            for i, token in enumerate(tokens):
+                if token in starts:
+                    for words, (kind, value, term) in self._phrases[token]:
+                        if tuple(tokens[i:i + len(words)]) == words:
+                            self._record(result, kind, value, term)
+        return result
+
+    @staticmethod
+    def _record(result, kind, value, term):
+        if kind == CATEGORY:
+            result.category_hits.setdefault(value, set()).add(term)
+        elif kind == POSITIVE:
+            result.positive.add(term)
+        elif kind == NEGATIVE:
+            result.negative.add(term)
+        elif kind == PATTERN:
+            result.patterns.add(value)
+        elif kind == SUBJECT:
+            result.subjects.add(value)
+
+    def categories(self, match, threshold=0.02, limit=3):
+        """Categories whose share of matched keywords reaches ``threshold``"""
+        categories = [
+            category for category, size in self.category_sizes.items()
+            if category in match.category_hits
+            and len(match.category_hits[category]) / size >= threshold
+        ]
+
+        # If no categories found, infer from common complaint patterns
+        if not categories and match.patterns:
+            inferred = set()
+            for pattern, category, words in self.pattern_subjects:
+                if pattern in match.patterns and pattern not in inferred and category in match.subjects:
+                    categories.append(category)
+                    inferred.add(pattern)
+
+        return categories[:limit]
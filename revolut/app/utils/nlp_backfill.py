@@ -0,0 +1,90 @@
+# app/utils/nlp_backfill.py - Multiprocess NLP backfill (flask nlp backfill)
+"""Fan feedback scoring out to a process pool for bulk backfills.
+
+TextBlob scoring is pure Python and CPU bound, so a single process tops out
+at one core. The parent streams ``(id, content, location)`` chunks to pool
+workers, which score them with their own shared processor and send back
+``(id, sentiment, tags, location)`` results; only the parent touches the
+database, writing each chunk with one bulk UPDATE and commit.
+"""
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from flask import has_app_context
+
+from app import db
+from app.models import UserFeedback
+from app.utils.nlp_processor import (
+    get_processor, iter_feedback_chunks, new_batch_stats, reset_processors, update_batch_stats, warm_up
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker(sentiment_engine, cache_size):
+    """Pool initializer: load the NLP models once per worker process.
+
+    A forked worker inherits the parent's processor, app context and pooled
+    connections. It drops the pool without closing the parent's sockets and
+    builds its own processor that never reads or writes the result cache
+    table, so nothing in the worker touches the database.
+    """
+    if has_app_context():
+        db.engine.dispose(close=False)
+    reset_processors()
+    get_processor(sentiment_engine=sentiment_engine, cache_size=cache_size, persist_cache=False)
+    warm_up()
+
+
+def score_chunk(rows):
+    """Score a chunk in a pool worker; returns ``(results, failures)``"""
+    return get_processor().score_rows(rows)
+
+
+def backfill(query=None, workers=None, chunk_size=500, progress=None):
+    """Score every row selected by ``query`` using ``workers`` processes.
+
+    Defaults to unprocessed feedback and one worker per CPU. At most two
+    chunks per worker are in flight, so memory stays bounded however large
+    the backlog. ``progress`` receives the running stats after each chunk.
+    """
+    if query is None:
+        query = UserFeedback.query.filter(UserFeedback.is_processed == False)  # noqa: E712
+    workers = workers or os.cpu_count() or 1
+
+    processor = get_processor()
+    stats = new_batch_stats()
+    stats['workers'] = workers
+
+    def finish(results, failures):
+        if not processor.commit_results(results, failures):
+            results = []
+        update_batch_stats(stats, len(results), len(failures))
+        if progress:
+            progress(dict(stats))
+
+    chunks = iter_feedback_chunks(query=query, chunk_size=chunk_size)
+
+    if workers == 1:
+        for rows in chunks:
+            finish(*processor.score_rows(rows))
+    else:
+        cache_size = processor.cache.maxsize if processor.cache is not None else 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(processor.sentiment_engine.name, cache_size)) as pool:
+            pending = set()
+            for rows in chunks:
+                pending.add(pool.submit(score_chunk, rows))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(*future.result())
+            for future in pending:
+                finish(*future.result())
+
+    logger.info(
+        f"Backfilled {stats['processed']} feedback rows with {workers} workers in "
+        f"{stats['elapsed']:.1f}s ({stats['rows_per_sec']:.0f} rows/sec, {stats['failed']} failed)"
+    )
+    return stats
@@ -0,0 +1,166 @@
+# app/utils/nlp_cache.py - Memoised NLP results
+"""Bounded LRU cache of ``(sentiment_score, tags, location)`` results.
+
+USSD and SMS campaigns send the same few messages thousands of times
+("maji hakuna", "barabara mbaya"), so results are keyed by a hash of the
+normalised text: lowercase word tokens joined by single spaces, which folds
+case, punctuation and spacing differences together.
+
+The key also includes a fingerprint of the processor's keyword tables and
+sentiment engine. Changing either (and rebuilding the processor with
+``reset_processors()``) changes every key, so stale results are never
+served. With ``persist=True`` misses are looked up in ``nlp_result_cache``
+in bulk and new results are written alongside the feedback UPDATE, so the
+cache survives restarts and is shared by all workers.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import NLPResultCache
+from app.utils.db_helpers import dialect_insert
+from app.utils.keyword_matcher import tokenize
+
+# Bump when scoring code changes in a way the tables don't capture
+CACHE_VERSION = 1
+PREFETCH_CHUNK = 500
+
+
+def normalise(text):
+    return ' '.join(tokenize(text))
+
+
+def table_fingerprint(*tables):
+    """Short stable hash of the keyword tables and engine settings"""
+    payload = json.dumps([CACHE_VERSION, tables], sort_keys=True, default=list)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class ResultCache:
+    def __init__(self, fingerprint, maxsize=10000, persist=False):
+        self.fingerprint = fingerprint
+        self.maxsize = maxsize
+        self.persist = persist
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.persisted_hits = 0
+
+    def key(self, text=None, tokens=None):
+        """Hash of the normalised text; pass ``tokens`` to skip re-tokenising"""
+        if tokens is None:
+            tokens = tokenize(text or '')
+        return hashlib.sha256(f"{self.fingerprint}:{' '.join(tokens)}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, sentiment_score, tags, location):
+        result = (sentiment_score, tuple(tags), location)
+        with self._lock:
+            self._store(key, result)
+            if self.persist:
+                self._pending[key] = result
+
+    def _store(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def prefetch(self, keys):
+        """Load persisted results for ``keys`` not already held in memory"""
+        if not self.persist:
+            return 0
+        with self._lock:
+            missing = [key for key in set(keys) if key not in self._entries]
+
+        loaded = 0
+        for start in range(0, len(missing), PREFETCH_CHUNK):
+            rows = db.session.execute(
+                select(NLPResultCache.key, NLPResultCache.sentiment_score,
+                       NLPResultCache.tags, NLPResultCache.location)
+                .where(NLPResultCache.key.in_(missing[start:start + PREFETCH_CHUNK]))
+            ).all()
+            with self._lock:
+                for key, sentiment_score, tags, location in rows:
+                    self._store(key, (sentiment_score, tuple(tags or ()), location))
+            loaded += len(rows)
+        self.persisted_hits += loaded
+        return loaded
+
+    def flush(self):
+        """Add new results to the session; the caller's commit persists them"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        rows = [{
+            'key': key,
+            'fingerprint': self.fingerprint,
+            'sentiment_score': sentiment_score,
+            'tags': list(tags),
+            'location': location
+        } for key, (sentiment_score, tags, location) in pending.items()]
+
+        stmt = dialect_insert(NLPResultCache.__table__)
+        if stmt is not None:
+            db.session.execute(stmt.on_conflict_do_nothing(), rows)
+        else:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(NLPResultCache.__table__.insert(), rows)
+            except IntegrityError:
+                # Another worker cached the same text first; its row is equivalent
+                pass
+        return len(rows)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'persisted_hits': self.persisted_hits,
+            'fingerprint': self.fingerprint
+        }
+
+
+def persisted_stats(fingerprint):
+    """Row counts in nlp_result_cache for the current and stale fingerprints"""
+    counts = dict(db.session.query(
+        NLPResultCache.fingerprint == fingerprint, db.func.count()
+    ).group_by(NLPResultCache.fingerprint == fingerprint).all())
+    return {'current': counts.get(True, 0), 'stale': counts.get(False, 0)}
+
+
+def purge_stale(fingerprint):
+    """Delete persisted results written under other keyword tables"""
+    deleted = db.session.execute(
+        delete(NLPResultCache).where(NLPResultCache.fingerprint != fingerprint)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return deleted
@@ -1,15 +1,25 @@
 # app/utils/enhanced_nlp_processor.py
 from app import db
 from app.models import UserFeedback
-from textblob import TextBlob
-import re
+from app.utils.feedback_rollup import record_rollup
+from app.utils.keyword_matcher import KeywordMatcher, tokenize
+from app.utils.nlp_cache import ResultCache, table_fingerprint
+from app.utils.search import reindex
+from app.utils.sentiment import make_sentiment_engine
+from app.utils.row_counts import add_to_counters, feedback_deltas
+from app.utils.trends import previous_rows, record_results
+from flask import current_app, has_app_context
+from sqlalchemy import update
+import os
+import threading
+import time
 from collections import Counter
 import logging
 
 logger = logging.getLogger(__name__)
 
 class EnhancedNLPProcessor:
-    def __init__(self):
+    def __init__(self, sentiment_engine=None, cache_size=None, persist_cache=None):
         # Expanded keyword mappings for better categorization
         self.category_keywords = {
             'water_supply': [
@@ -60,58 +70,207 @@ class EnhancedNLPProcessor:
             'mbaya', 'haya', 'hasira', 'uchungu', 'vibaya'
         ]
 
+        # Common Kenyan locations and administrative units
+        self.major_cities = [
+            'nairobi', 'mombasa', 'kisumu', 'nakuru', 'eldoret', 'thika', 'malindi',
+            'kitale', 'garissa', 'kakamega', 'nyeri', 'machakos', 'meru', 'embu'
+        ]
+        self.admin_units = ['county', 'ward', 'constituency']
+
+        # Complaint patterns used when no category keyword matches
+        self.issue_patterns = {
+            'damage': ['not working', 'broken', 'damaged', 'needs repair'],
+            'shortage': ['lack of', 'shortage', 'unavailable', 'missing']
+        }
+        self.pattern_subjects = [
+            ('damage', 'infrastructure', ['road', 'street', 'bridge']),
+            ('damage', 'water_supply', ['water', 'pipe', 'tap']),
+            ('shortage', 'healthcare', ['medicine', 'doctor', 'treatment']),
+            ('shortage', 'education', ['teacher', 'books', 'classroom'])
+        ]
+
+        # One inverted index over all of the tables above
+        self.matcher = KeywordMatcher(
+            self.category_keywords,
+            self.positive_indicators,
+            self.negative_indicators,
+            cities=self.major_cities,
+            admin_units=self.admin_units,
+            issue_patterns=self.issue_patterns,
+            pattern_subjects=self.pattern_subjects
+        )
+
+        # textblob, lexicon or hybrid (see app.utils.sentiment)
+        self.sentiment_engine = make_sentiment_engine(
+            sentiment_engine or nlp_setting('NLP_SENTIMENT_ENGINE'),
+            self.positive_indicators,
+            self.negative_indicators
+        )
+
+        # Memoised results; the fingerprint invalidates them when tables change
+        self.fingerprint = table_fingerprint(
+            self.category_keywords, self.positive_indicators, self.negative_indicators,
+            self.major_cities, self.admin_units, self.issue_patterns,
+            self.pattern_subjects, self.sentiment_engine.name
+        )
+        if cache_size is None:
+            cache_size = int(nlp_setting('NLP_CACHE_SIZE', 10000))
+        if persist_cache is None:
+            # Backfill pool workers pass False: only the parent touches the database
+            persist_cache = has_app_context() and bool(current_app.config.get('NLP_CACHE_PERSIST'))
+        self.cache = ResultCache(self.fingerprint, cache_size, persist_cache) if cache_size > 0 else None
+
     def process_feedback(self, feedback_id):
         """Enhanced feedback processing with better NLP"""
         try:
-            feedback = UserFeedback.query.get(feedback_id)
+            feedback = db.session.query(
+                UserFeedback.id, UserFeedback.content, UserFeedback.location
+            ).filter(UserFeedback.id == feedback_id).first()
             if not feedback or not feedback.content:
                 logger.warning(f"No feedback found or empty content for ID: {feedback_id}")
                 return
 
-            text = feedback.content.lower().strip()
-
-            # Enhanced sentiment analysis
-            sentiment_score = self._analyze_sentiment(text)
-            feedback.sentiment_score = sentiment_score
-
-            # Enhanced categorization
-            categories = self._categorize_feedback(text)
-            feedback.tags = categories
-
-            # Extract location mentions if not provided
-            if not feedback.location:
-                extracted_location = self._extract_location(text)
-                if extracted_location:
-                    feedback.location = extracted_location
-
-            # Mark as processed
-            feedback.is_processed = True
-
-            db.session.commit()
-            logger.info(f"Processed feedback {feedback_id}: sentiment={sentiment_score:.2f}, categories={categories}")
+            # Same write path as batches, so trend counters stay in step
+            results, failures = self.score_rows([tuple(feedback)])
+            if self.commit_results(results, failures) and results:
+                result = results[0]
+                logger.info(f"Processed feedback {feedback_id}: sentiment={result['sentiment_score']:.2f}, "
+                            f"categories={result['tags']}")
 
         except Exception as e:
             logger.error(f"Error processing feedback {feedback_id}: {str(e)}")
             db.session.rollback()
 
-    def _analyze_sentiment(self, text):
-        """Enhanced sentiment analysis combining multiple approaches"""
+    def analyze(self, content):
+        """Score a single message without touching the database.
+
+        Returns a ``(sentiment_score, categories, location)`` tuple. Unlike
+        ``process_feedback`` errors are raised, so callers such as the
+        background worker can retry or quarantine the row.
+        """
+        text = (content or '').lower().strip()
+        if not text:
+            return 0.0, [], None
+
+        # Single tokenisation pass feeds the cache key and all three analyses
+        tokens = tokenize(text)
+        if self.cache is not None:
+            key = self.cache.key(tokens=tokens)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached[0], list(cached[1]), cached[2]
+
+        match = self.matcher.match(text, tokens=tokens)
+
+        sentiment_score = self._analyze_sentiment(text, match)
+        categories = self.matcher.categories(match)
+        location = match.location
+
+        if self.cache is not None:
+            self.cache.put(key, sentiment_score, categories, location)
+        return sentiment_score, categories, location
+
+    def score_rows(self, rows):
+        """Score ``(id, content, location)`` rows in memory.
+
+        Returns ``(results, failures)``: ``results`` are dicts ready for
+        ``write_results`` and ``failures`` maps feedback id to an error string.
+        """
+        results = []
+        failures = {}
+        if self.cache is not None and self.cache.persist:
+            # One query for every message not already cached in memory
+            self.cache.prefetch([self.cache.key((content or '').lower()) for _id, content, _loc in rows])
+        for feedback_id, content, location in rows:
+            try:
+                sentiment_score, categories, extracted_location = self.analyze(content)
+            except Exception as e:
+                failures[feedback_id] = f"{type(e).__name__}: {e}"
+                continue
+            results.append({
+                'id': feedback_id,
+                'sentiment_score': sentiment_score,
+                'tags': categories,
+                'location': location or extracted_location,
+                'is_processed': True
+            })
+        return results, failures
+
+    def write_results(self, results):
+        """Bulk UPDATE scored rows by primary key; the caller commits.
+
+        Returns the trend bucket deltas applied for the rows.
+        """
+        deltas = {}
+        if results:
+            # Trend, rollup and dashboard deltas need the previous state, so they go first
+            previous = previous_rows(results)
+            deltas = record_results(results, previous)
+            record_rollup(results, previous)
+            changes = []
+            for result in results:
+                old = previous.get(result['id'])
+                if old is not None:
+                    changes.append(((old.location, old.sentiment_score),
+                                    (result['location'], result['sentiment_score'])))
+            add_to_counters(feedback_deltas(changes))
+            db.session.execute(update(UserFeedback), results)
+            # Extracted locations become searchable
+            reindex('feedback', [r['id'] for r in results if r.get('location')])
+        if self.cache is not None:
+            self.cache.flush()
+        return deltas
+
+    def commit_results(self, results, failures):
+        """Write and commit one chunk; on error every row counts as failed.
+
+        Returns True when the chunk was committed.
+        """
+        committed = True
         try:
-            # Use TextBlob for basic sentiment
-            blob = TextBlob(text)
-            base_sentiment = blob.sentiment.polarity
-
-            # Adjust based on local positive/negative indicators
-            positive_count = sum(1 for word in self.positive_indicators if word in text)
-            negative_count = sum(1 for word in self.negative_indicators if word in text)
-
-            # Calculate adjustment factor
-            adjustment = (positive_count - negative_count) * 0.1
-
-            # Combine scores
-            final_sentiment = max(-1.0, min(1.0, base_sentiment + adjustment))
-
-            return final_sentiment
+            self.write_results(results)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error writing NLP batch: {str(e)}")
+            failures.update({r['id']: str(e) for r in results})
+            committed = False
+
+        for feedback_id, error in failures.items():
+            logger.warning(f"Could not process feedback {feedback_id}: {error}")
+        return committed
+
+    def process_batch(self, ids=None, query=None, chunk_size=500, progress=None):
+        """Process many feedback rows with one bulk UPDATE and commit per chunk.
+
+        Pass either a list of feedback ``ids`` or a ``query`` selecting
+        UserFeedback rows, e.g. ``UserFeedback.query.filter_by(is_processed=False)``.
+        Only id, content and location are loaded. ``progress`` is called with
+        the running stats after every chunk. Returns the final stats.
+        """
+        stats = new_batch_stats()
+
+        for rows in iter_feedback_chunks(ids=ids, query=query, chunk_size=chunk_size):
+            results, failures = self.score_rows(rows)
+            if not self.commit_results(results, failures):
+                results = []
+
+            update_batch_stats(stats, len(results), len(failures))
+            if progress:
+                progress(dict(stats))
+
+        logger.info(
+            f"Processed {stats['processed']} feedback rows in {stats['elapsed']:.1f}s "
+            f"({stats['rows_per_sec']:.0f} rows/sec, {stats['failed']} failed)"
+        )
+        return stats
+
+    def _analyze_sentiment(self, text, match=None):
+        """Score sentiment with the configured engine"""
+        try:
+            if match is None:
+                match = self.matcher.match(text)
+            return self.sentiment_engine.score(text, match)
 
         except Exception as e:
             logger.error(f"Error in sentiment analysis: {e}")
@@ -119,68 +278,11 @@ class EnhancedNLPProcessor:
 
     def _categorize_feedback(self, text):
         """Enhanced categorization using keyword matching and scoring"""
-        categories = []
-        category_scores = {}
-
-        # Count keyword matches for each category
-        words = re.findall(r'\b\w+\b', text.lower())
-        word_set = set(words)
-
-        for category, keywords in self.category_keywords.items():
-            matches = len(word_set.intersection(set(keywords)))
-            if matches > 0:
-                # Score based on number of matches and keyword relevance
-                score = matches / len(keywords)
-                category_scores[category] = score
-
-        # Select categories with significant scores
-        threshold = 0.02  # Adjust this threshold as needed
-        categories = [cat for cat, score in category_scores.items() if score >= threshold]
-
-        # If no categories found, try to infer from common patterns
-        if not categories:
-            categories = self._infer_category_from_patterns(text)
-
-        return categories[:3]  # Limit to top 3 categories
-
-    def _infer_category_from_patterns(self, text):
-        """Infer categories from common complaint patterns"""
-        categories = []
-
-        # Pattern-based inference
-        if any(phrase in text for phrase in ['not working', 'broken', 'damaged', 'needs repair']):
-            if any(word in text for word in ['road', 'street', 'bridge']):
-                categories.append('infrastructure')
-            elif any(word in text for word in ['water', 'pipe', 'tap']):
-                categories.append('water_supply')
-
-        if any(phrase in text for phrase in ['lack of', 'shortage', 'unavailable', 'missing']):
-            if any(word in text for word in ['medicine', 'doctor', 'treatment']):
-                categories.append('healthcare')
-            elif any(word in text for word in ['teacher', 'books', 'classroom']):
-                categories.append('education')
-
-        return categories
+        return self.matcher.categories(self.matcher.match(text))
 
     def _extract_location(self, text):
         """Extract location mentions from text"""
-        # Common Kenyan locations and administrative units
-        kenyan_locations = [
-            'nairobi', 'mombasa', 'kisumu', 'nakuru', 'eldoret', 'thika', 'malindi',
-            'kitale', 'garissa', 'kakamega', 'nyeri', 'machakos', 'meru', 'embu',
-            'county', 'ward', 'constituency', 'sub-county', 'location', 'village'
-        ]
-
-        words = text.lower().split()
-        for i, word in enumerate(words):
-            if word in kenyan_locations:
-                # Try to get the specific location name
-                if word in ['county', 'ward', 'constituency'] and i > 0:
-                    return f"{words[i-1].title()} {word.title()}"
-                elif word in kenyan_locations[:14]:  # Major cities
-                    return word.title()
-
-        return None
+        return self.matcher.match(text).location
 
     def get_feedback_statistics(self, days=30):
         """Get statistics about processed feedback"""
@@ -223,8 +325,143 @@ class EnhancedNLPProcessor:
             'top_locations': dict(location_counts.most_common(10))
         }
 
+def iter_feedback_chunks(ids=None, query=None, chunk_size=500):
+    """Yield lists of ``(id, content, location)`` rows from ids or a query"""
+    if (ids is None) == (query is None):
+        raise ValueError("Pass exactly one of ids or query")
+
+    columns = (UserFeedback.id, UserFeedback.content, UserFeedback.location)
+    if ids is not None:
+        id_list = list(ids)
+        for i in range(0, len(id_list), chunk_size):
+            yield db.session.query(*columns).filter(
+                UserFeedback.id.in_(id_list[i:i + chunk_size])
+            ).all()
+        return
+
+    # Keyset on id: processing may remove rows from the query's result
+    # set, which would make OFFSET paging skip rows.
+    last_id = 0
+    while True:
+        rows = query.with_entities(*columns).filter(
+            UserFeedback.id > last_id
+        ).order_by(None).order_by(UserFeedback.id).limit(chunk_size).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+def new_batch_stats():
+    return {'processed': 0, 'failed': 0, 'chunks': 0, 'elapsed': 0.0,
+            'rows_per_sec': 0.0, 'started': time.perf_counter()}
+
+
+def update_batch_stats(stats, processed, failed):
+    stats['processed'] += processed
+    stats['failed'] += failed
+    stats['chunks'] += 1
+    stats['elapsed'] = time.perf_counter() - stats['started']
+    stats['rows_per_sec'] = stats['processed'] / stats['elapsed'] if stats['elapsed'] else 0.0
+
+
+def nlp_setting(key, default=None):
+    """Read an NLP setting from the app config, or the environment in pool workers"""
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return os.environ.get(key, default)
+
+
+# Process-wide processor registry. Building a processor compiles the keyword
+# index, and TextBlob loads its sentiment lexicon on the first message, so
+# both are done once per process (`flask nlp worker` warms up at start).
+_processors = {}
+_processors_lock = threading.Lock()
+_warmup_reports = {}
+
+WARMUP_TEXT = "Maji ni safi lakini barabara mbaya in Nairobi; the clinic is not working"
+
+
+def get_processor(name='default', **options):
+    """Return the shared EnhancedNLPProcessor, building it on first use.
+
+    ``options`` go to the constructor and only matter for that first call.
+    """
+    processor = _processors.get(name)
+    if processor is None:
+        with _processors_lock:
+            processor = _processors.get(name)
+            if processor is None:
+                processor = EnhancedNLPProcessor(**options)
+                _processors[name] = processor
+    return processor
+
+
+def reset_processors():
+    """Drop shared processors, e.g. after changing keyword tables"""
+    with _processors_lock:
+        _processors.clear()
+        _warmup_reports.clear()
+
+
+def _rss_kb():
+    """Current resident set size in KB, or None where it can't be read"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return None
+
+
+def warm_up(name='default'):
+    """Build the shared processor and load TextBlob models ahead of traffic.
+
+    Safe to call repeatedly; later calls return the first report. The report
+    has the load time in seconds, the resident memory before/after in KB and
+    the pid, so it can be logged by the NLP worker or the CLI. In a process
+    forked after warming the report is the child's own: ``inherited_from``
+    names the parent's pid and the memory is read afresh.
+    """
+    report = _warmup_reports.get(name)
+    if report is not None and name in _processors:
+        if report['pid'] != os.getpid():
+            report = {
+                'processor': name,
+                'pid': os.getpid(),
+                'inherited_from': report['pid'],
+                'seconds': 0.0,
+                'rss_after_kb': _rss_kb()
+            }
+            _warmup_reports[name] = report
+        return report
+
+    rss_before = _rss_kb()
+    started = time.perf_counter()
+
+    processor = get_processor(name)
+    # The first analysis loads the TextBlob sentiment lexicon
+    processor.analyze(WARMUP_TEXT)
+
+    report = {
+        'processor': name,
+        'pid': os.getpid(),
+        'seconds': round(time.perf_counter() - started, 4),
+        'rss_before_kb': rss_before,
+        'rss_after_kb': _rss_kb()
+    }
+    if rss_before is not None and report['rss_after_kb'] is not None:
+        report['rss_delta_kb'] = report['rss_after_kb'] - rss_before
+    _warmup_reports[name] = report
+    logger.info(f"NLP processor warmed up: {report}")
+    return report
+
+
 # Usage function
 def process_feedback(feedback_id):
     """Main function to process feedback - replaces the old one"""
-    processor = EnhancedNLPProcessor()
-    processor.process_feedback(feedback_id)
\ No newline at end of file
+    get_processor().process_feedback(feedback_id)
\ No newline at end of file
@@ -0,0 +1,263 @@
+# app/utils/nlp_queue.py - Background NLP work queue
+"""Database-backed work queue for feedback NLP processing.
+
+The queue source is ``UserFeedback`` itself: every row with
+``is_processed == False`` is pending work, so submitting feedback stays a
+single INSERT. Workers claim rows by inserting into ``nlp_task`` (the primary
+key makes the claim atomic on both SQLite and PostgreSQL), process them and
+delete the claim in the same commit that writes the results. Rows that keep
+failing are retried with backoff and quarantined after ``max_attempts``.
+"""
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, exists, literal, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import NLPTask, UserFeedback
+from app.utils.db_helpers import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+STATUS_CLAIMED = 'claimed'
+STATUS_RETRY = 'retry'
+STATUS_QUARANTINED = 'quarantined'
+# Seconds between trend bucket retention sweeps
+PRUNE_INTERVAL = 3600
+# Seconds between checks for a due dashboard recount (DASHBOARD_REFRESH_INTERVAL)
+RECOUNT_CHECK_INTERVAL = 60
+
+
+def default_worker_id():
+    """Identify a worker by host and pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _config(key, value):
+    if value is not None:
+        return value
+    return current_app.config[key]
+
+
+def claim_batch(worker_id, batch_size=None, max_attempts=None, lease_seconds=None):
+    """Claim up to ``batch_size`` feedback rows for ``worker_id``.
+
+    Returns ``(claim_token, feedback_ids)``. Expired leases (a worker died
+    mid-batch) and retries that are due are reclaimed first; a row whose
+    lease expired after ``max_attempts`` is quarantined instead.
+    """
+    batch_size = _config('NLP_WORKER_BATCH_SIZE', batch_size)
+    max_attempts = _config('NLP_WORKER_MAX_ATTEMPTS', max_attempts)
+    lease_seconds = _config('NLP_WORKER_LEASE_SECONDS', lease_seconds)
+
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=lease_seconds)
+    token = uuid.uuid4().hex
+
+    # Crashed on this row too many times: stop handing it out
+    db.session.execute(
+        update(NLPTask)
+        .where(NLPTask.status == STATUS_CLAIMED,
+               NLPTask.claimed_at < stale_before,
+               NLPTask.attempts >= max_attempts)
+        .values(status=STATUS_QUARANTINED, claim_token=None,
+                last_error='Lease expired on final attempt')
+    )
+
+    # Reclaim expired leases and retries that are due. The WHERE clause is
+    # re-checked per row, so concurrent workers never claim the same task.
+    reclaimable = or_(
+        and_(NLPTask.status == STATUS_CLAIMED, NLPTask.claimed_at < stale_before),
+        and_(NLPTask.status == STATUS_RETRY, NLPTask.available_at <= now)
+    )
+    candidates = select(NLPTask.feedback_id).where(reclaimable) \
+        .order_by(NLPTask.feedback_id).limit(batch_size).scalar_subquery()
+    reclaimed = db.session.execute(
+        update(NLPTask)
+        .where(NLPTask.feedback_id.in_(candidates), reclaimable)
+        .values(status=STATUS_CLAIMED, claim_token=token, worker_id=worker_id,
+                claimed_at=now, attempts=NLPTask.attempts + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    remaining = batch_size - max(reclaimed, 0)
+    if remaining > 0:
+        fresh = select(
+            UserFeedback.id, literal(STATUS_CLAIMED), literal(1), literal(token),
+            literal(worker_id), literal(now), literal(now)
+        ).where(
+            UserFeedback.is_processed == False,  # noqa: E712
+            ~exists().where(NLPTask.feedback_id == UserFeedback.id)
+        ).order_by(UserFeedback.id).limit(remaining)
+        columns = ['feedback_id', 'status', 'attempts', 'claim_token',
+                   'worker_id', 'claimed_at', 'created_at']
+
+        stmt = dialect_insert(NLPTask.__table__)
+        if stmt is not None:
+            db.session.execute(stmt.from_select(columns, fresh).on_conflict_do_nothing())
+        else:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(NLPTask.__table__.insert().from_select(columns, fresh))
+            except IntegrityError:
+                # Lost the race to another worker; its rows are simply skipped
+                pass
+
+    db.session.commit()
+
+    feedback_ids = db.session.execute(
+        select(NLPTask.feedback_id).where(NLPTask.claim_token == token)
+    ).scalars().all()
+    return token, feedback_ids
+
+
+def _mark_failed(token, feedback_id, error, max_attempts, retry_delay):
+    task = db.session.get(NLPTask, feedback_id)
+    if not task or task.claim_token != token:
+        return
+    task.last_error = error[:2000]
+    task.claim_token = None
+    if task.attempts >= max_attempts:
+        task.status = STATUS_QUARANTINED
+        logger.error(f"Quarantined feedback {feedback_id} after {task.attempts} attempts: {error}")
+    else:
+        task.status = STATUS_RETRY
+        # Exponential backoff: retry_delay, 2x, 4x, ...
+        task.available_at = datetime.utcnow() + timedelta(
+            seconds=retry_delay * (2 ** (task.attempts - 1)))
+
+
+def process_next_batch(worker_id=None, batch_size=None, max_attempts=None,
+                       lease_seconds=None, retry_delay=None):
+    """Claim and process one batch; returns ``(processed, failed)`` counts"""
+    from app.utils.nlp_processor import get_processor
+
+    worker_id = worker_id or default_worker_id()
+    max_attempts = _config('NLP_WORKER_MAX_ATTEMPTS', max_attempts)
+    retry_delay = _config('NLP_WORKER_RETRY_DELAY', retry_delay)
+
+    token, feedback_ids = claim_batch(worker_id, batch_size, max_attempts, lease_seconds)
+    if not feedback_ids:
+        return 0, 0
+
+    processor = get_processor()
+    rows = db.session.query(
+        UserFeedback.id, UserFeedback.content, UserFeedback.location
+    ).filter(UserFeedback.id.in_(feedback_ids)).all()
+    results, failures = processor.score_rows(rows)
+    deltas = processor.write_results(results)
+
+    # Claims for processed rows (and rows deleted meanwhile) are released
+    # in the same commit that stores the results.
+    finished = set(feedback_ids) - set(failures)
+    db.session.execute(
+        delete(NLPTask)
+        .where(NLPTask.feedback_id.in_(finished), NLPTask.claim_token == token)
+        .execution_options(synchronize_session=False)
+    )
+    for feedback_id, error in failures.items():
+        _mark_failed(token, feedback_id, error, max_attempts, retry_delay)
+    db.session.commit()
+
+    if results:
+        logger.info(f"Worker {worker_id} processed {len(results)} feedback rows ({len(failures)} failed)")
+        try:
+            if current_app.config['ALERT_DETECTOR'] == 'anomaly':
+                from app.utils.anomaly import detect_anomalies
+                detect_anomalies(deltas)
+            else:
+                from app.utils.alerts import check_for_trending_issues
+                check_for_trending_issues()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Trending check failed: {str(e)}")
+
+    return len(results), len(failures)
+
+
+def _prune_trend_buckets():
+    from app.utils.trends import prune_buckets
+
+    try:
+        prune_buckets(current_app.config['TRENDING_RETENTION_HOURS'])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Pruning trend buckets failed: {str(e)}")
+
+
+def _refresh_dashboard_counters():
+    from app.utils.dashboard import recount_if_stale
+    from app.utils.response_cache import invalidate_responses
+
+    try:
+        if recount_if_stale(current_app.config['DASHBOARD_REFRESH_INTERVAL']):
+            db.session.commit()
+            invalidate_responses('dashboard')
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Recounting dashboard counters failed: {str(e)}")
+
+
+def run_worker(worker_id=None, batch_size=None, poll_interval=None, once=False):
+    """Process feedback until interrupted; run one per CPU to scale out"""
+    from app.utils.nlp_processor import warm_up
+
+    worker_id = worker_id or default_worker_id()
+    poll_interval = _config('NLP_WORKER_POLL_INTERVAL', poll_interval)
+    warm_up()
+    logger.info(f"NLP worker {worker_id} started")
+
+    total = 0
+    next_prune = 0
+    next_recount = 0
+    while True:
+        try:
+            processed, failed = process_next_batch(worker_id, batch_size)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"NLP worker {worker_id} batch failed: {str(e)}")
+            processed, failed = 0, 0
+        total += processed
+
+        if time.monotonic() >= next_prune:
+            next_prune = time.monotonic() + PRUNE_INTERVAL
+            _prune_trend_buckets()
+        if time.monotonic() >= next_recount:
+            next_recount = time.monotonic() + RECOUNT_CHECK_INTERVAL
+            _refresh_dashboard_counters()
+
+        if once:
+            return total
+        if not processed and not failed:
+            time.sleep(poll_interval)
+
+
+def queue_stats():
+    """Counts for pending, in-flight, retrying and quarantined rows"""
+    pending = db.session.query(db.func.count(UserFeedback.id)).filter(
+        UserFeedback.is_processed == False  # noqa: E712
+    ).scalar()
+    by_status = dict(db.session.query(NLPTask.status, db.func.count()).group_by(NLPTask.status).all())
+    return {
+        'unprocessed': pending,
+        'claimed': by_status.get(STATUS_CLAIMED, 0),
+        'retry': by_status.get(STATUS_RETRY, 0),
+        'quarantined': by_status.get(STATUS_QUARANTINED, 0),
+    }
+
+
+def requeue_quarantined(feedback_ids=None):
+    """Release quarantined rows so the next worker pass retries them"""
+    stmt = delete(NLPTask).where(NLPTask.status == STATUS_QUARANTINED)
+    if feedback_ids:
+        stmt = stmt.where(NLPTask.feedback_id.in_(feedback_ids))
+    released = db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    return released
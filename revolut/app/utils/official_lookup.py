@@ -0,0 +1,103 @@
+# app/utils/official_lookup.py - Indexed official lookup for scorecard ratings
+"""Find an official by name, position and constituency without a table scan.
+
+``Official.lookup_key`` holds the three fields normalised (accents stripped,
+case-folded, whitespace collapsed) and is indexed, so matching a rating
+request is one index probe instead of ``lower()`` on three columns of every
+row. Keys are set wherever officials are created or edited.
+
+Resolved ``key -> id`` pairs are cached per process for
+``OFFICIAL_LOOKUP_CACHE_TTL`` seconds, so repeat ratings of the same official
+skip the query. Editing or deleting an official evicts its key in the
+process that handled it; other processes drop it when it expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from app import db
+from app.models import Official
+from app.utils.text_analysis import normalise_text
+
+
+def official_lookup_key(name, position, constituency):
+    return '|'.join(normalise_text(part) for part in (name, position, constituency))
+
+
+def set_lookup_key(official):
+    """Recompute ``official.lookup_key`` after its name, position or constituency changed"""
+    official.lookup_key = official_lookup_key(official.name, official.position, official.constituency)
+
+
+class OfficialKeyCache:
+    def __init__(self, ttl=300.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, official_id):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, official_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, key=None, official_id=None):
+        """Drop ``key`` and every key resolving to ``official_id``"""
+        with self._lock:
+            if key is not None:
+                self._entries.pop(key, None)
+            if official_id is not None:
+                for stale in [k for k, entry in self._entries.items() if entry[1] == official_id]:
+                    del self._entries[stale]
+
+
+def find_official_id(name, position, constituency):
+    """Id of the matching official or None; cached per process"""
+    key = official_lookup_key(name, position, constituency)
+    cache = get_official_key_cache()
+    official_id = cache.get(key)
+    if official_id is None:
+        official_id = db.session.query(Official.id).filter(Official.lookup_key == key) \
+            .order_by(Official.id).limit(1).scalar()
+        if official_id is not None:
+            cache.put(key, official_id)
+    return official_id
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_official_key_cache():
+    """Process-wide ``key -> id`` cache configured from the app config"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OfficialKeyCache(ttl=current_app.config['OFFICIAL_LOOKUP_CACHE_TTL'])
+    return _cache
+
+
+def forget_official_key(official_id):
+    get_official_key_cache().forget(official_id=official_id)
+
+
+def reset_official_key_cache():
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -0,0 +1,65 @@
+# app/utils/official_ratings.py - Scorecard ratings and running aggregates
+"""Rating storage for official scorecards.
+
+Each rating is an ``OfficialRating`` row. The official's count, sum, sum of
+squares and per-score histogram are bumped by a single
+``UPDATE official SET rating_count = rating_count + 1, ...`` in the same
+transaction, so submitting a rating costs the same however many ratings the
+official already has, and concurrent ratings never overwrite each other.
+"""
+import math
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app import db
+from app.models import Official, OfficialRating
+
+SCORES = range(1, 6)
+
+
+def record_rating(official_id, score, comment='', user_id='anonymous'):
+    """Store a rating and update the aggregates; returns False for an unknown official.
+
+    ``score`` must already be validated to 1-5. The caller commits.
+    """
+    histogram = getattr(Official, f'score_{score}')
+    count = db.func.coalesce(Official.rating_count, 0)
+    stmt = (
+        update(Official)
+        .where(Official.id == official_id)
+        .values({
+            Official.rating_count: count + 1,
+            Official.rating_sum: Official.rating_sum + score,
+            Official.rating_sum_sq: Official.rating_sum_sq + score * score,
+            histogram: histogram + 1,
+            # Right-hand sides see the values before this UPDATE
+            Official.average_score: db.cast(Official.rating_sum + score, db.Float) / (count + 1),
+            Official.last_updated: datetime.utcnow()
+        })
+        .execution_options(synchronize_session=False)
+    )
+    if not db.session.execute(stmt).rowcount:
+        return False
+
+    db.session.add(OfficialRating(official_id=official_id, score=score,
+                                  comment=comment, user_id=user_id))
+    return True
+
+
+def rating_summary(official):
+    """Average, standard deviation and score distribution from the aggregates"""
+    count = official.rating_count or 0
+    average = official.rating_sum / count if count else 0.0
+    variance = official.rating_sum_sq / count - average ** 2 if count else 0.0
+    return {
+        'average': round(average, 2),
+        'count': count,
+        'stddev': round(math.sqrt(max(variance, 0.0)), 2),
+        'distribution': {str(score): getattr(official, f'score_{score}') for score in SCORES}
+    }
+
+
+def forget_official(official_id):
+    """Delete an official's ratings ahead of the official; the caller commits"""
+    OfficialRating.query.filter_by(official_id=official_id).delete(synchronize_session=False)
@@ -0,0 +1,365 @@
+# app/utils/official_typeahead.py - In-memory typeahead over officials
+"""Ranked, typo-tolerant suggestions for the scorecards official search.
+
+Every word of an official's name, position and constituency is indexed in a
+sorted vocabulary, so a keystroke is a bisect per query word instead of
+``ILIKE '%...%'`` over the table. Each posting carries a weight: name words
+count most, then constituency, then position; whole words beat prefixes and
+longer prefixes beat shorter ones. Every query word must match somewhere;
+ties go to the official with more ratings. Ranked ids are cached per query
+until the indexed words change, so the short prefixes everyone types first
+are computed once.
+
+Misspellings are caught two ways. Words are also indexed by a phonetic
+skeleton that folds the usual variations in Kenyan names (``dh``/``d`` as in
+Odhiambo, ``l``/``r`` as in Kariuki/Kaliuki, doubled letters, dropped
+apostrophes in Nyong'o, Muhammad/Mohammed), and skeletons of four letters or
+more also match at one edit (a SymSpell-style deletion index). Both rank
+below a plain match.
+
+The index is built per process on first use (``gunicorn.conf.py`` warms it
+in each worker), updated in place when the admin screens create, edit or
+delete an official or a rating comes in, and rebuilt in the background of a
+request every ``OFFICIAL_TYPEAHEAD_REFRESH`` seconds to pick up edits made by
+other processes.
+"""
+import bisect
+import heapq
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from app import db
+from app.models import Official
+from app.utils.text_analysis import VOWELS, tokenize
+
+logger = logging.getLogger(__name__)
+
+# (column, weight) of the indexed fields, in row order after the id
+FIELDS = (('name', 3.0), ('position', 1.0), ('constituency', 2.0))
+PHONETIC_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.5
+FUZZY_MIN_LENGTH = 4
+MAX_QUERY_WORDS = 6
+APOSTROPHES = str.maketrans('', '', "'’ʼ`")
+PHONETIC_RULES = (('dh', 'd'), ('gh', 'g'), ('ph', 'f'), ('ck', 'k'), ('q', 'k'), ('muh', 'moh'), ('l', 'r'))
+
+
+def name_words(text):
+    """Normalised words of a name; apostrophes are dropped, not split on"""
+    return tokenize((text or '').translate(APOSTROPHES))
+
+
+def name_skeleton(word):
+    """Fold spelling variations common in Kenyan names"""
+    for pattern, replacement in PHONETIC_RULES:
+        word = word.replace(pattern, replacement)
+    word = ''.join(ch for i, ch in enumerate(word) if i == 0 or ch != word[i - 1])
+    if len(word) > 3 and word[-1] == 'h' and word[-2] in VOWELS:
+        word = word[:-1]
+    if len(word) > 3 and word[-1] == 'y' and word[-2] not in VOWELS:
+        word = word[:-1] + 'i'
+    return word
+
+
+def one_deletes(word):
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def within_one_edit(a, b):
+    """Optimal string alignment distance of ``a`` and ``b`` is at most 1"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diffs) == 1 or (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                                   and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def deep_size(obj, seen=None):
+    """Approximate bytes held by nested dicts, sets, tuples and strings"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (set, frozenset, tuple, list)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+class OfficialTypeahead:
+    """Word, phonetic and one-edit indexes over officials"""
+
+    def __init__(self, refresh=300.0, max_cached=2048):
+        self.refresh = refresh
+        self.max_cached = max_cached
+        self.built_at = time.monotonic()
+        self.build_ms = 0.0
+        # id -> (id, name, position, constituency, average_score, rating_count)
+        self._officials = {}
+        # id -> {word: field weight}, to unindex an official
+        self._words_of = {}
+        # word -> {id: field weight}, with the words sorted for prefix ranges
+        self._postings = {}
+        self._vocabulary = []
+        # The same over phonetic skeletons
+        self._phonetic = {}
+        self._phonetic_vocabulary = []
+        # one-deletion of a skeleton -> skeletons
+        self._deletes = {}
+        # (query words, limit) -> ranked ids; dropped whenever the words change
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._officials)
+
+    def expired(self):
+        return self.refresh > 0 and time.monotonic() - self.built_at > self.refresh
+
+    def load(self, rows):
+        """Index ``(id, name, position, constituency, average_score, rating_count)`` rows"""
+        started = time.perf_counter()
+        with self._lock:
+            for row in rows:
+                self._add(tuple(row), sort=False)
+            self._vocabulary = sorted(self._postings)
+            self._phonetic_vocabulary = sorted(self._phonetic)
+        self.build_ms = (time.perf_counter() - started) * 1000
+
+    def upsert(self, official):
+        row = (official.id, official.name, official.position, official.constituency,
+               official.average_score, official.rating_count)
+        with self._lock:
+            self._remove(official.id)
+            self._add(row)
+
+    def update_rating(self, official_id, average_score, rating_count):
+        """Refresh the rating shown with an official; rankings keep their cached order"""
+        with self._lock:
+            row = self._officials.get(official_id)
+            if row is not None:
+                self._officials[official_id] = row[:4] + (average_score, rating_count)
+
+    def remove(self, official_id):
+        with self._lock:
+            self._remove(official_id)
+
+    def suggest(self, query, limit=10):
+        """Best ``limit`` officials for ``query``, as API dicts"""
+        words = tuple(name_words(query)[:MAX_QUERY_WORDS])
+        if not words:
+            return []
+        with self._lock:
+            ids = self._results.get((words, limit))
+            if ids is None:
+                ids = self._rank(words, limit)
+                self._results[(words, limit)] = ids
+                if len(self._results) > self.max_cached:
+                    self._results.popitem(last=False)
+            else:
+                self._results.move_to_end((words, limit))
+            rows = [self._officials[official_id] for official_id in ids]
+        return [{
+            'id': official_id,
+            'name': name,
+            'position': position,
+            'constituency': constituency,
+            'current_rating': round(average_score, 2) if average_score else 0
+        } for official_id, name, position, constituency, average_score, _ in rows]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'officials': len(self._officials),
+                'words': len(self._vocabulary) + len(self._phonetic_vocabulary),
+                'postings': sum(len(postings) for index in (self._postings, self._phonetic)
+                                for postings in index.values()),
+                'fuzzy_keys': len(self._deletes),
+                'cached_results': len(self._results),
+                'bytes': deep_size((self._officials, self._words_of, self._postings, self._vocabulary,
+                                    self._phonetic, self._phonetic_vocabulary, self._deletes, self._results)),
+                'build_ms': round(self.build_ms, 1)
+            }
+
+    def _rank(self, words, limit):
+        scores = None
+        for word in words:
+            matches = self._matches(word)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {official_id: score + matches[official_id]
+                          for official_id, score in scores.items() if official_id in matches}
+            if not scores:
+                return []
+        officials = self._officials
+        return heapq.nlargest(limit, scores, key=lambda official_id: (
+            scores[official_id], officials[official_id][5] or 0, -official_id))
+
+    def _matches(self, word):
+        found = {}
+        self._collect(found, self._postings, self._vocabulary, word, 1.0)
+        skeleton = name_skeleton(word)
+        self._collect(found, self._phonetic, self._phonetic_vocabulary, skeleton, PHONETIC_WEIGHT)
+        if len(skeleton) >= FUZZY_MIN_LENGTH:
+            near = set()
+            for deletion in one_deletes(skeleton):
+                near.update(self._deletes.get(deletion, ()))
+            for candidate in near:
+                if candidate == skeleton or not within_one_edit(skeleton, candidate):
+                    continue
+                for official_id, weight in self._phonetic[candidate].items():
+                    weight *= FUZZY_WEIGHT
+                    if weight > found.get(official_id, 0):
+                        found[official_id] = weight
+        return found
+
+    @staticmethod
+    def _collect(found, index, vocabulary, prefix, factor):
+        """Best weight per official over the words starting with ``prefix``"""
+        first = bisect.bisect_left(vocabulary, prefix)
+        last = bisect.bisect_left(vocabulary, prefix + '\uffff', first)
+        for term in vocabulary[first:last]:
+            # Whole words beat prefixes, longer prefixes beat shorter ones
+            scale = factor if len(term) == len(prefix) else factor * (0.5 + 0.4 * len(prefix) / len(term))
+            for official_id, weight in index[term].items():
+                weight *= scale
+                if weight > found.get(official_id, 0):
+                    found[official_id] = weight
+
+    def _add(self, row, sort=True):
+        official_id = row[0]
+        words = {}
+        for text, (_, weight) in zip(row[1:], FIELDS):
+            for word in name_words(text):
+                words[word] = max(words.get(word, 0), weight)
+        self._officials[official_id] = row
+        self._words_of[official_id] = words
+        self._results.clear()
+        for word, weight in words.items():
+            self._post(self._postings, self._vocabulary if sort else None, word, official_id, weight)
+            skeleton = name_skeleton(word)
+            if skeleton not in self._phonetic and len(skeleton) >= FUZZY_MIN_LENGTH:
+                for deletion in one_deletes(skeleton):
+                    self._deletes.setdefault(deletion, set()).add(skeleton)
+            self._post(self._phonetic, self._phonetic_vocabulary if sort else None, skeleton, official_id, weight)
+
+    def _remove(self, official_id):
+        self._officials.pop(official_id, None)
+        words = self._words_of.pop(official_id, None)
+        if words is None:
+            return
+        self._results.clear()
+        for word in words:
+            self._unpost(self._postings, self._vocabulary, word, official_id)
+            skeleton = name_skeleton(word)
+            if self._unpost(self._phonetic, self._phonetic_vocabulary, skeleton, official_id) \
+                    and len(skeleton) >= FUZZY_MIN_LENGTH:
+                for deletion in one_deletes(skeleton):
+                    skeletons = self._deletes[deletion]
+                    skeletons.discard(skeleton)
+                    if not skeletons:
+                        del self._deletes[deletion]
+
+    @staticmethod
+    def _post(index, vocabulary, term, official_id, weight):
+        postings = index.get(term)
+        if postings is None:
+            postings = index[term] = {}
+            if vocabulary is not None:
+                bisect.insort(vocabulary, term)
+        if weight > postings.get(official_id, 0):
+            postings[official_id] = weight
+
+    @staticmethod
+    def _unpost(index, vocabulary, term, official_id):
+        """Drop a posting; True when ``term`` has no officials left"""
+        postings = index.get(term)
+        if postings is None:
+            return False
+        postings.pop(official_id, None)
+        if postings:
+            return False
+        del index[term]
+        del vocabulary[bisect.bisect_left(vocabulary, term)]
+        return True
+
+
+def build_official_typeahead(refresh=300.0):
+    index = OfficialTypeahead(refresh=refresh)
+    index.load(db.session.query(Official.id, Official.name, Official.position, Official.constituency,
+                                Official.average_score, Official.rating_count).yield_per(1000))
+    logger.info(f"Official typeahead built: {len(index)} officials in {index.build_ms:.1f} ms")
+    return index
+
+
+_typeahead = None
+_typeahead_lock = threading.Lock()
+
+
+def get_official_typeahead():
+    """Process-wide index; built on first use and rebuilt once it expires.
+
+    While one request rebuilds an expired index the others keep using it.
+    """
+    global _typeahead
+    index = _typeahead
+    if index is None:
+        with _typeahead_lock:
+            if _typeahead is None:
+                _typeahead = build_official_typeahead(current_app.config['OFFICIAL_TYPEAHEAD_REFRESH'])
+            index = _typeahead
+    elif index.expired() and _typeahead_lock.acquire(blocking=False):
+        try:
+            if _typeahead is index:
+                _typeahead = index = build_official_typeahead(current_app.config['OFFICIAL_TYPEAHEAD_REFRESH'])
+        finally:
+            _typeahead_lock.release()
+    return index
+
+
+def suggest_officials(query, limit=10):
+    return get_official_typeahead().suggest(query, limit=limit)
+
+
+def index_official(official):
+    """Reindex a created or edited official if this process has an index"""
+    if _typeahead is not None:
+        _typeahead.upsert(official)
+
+
+def update_official_rating(official):
+    if _typeahead is not None:
+        _typeahead.update_rating(official.id, official.average_score, official.rating_count)
+
+
+def forget_official_suggestions(official_id):
+    if _typeahead is not None:
+        _typeahead.remove(official_id)
+
+
+def warm_official_typeahead():
+    """Build the index ahead of traffic; returns its ``stats()``"""
+    return get_official_typeahead().stats()
+
+
+def reset_official_typeahead():
+    global _typeahead
+    with _typeahead_lock:
+        _typeahead = None
@@ -0,0 +1,62 @@
+# app/utils/pagination.py - Keyset (cursor) pagination
+"""Keyset pagination on ``(created_at, id)``, newest first.
+
+Instead of ``OFFSET`` (which reads and discards every earlier row), each page
+continues from the last row of the previous one with
+``WHERE (created_at, id) < (:created_at, :id)``, so with an index on
+``(created_at, id)`` every page costs the same however deep it is. The
+position is handed to clients as an opaque cursor string.
+
+``created_at`` is nullable in older rows. Those come last, newest id first,
+from a second query that only runs once the dated rows run out, so both
+parts keep using the index.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(created_at, row_id):
+    payload = json.dumps([created_at.isoformat() if created_at is not None else None, row_id],
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)``; raises ValueError for a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return (datetime.fromisoformat(created_at) if created_at is not None else None), int(row_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def keyset_page(query, created_col, id_col, cursor=None, per_page=20):
+    """One page of ``query`` newest first; returns ``(rows, next_cursor)``.
+
+    ``query`` must select entities (or rows) exposing the two columns as
+    attributes. Rows without ``created_at`` come after all the others.
+    ``next_cursor`` is None on the last page.
+    """
+    created_at, row_id = decode_cursor(cursor) if cursor else (None, None)
+    rows = []
+    if row_id is None or created_at is not None:
+        dated = query.filter(created_col.isnot(None))
+        if row_id is not None:
+            dated = dated.filter(tuple_(created_col, id_col) < tuple_(created_at, row_id))
+        rows = dated.order_by(created_col.desc(), id_col.desc()).limit(per_page + 1).all()
+    if len(rows) <= per_page:
+        undated = query.filter(created_col.is_(None))
+        if row_id is not None and created_at is None:
+            undated = undated.filter(id_col < row_id)
+        rows += undated.order_by(id_col.desc()).limit(per_page + 1 - len(rows)).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
+    return rows, next_cursor
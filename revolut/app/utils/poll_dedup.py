@@ -0,0 +1,198 @@
+# app/utils/poll_dedup.py - One vote per voter per poll
+"""Per-voter deduplication for poll votes.
+
+The ``poll_voter`` primary key ``(poll_id, voter_key)`` is the authority: a
+vote only counts if ``claim_voter`` manages to insert its row, which is a
+single indexed INSERT whatever the size of the poll.
+
+In front of it each process keeps a Bloom filter per poll of the voters it
+has recorded or seen rejected, so a repeat voter (a USSD retry, a double
+tap) is turned away without touching the database. The filter grows by
+adding larger slices as a poll fills up and costs about
+``1.44 * log2(1 / error_rate)`` bits per voter: about 4 MB for a million
+voters at the default rate. A false positive refuses a new voter, so
+``POLL_VOTER_ERROR_RATE`` is kept small. Filters start empty on restart;
+voters from before that are still caught by the index.
+"""
+import hashlib
+import hmac
+import math
+import re
+import threading
+import uuid
+
+from flask import current_app, request, session
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import PollVoter
+from app.utils.db_helpers import dialect_insert
+from app.utils.vote_buffer import forget_buffered_poll
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+    __slots__ = ('capacity', 'size', 'hashes', 'bits', 'count')
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class ScalableBloomFilter:
+    """Bloom filter that adds a slice twice as large whenever one fills up.
+
+    Slice ``i`` gets ``error_rate / 2 ** (i + 1)``, so the overall
+    false-positive rate stays below ``error_rate``.
+    """
+
+    def __init__(self, capacity=10000, error_rate=1e-6):
+        self.error_rate = error_rate
+        self.slices = [BloomFilter(capacity, error_rate / 2)]
+
+    def add(self, key):
+        current = self.slices[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * 2, self.error_rate / 2 ** (len(self.slices) + 1))
+            self.slices.append(current)
+        current.add(key)
+
+    def __contains__(self, key):
+        return any(key in bloom for bloom in self.slices)
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.slices)
+
+    @property
+    def nbytes(self):
+        return sum(len(bloom.bits) for bloom in self.slices)
+
+
+class VoterIndex:
+    """Process-local Bloom filters of voters, one per poll"""
+
+    def __init__(self, capacity=10000, error_rate=1e-6):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filters = {}
+        self._lock = threading.Lock()
+
+    def seen(self, poll_id, voter_key):
+        """True if ``voter_key`` has (almost certainly) voted in ``poll_id``"""
+        bloom = self._filters.get(poll_id)
+        return bloom is not None and voter_key in bloom
+
+    def add(self, poll_id, voter_key):
+        with self._lock:
+            bloom = self._filters.get(poll_id)
+            if bloom is None:
+                bloom = self._filters[poll_id] = ScalableBloomFilter(self.capacity, self.error_rate)
+            bloom.add(voter_key)
+
+    def forget(self, poll_id):
+        with self._lock:
+            self._filters.pop(poll_id, None)
+
+    def stats(self):
+        return {
+            'polls': len(self._filters),
+            'voters': sum(len(bloom) for bloom in self._filters.values()),
+            'bytes': sum(bloom.nbytes for bloom in self._filters.values())
+        }
+
+
+def claim_voter(poll_id, voter_key, option_id):
+    """Insert the ``poll_voter`` row; False if this voter already voted.
+
+    The caller commits.
+    """
+    row = {'poll_id': poll_id, 'voter_key': voter_key, 'option_id': option_id}
+    stmt = dialect_insert(PollVoter.__table__)
+    if stmt is not None:
+        return db.session.execute(stmt.on_conflict_do_nothing(), row).rowcount == 1
+    try:
+        with db.session.begin_nested():
+            db.session.execute(PollVoter.__table__.insert(), row)
+    except IntegrityError:
+        return False
+    return True
+
+
+def forget_poll(poll_id):
+    """Delete a poll's voter rows and filter; call before deleting the poll"""
+    PollVoter.query.filter_by(poll_id=poll_id).delete(synchronize_session=False)
+    get_voter_index().forget(poll_id)
+    forget_buffered_poll(poll_id)
+
+
+def normalise_phone(phone):
+    """Digits only, with a leading 0 replaced by the Kenyan country code"""
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 10 and digits.startswith('0'):
+        digits = '254' + digits[1:]
+    return digits
+
+
+def from_trusted_gateway():
+    """True when the request carries the SMS/USSD gateway's ``POLL_GATEWAY_TOKEN``"""
+    token = current_app.config.get('POLL_GATEWAY_TOKEN')
+    supplied = request.headers.get('X-Gateway-Token', '')
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def voter_key_for_request(data):
+    """``user:<id>`` when logged in, ``phone:<digits>`` from the gateway, else ``session:<token>``.
+
+    A phone number in the body is only believed from the trusted gateway;
+    anyone else could vote repeatedly under made-up numbers, or lock a real
+    owner out by voting first with theirs.
+    """
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    if from_trusted_gateway():
+        phone = normalise_phone((data or {}).get('phone_number') or (data or {}).get('phone'))
+        if phone:
+            return f"phone:{phone}"
+    if 'voter_token' not in session:
+        session['voter_token'] = uuid.uuid4().hex
+    return f"session:{session['voter_token']}"
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_voter_index():
+    """Process-wide voter index configured from the app config"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = VoterIndex(capacity=current_app.config['POLL_VOTER_FILTER_CAPACITY'],
+                                    error_rate=current_app.config['POLL_VOTER_ERROR_RATE'])
+    return _index
+
+
+def reset_voter_index():
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,163 @@
+# app/utils/poll_results.py - Cached poll result snapshots
+"""Serialised poll results, computed once per change instead of per request.
+
+A snapshot holds everything about a poll's results that only changes when
+someone votes or the poll is edited: question, options with percentages,
+total votes, dates and the creator's username. The listing endpoints build
+their responses from snapshots and only work out the time-dependent fields
+(``is_active``, ``days_remaining``) per request.
+
+Snapshots are cached per process. Voting, editing, creating or deleting a
+poll invalidates them in the process that handled it; other processes pick
+the change up within ``POLL_RESULTS_CACHE_TTL`` seconds. ``conditional_json``
+adds an ETag so clients revalidate with ``If-None-Match`` and get a 304 when
+nothing changed.
+"""
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, jsonify
+
+from app import db
+from app.models import Poll, User
+from app.utils.poll_votes import load_options, with_percentages
+from app.utils.response_cache import conditional, invalidate_responses
+
+
+class PollResultCache:
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._snapshots = {}
+        self._listing = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_listing(self):
+        """Poll ids newest first, or None when stale"""
+        with self._lock:
+            if self._listing is None or self._listing[0] < time.monotonic():
+                return None
+            return self._listing[1]
+
+    def put_listing(self, poll_ids):
+        with self._lock:
+            self._listing = (time.monotonic() + self.ttl, list(poll_ids))
+
+    def get_many(self, poll_ids):
+        """``{poll_id: snapshot}`` for the fresh entries among ``poll_ids``"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for poll_id in poll_ids:
+                entry = self._snapshots.get(poll_id)
+                if entry is not None and entry[0] >= now:
+                    found[poll_id] = entry[1]
+            self.hits += len(found)
+            self.misses += len(poll_ids) - len(found)
+        return found
+
+    def put_many(self, snapshots):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for poll_id, snapshot in snapshots.items():
+                self._snapshots[poll_id] = (expires, snapshot)
+
+    def invalidate(self, poll_id=None):
+        """Drop one poll's snapshot (or all of them) and the listing"""
+        with self._lock:
+            if poll_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(poll_id, None)
+            self._listing = None
+
+
+def build_snapshots(polls):
+    """Result snapshots for ``polls``: one options query and one username query"""
+    options_by_poll = load_options(polls)
+    creator_ids = {poll.created_by for poll in polls if poll.created_by}
+    usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(creator_ids))) if creator_ids else {}
+
+    snapshots = {}
+    for poll in polls:
+        options, total_votes = with_percentages(options_by_poll[poll.id])
+        snapshots[poll.id] = {
+            'id': poll.id,
+            'question': poll.question,
+            'options': options,
+            'total_votes': total_votes,
+            'expires_at': poll.expires_at,
+            'created_at': poll.created_at,
+            'created_by': usernames.get(poll.created_by, 'Unknown')
+        }
+    return snapshots
+
+
+def poll_snapshots(poll_ids=None):
+    """Snapshots of ``poll_ids`` in order (default: every poll, newest first).
+
+    Only missing or stale snapshots are rebuilt.
+    """
+    cache = get_result_cache()
+    if poll_ids is None:
+        poll_ids = cache.get_listing()
+        if poll_ids is None:
+            poll_ids = [poll_id for poll_id, in db.session.query(Poll.id).order_by(Poll.created_at.desc())]
+            cache.put_listing(poll_ids)
+
+    snapshots = cache.get_many(poll_ids)
+    missing = [poll_id for poll_id in poll_ids if poll_id not in snapshots]
+    if missing:
+        built = build_snapshots(Poll.query.filter(Poll.id.in_(missing)).all())
+        cache.put_many(built)
+        snapshots.update(built)
+    return [snapshots[poll_id] for poll_id in poll_ids if poll_id in snapshots]
+
+
+def with_status(snapshot, fields, now=None):
+    """``fields`` of ``snapshot`` plus ISO dates, ``is_active``, ``days_remaining`` and ``status``"""
+    now = now or datetime.utcnow()
+    expires_at = snapshot['expires_at']
+    is_active = expires_at > now if expires_at else True
+    data = {
+        **snapshot,
+        'expires_at': expires_at.isoformat() if expires_at else None,
+        'created_at': snapshot['created_at'].isoformat() if snapshot['created_at'] else None,
+        'is_active': is_active,
+        'days_remaining': (expires_at - now).days if expires_at and is_active else 0,
+        'status': 'Active' if is_active else 'Expired'
+    }
+    return {field: data[field] for field in fields}
+
+
+def conditional_json(payload):
+    """JSON response with an ETag; 304 when it matches ``If-None-Match``"""
+    return conditional(jsonify(payload))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Process-wide snapshot cache configured from the app config"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PollResultCache(ttl=current_app.config['POLL_RESULTS_CACHE_TTL'])
+    return _cache
+
+
+def invalidate_poll(poll_id=None):
+    get_result_cache().invalidate(poll_id)
+    # Listings and the dashboard show poll results too
+    invalidate_responses('polls', 'dashboard')
+
+
+def reset_result_cache():
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -0,0 +1,288 @@
+# app/utils/poll_stream.py - Live poll results over Server-Sent Events
+"""Fan-out hub for ``GET /api/polls/<id>/stream``.
+
+``vote_on_poll`` publishes each vote as a delta (``{option_id: +n}``). The
+hub numbers the deltas per poll, keeps the last ``history`` of them and
+pushes each one to every subscriber queue for that poll, so one
+notification serves any number of open streams.
+
+Event ids are ``<hub epoch>-<poll seq>``. A client reconnecting with
+``Last-Event-ID`` gets the deltas it missed replayed from the history. If
+the id is older than the history or came from another process (different
+epoch), it gets a fresh ``snapshot`` event instead.
+
+Across workers the hub relays deltas through a broker (``POLL_STREAM_BACKEND``):
+
+* ``local``     no broker; streams only see votes cast in the same process
+* ``memory``    in-process bus shared by every hub; a stand-in for tests
+* ``postgres``  ``NOTIFY``/``LISTEN`` on one dedicated connection per process
+
+Subscribers that fall ``queue_size`` events behind are disconnected and
+catch up through ``Last-Event-ID``. Each open stream holds a worker thread,
+so a hub takes at most ``max_subscribers`` of them at once.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import uuid
+from collections import deque
+
+from flask import current_app
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'poll_votes'
+# Reconnect delay suggested to EventSource clients
+RETRY_MS = 3000
+
+
+def format_event(data, event_id=None, event='message'):
+    """One SSE frame"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event != 'message':
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    def __init__(self, poll_id, queue_size):
+        self.poll_id = poll_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def get(self, timeout):
+        """Next ``(event_id, data)`` or None after ``timeout`` seconds"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class PollStreamHub:
+    def __init__(self, history=100, queue_size=100, broker=None, max_subscribers=None):
+        self.history = history
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._count = 0
+        self.epoch = uuid.uuid4().hex[:8]
+        self._seq = {}
+        self._events = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.broker = broker
+        if broker is not None:
+            broker.start(self._receive)
+
+    def publish(self, poll_id, deltas):
+        """Announce ``{option_id: votes}`` added to ``poll_id``"""
+        deltas = {int(option_id): votes for option_id, votes in deltas.items() if votes}
+        if not deltas:
+            return
+        if self.broker is not None:
+            # The vote is already committed; a lost notification only delays streams
+            try:
+                self.broker.publish(json.dumps({'poll_id': poll_id, 'deltas': deltas}))
+            except Exception as e:
+                logger.error(f"Failed to publish poll {poll_id} update: {e}")
+        else:
+            self._dispatch(poll_id, deltas)
+
+    def _receive(self, message):
+        payload = json.loads(message)
+        self._dispatch(payload['poll_id'], {int(k): v for k, v in payload['deltas'].items()})
+
+    def _dispatch(self, poll_id, deltas):
+        with self._lock:
+            seq = self._seq[poll_id] = self._seq.get(poll_id, 0) + 1
+            event = (f"{self.epoch}-{seq}", {'poll_id': poll_id, 'deltas': deltas})
+            events = self._events.get(poll_id)
+            if events is None:
+                events = self._events[poll_id] = deque(maxlen=self.history)
+            events.append((seq, event))
+            subscribers = list(self._subscribers.get(poll_id, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                subscription.closed = True
+                self.unsubscribe(subscription)
+
+    def subscribe(self, poll_id, last_event_id=None):
+        """Register a subscriber; returns ``(subscription, replay, current_id)``.
+
+        ``replay`` is the list of events after ``last_event_id``, or None
+        when they are no longer known and the caller must send a snapshot.
+        ``current_id`` is the id to give that snapshot. Returns
+        ``(None, None, None)`` when ``max_subscribers`` are already open.
+        """
+        subscription = Subscription(poll_id, self.queue_size)
+        with self._lock:
+            if self.max_subscribers is not None and self._count >= self.max_subscribers:
+                return None, None, None
+            self._count += 1
+            self._subscribers.setdefault(poll_id, set()).add(subscription)
+            seq = self._seq.get(poll_id, 0)
+            replay = self._replay(poll_id, last_event_id, seq)
+        return subscription, replay, f"{self.epoch}-{seq}"
+
+    def _replay(self, poll_id, last_event_id, seq):
+        if not last_event_id:
+            return None
+        epoch, _, last_seq = last_event_id.partition('-')
+        if epoch != self.epoch or not last_seq.isdigit():
+            return None
+        last_seq = int(last_seq)
+        if last_seq >= seq:
+            return []
+        events = self._events.get(poll_id, ())
+        if not events or events[0][0] > last_seq + 1:
+            return None
+        return [event for event_seq, event in events if event_seq > last_seq]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.poll_id)
+            if subscribers is not None and subscription in subscribers:
+                self._count -= 1
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.poll_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'polls': len(self._subscribers),
+                'subscribers': sum(len(subs) for subs in self._subscribers.values())
+            }
+
+    def close(self):
+        if self.broker is not None:
+            self.broker.stop()
+
+
+class MemoryBus:
+    """Message bus shared by ``MemoryBroker`` instances in one process"""
+
+    def __init__(self):
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        with self._lock:
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(message)
+
+
+class MemoryBroker:
+    """Cross-worker stand-in: hubs sharing a ``MemoryBus`` act like separate workers"""
+    name = 'memory'
+
+    def __init__(self, bus=None, **kwargs):
+        self.bus = bus or default_bus
+        self._listener = None
+
+    def start(self, callback):
+        self._listener = callback
+        with self.bus._lock:
+            self.bus.listeners.append(callback)
+
+    def publish(self, message):
+        self.bus.publish(message)
+
+    def stop(self):
+        with self.bus._lock:
+            if self._listener in self.bus.listeners:
+                self.bus.listeners.remove(self._listener)
+
+
+class PostgresBroker:
+    """``NOTIFY`` on publish, one ``LISTEN`` connection and thread per process"""
+    name = 'postgres'
+
+    def __init__(self, engine=None, channel=CHANNEL, poll_timeout=5.0, **kwargs):
+        self.engine = engine or db.engine
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, callback):
+        self._thread = threading.Thread(target=self._listen, args=(callback,),
+                                        name='poll-stream-listener', daemon=True)
+        self._thread.start()
+
+    def _listen(self, callback):
+        while not self._stopped.is_set():
+            try:
+                connection = self.engine.raw_connection()
+                # Out of the pool: an autocommit session must never serve a request
+                connection.detach()
+                try:
+                    raw = connection.driver_connection
+                    raw.set_session(autocommit=True)
+                    raw.cursor().execute(f"LISTEN {self.channel}")
+                    while not self._stopped.is_set():
+                        if select.select([raw], [], [], self.poll_timeout) == ([], [], []):
+                            continue
+                        raw.poll()
+                        while raw.notifies:
+                            callback(raw.notifies.pop(0).payload)
+                finally:
+                    connection.close()
+            except Exception as e:
+                logger.error(f"Poll stream listener failed, reconnecting: {e}")
+                self._stopped.wait(self.poll_timeout)
+
+    def publish(self, message):
+        with self.engine.connect() as connection:
+            connection.execute(db.text("SELECT pg_notify(:channel, :payload)"),
+                               {'channel': self.channel, 'payload': message})
+            connection.commit()
+
+    def stop(self):
+        self._stopped.set()
+
+
+BROKERS = {broker.name: broker for broker in (MemoryBroker, PostgresBroker)}
+default_bus = MemoryBus()
+
+
+def make_hub(backend='local', **options):
+    if backend == 'local':
+        return PollStreamHub(**options)
+    if backend not in BROKERS:
+        raise ValueError(f"Unknown poll stream backend '{backend}'. Choose from: local, {', '.join(BROKERS)}")
+    return PollStreamHub(broker=BROKERS[backend](), **options)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_stream_hub():
+    """Process-wide hub configured from the app config"""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                config = current_app.config
+                _hub = make_hub(config['POLL_STREAM_BACKEND'], history=config['POLL_STREAM_HISTORY'],
+                                max_subscribers=config['POLL_STREAM_MAX_PER_WORKER'])
+    return _hub
+
+
+def reset_stream_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is not None:
+            _hub.close()
+        _hub = None
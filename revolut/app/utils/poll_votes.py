@@ -0,0 +1,161 @@
+# app/utils/poll_votes.py - Poll option rows and atomic vote counters
+"""Vote storage for polls.
+
+Each option is a ``PollOption`` row and a vote is a single
+``UPDATE poll_option SET votes = votes + 1`` on it, so concurrent votes are
+never lost and a vote no longer rewrites the poll's JSON.
+
+Polls at ``POLL_OPTIONS_VERSION`` are read straight from their rows. Older
+polls are upgraded by ``flask polls migrate-options`` (``upgrade_polls``),
+or by their first vote; until then readers normalise their JSON on the fly.
+
+With ``POLL_VOTE_MODE=buffered`` votes are batched by ``vote_buffer`` first
+and ``load_options`` adds the votes still waiting to be flushed.
+"""
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import db
+from app.models import POLL_OPTIONS_VERSION, Poll, PollOption
+from app.utils.db_helpers import dialect_insert
+
+
+def legacy_options(raw_options):
+    """Normalise a version 1 ``Poll.options`` value without touching the poll.
+
+    Strings become options and missing ids, texts and vote counts are filled
+    in from the position.
+    """
+    if not isinstance(raw_options, list):
+        return []
+    options = []
+    for i, option in enumerate(raw_options):
+        if isinstance(option, dict):
+            options.append({
+                'id': option.get('id', i + 1),
+                'text': option.get('text', f"Option {i + 1}"),
+                'votes': option.get('votes', 0)
+            })
+        elif isinstance(option, str):
+            options.append({'id': i + 1, 'text': option, 'votes': 0})
+    return options
+
+
+def build_option_rows(option_texts):
+    """``PollOption`` rows for a new poll; assign to ``poll.option_rows``"""
+    return [PollOption(option_id=i + 1, text=text, votes=0) for i, text in enumerate(option_texts)]
+
+
+def upgrade_poll(poll):
+    """Bring a version 1 poll to ``POLL_OPTIONS_VERSION``; the caller commits.
+
+    Rewrites ``Poll.options`` in the normalised form and creates option rows
+    carrying the JSON vote counts over. Safe to race and to repeat: rows
+    another request created first are left alone.
+    """
+    options = legacy_options(poll.options)
+    rows = [{'poll_id': poll.id, 'option_id': option['id'], 'text': option['text'],
+             'votes': option['votes'] or 0} for option in options]
+    if rows:
+        stmt = dialect_insert(PollOption.__table__)
+        if stmt is not None:
+            db.session.execute(stmt.on_conflict_do_nothing(), rows)
+        else:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(PollOption.__table__.insert(), rows)
+            except IntegrityError:
+                pass
+
+    db.session.execute(
+        update(Poll).where(Poll.id == poll.id)
+        .values(options=options, options_version=POLL_OPTIONS_VERSION)
+        .execution_options(synchronize_session=False)
+    )
+    # Keep the loaded object in step without expiring it
+    set_committed_value(poll, 'options', options)
+    set_committed_value(poll, 'options_version', POLL_OPTIONS_VERSION)
+    return len(rows)
+
+
+def upgrade_polls(batch_size=500, progress=None):
+    """Upgrade every poll below ``POLL_OPTIONS_VERSION``, one commit per batch.
+
+    Resumable: each batch is marked upgraded in the commit that writes it, so
+    an interrupted run just picks up the remaining polls.
+    """
+    upgraded = 0
+    last_id = 0
+    while True:
+        polls = (Poll.query
+                 .filter(Poll.options_version < POLL_OPTIONS_VERSION, Poll.id > last_id)
+                 .order_by(Poll.id).limit(batch_size).all())
+        if not polls:
+            return upgraded
+        for poll in polls:
+            upgrade_poll(poll)
+        db.session.commit()
+        upgraded += len(polls)
+        last_id = polls[-1].id
+        if progress:
+            progress(upgraded)
+
+
+def record_vote(poll, option_id, count=1):
+    """Atomically add ``count`` votes; returns False when the option doesn't exist.
+
+    The caller commits.
+    """
+    stmt = (
+        update(PollOption)
+        .where(PollOption.poll_id == poll.id, PollOption.option_id == option_id)
+        .values(votes=PollOption.votes + count)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(stmt).rowcount:
+        return True
+
+    if poll.options_version >= POLL_OPTIONS_VERSION:
+        return False
+    upgrade_poll(poll)
+    return bool(db.session.execute(stmt).rowcount)
+
+
+def load_options(polls):
+    """``{poll_id: [{'id', 'text', 'votes'}]}`` for many polls in one query"""
+    polls = list(polls)
+    if not polls:
+        return {}
+    by_poll = {poll.id: [] for poll in polls}
+    rows = db.session.query(
+        PollOption.poll_id, PollOption.option_id, PollOption.text, PollOption.votes
+    ).filter(PollOption.poll_id.in_(list(by_poll))).order_by(PollOption.poll_id, PollOption.option_id)
+    for poll_id, option_id, text, votes in rows:
+        by_poll[poll_id].append({'id': option_id, 'text': text, 'votes': votes})
+
+    for poll in polls:
+        if poll.options_version < POLL_OPTIONS_VERSION and not by_poll[poll.id]:
+            by_poll[poll.id] = legacy_options(poll.options)
+
+    # Votes acknowledged by the write-behind buffer but not yet flushed
+    from app.utils.vote_buffer import get_vote_buffer
+    buffer = get_vote_buffer()
+    if buffer is not None:
+        deltas = buffer.pending(by_poll)
+        if deltas:
+            by_poll = {poll_id: [{**option, 'votes': (option['votes'] or 0) + deltas.get((poll_id, option['id']), 0)}
+                                 for option in options]
+                       for poll_id, options in by_poll.items()}
+    return by_poll
+
+
+def with_percentages(options):
+    """Return ``(options with a 'percentage' key, total_votes)``"""
+    total_votes = sum(option['votes'] or 0 for option in options)
+    result = []
+    for option in options:
+        votes = option['votes'] or 0
+        percentage = (votes / total_votes * 100) if total_votes > 0 else 0
+        result.append({**option, 'votes': votes, 'percentage': round(percentage, 1)})
+    return result, total_votes
@@ -0,0 +1,341 @@
+# app/utils/response_cache.py - Cached JSON responses for read-heavy public endpoints
+"""``@cached_response(ttl, tags)`` stores a view's JSON body once and serves it
+to every visitor asking the same question.
+
+An entry is keyed by the endpoint, its URL arguments, the sorted query
+string, the request locale and the current version of each of its tags.
+Write paths call ``invalidate_responses(tag, ...)``, which bumps the tag
+versions so every key built on them is simply never asked for again;
+nothing has to enumerate the keys.
+
+Responses carry an ETag and ``Last-Modified``, so a client revalidating
+with ``If-None-Match`` or ``If-Modified-Since`` gets a 304 (through
+``conditional``, which ``poll_results.conditional_json`` shares).
+
+Stampede protection: an entry outlives its ``ttl`` by a grace period. When
+it goes stale (or is missing) one request takes a short lock and recomputes
+it; meanwhile the others serve the stale body or, with nothing to serve,
+wait for the new one up to ``RESPONSE_CACHE_LOCK_TIMEOUT`` seconds.
+
+Backends (``RESPONSE_CACHE_BACKEND``):
+
+* ``local``  per-process LRU of ``RESPONSE_CACHE_MAX_ENTRIES`` entries; a
+             write invalidates the process that handled it and other
+             processes catch up within the endpoint's ttl
+* ``redis``  shared by every process at ``RESPONSE_CACHE_URL``; needs the
+             ``redis`` package. Invalidation is immediate everywhere
+* ``none``   no caching
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_babel import get_locale
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'response'
+# Entries are kept this many ttls beyond their freshness to serve while one
+# request recomputes them
+STALE_FACTOR = 1
+WAIT_STEP = 0.01
+WAIT_STEP_MAX = 0.1
+
+
+class MemoryBackend:
+    """In-process LRU store; tag versions are kept apart so eviction never resets them"""
+    name = 'local'
+
+    def __init__(self, max_entries=1000, **kwargs):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            return [self._counters.get(key, self._live(key, now)) for key in keys]
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        """Set ``key`` unless it exists; True when it was set"""
+        with self._lock:
+            if self._counters.get(key, self._live(key, time.monotonic())) is not None:
+                return False
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def add_counter(self, key, value):
+        with self._lock:
+            self._counters.setdefault(key, value)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisBackend:
+    """Shared store; entries are JSON strings, tag versions plain counters"""
+    name = 'redis'
+
+    def __init__(self, url=None, client=None, **kwargs):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("RESPONSE_CACHE_BACKEND=redis needs the redis package (pip install redis)")
+            client = redis.Redis.from_url(url or 'redis://localhost:6379/0')
+        self.client = client
+
+    @staticmethod
+    def _load(raw):
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        return json.loads(raw)
+
+    def get_many(self, keys):
+        return [self._load(raw) for raw in self.client.mget(keys)]
+
+    def get(self, key):
+        return self._load(self.client.get(key))
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(key, json.dumps(value), nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def add_counter(self, key, value):
+        self.client.set(key, value, nx=True)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+
+BACKENDS = {backend.name: backend for backend in (MemoryBackend, RedisBackend)}
+
+
+def conditional(response, last_modified=None):
+    """Revalidate-every-time caching headers; 304 when the request's validators match"""
+    response.headers['Cache-Control'] = 'no-cache'
+    if response.get_etag()[0] is None:
+        response.add_etag()
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response.make_conditional(request)
+
+
+class ResponseCache:
+    def __init__(self, backend, lock_timeout=5.0):
+        self.backend = backend
+        self.lock_timeout = lock_timeout
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'waits': 0}
+
+    def tag_versions(self, tags):
+        """Current version of each tag. A tag seen for the first time (or
+        dropped by the backend) starts from a unique value, so it can never
+        bring back entries cached under an earlier version."""
+        keys = [f'{KEY_PREFIX}:tag:{tag}' for tag in tags]
+        versions = self.backend.get_many(keys) if keys else []
+        for key, version in zip(keys, versions):
+            if version is None:
+                self.backend.add_counter(key, time.time_ns())
+        if None in versions:
+            versions = self.backend.get_many(keys)
+        return [int(version) for version in versions]
+
+    def invalidate(self, tags):
+        for tag in tags:
+            self.backend.incr(f'{KEY_PREFIX}:tag:{tag}')
+
+    def key(self, endpoint, tags, view_args):
+        parts = [
+            endpoint,
+            str(get_locale() or ''),
+            sorted((name, str(value)) for name, value in view_args.items()),
+            sorted((name, value) for name in request.args for value in request.args.getlist(name)),
+            self.tag_versions(tags),
+        ]
+        digest = hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+        return f'{KEY_PREFIX}:{endpoint}:{digest}'
+
+    def respond(self, endpoint, ttl, tags, view_args, produce):
+        key = self.key(endpoint, tags, view_args)
+        entry = self.backend.get(key)
+        if entry is not None and entry['fresh_until'] > time.time():
+            self.stats['hits'] += 1
+            return self.serve(entry, 'HIT')
+
+        # Missing or stale: one request recomputes, the rest serve stale or wait
+        lock_key = f'{key}:lock'
+        if self.backend.add(lock_key, uuid.uuid4().hex, self.lock_timeout):
+            try:
+                self.stats['misses'] += 1
+                return self.compute(key, ttl, produce)
+            finally:
+                try:
+                    self.backend.delete(lock_key)
+                except Exception as e:
+                    # It expires after lock_timeout anyway
+                    logger.warning(f"Releasing response cache lock failed: {str(e)}")
+        if entry is not None:
+            self.stats['stale'] += 1
+            return self.serve(entry, 'STALE')
+
+        self.stats['waits'] += 1
+        entry = self.wait(key)
+        if entry is not None:
+            return self.serve(entry, 'HIT')
+        # The recomputing request is stuck; don't make everyone else wait too
+        return self.compute(key, ttl, produce)
+
+    def wait(self, key):
+        deadline = time.monotonic() + self.lock_timeout
+        step = WAIT_STEP
+        while time.monotonic() < deadline:
+            time.sleep(step)
+            entry = self.backend.get(key)
+            if entry is not None:
+                return entry
+            step = min(step * 2, WAIT_STEP_MAX)
+        return None
+
+    def compute(self, key, ttl, produce):
+        response = make_response(produce())
+        # Errors, redirects and 304s from the view itself are never stored
+        if response.status_code != 200 or not response.is_json:
+            return response
+        body = response.get_data(as_text=True)
+        now = time.time()
+        entry = {
+            'body': body,
+            'etag': hashlib.sha1(body.encode()).hexdigest(),
+            'last_modified': int(now),
+            'fresh_until': now + ttl,
+        }
+        try:
+            self.backend.set(key, entry, ttl * (1 + STALE_FACTOR))
+        except Exception as e:
+            logger.warning(f"Storing a cached response failed: {str(e)}")
+        return self.serve(entry, 'MISS')
+
+    def serve(self, entry, status):
+        response = current_app.response_class(entry['body'], mimetype='application/json')
+        response.set_etag(entry['etag'])
+        response.headers['X-Cache'] = status
+        response.vary.update(('Accept-Language', 'Cookie'))
+        return conditional(response, entry['last_modified'])
+
+
+def make_response_cache(backend='local', lock_timeout=5.0, **options):
+    if backend == 'none':
+        return None
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown response cache backend '{backend}'. Choose from: none, {', '.join(BACKENDS)}")
+    return ResponseCache(BACKENDS[backend](**options), lock_timeout=lock_timeout)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide cache configured from the app config; None when disabled"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = current_app.config
+                _cache = make_response_cache(config['RESPONSE_CACHE_BACKEND'],
+                                             lock_timeout=config['RESPONSE_CACHE_LOCK_TIMEOUT'],
+                                             url=config['RESPONSE_CACHE_URL'],
+                                             max_entries=config['RESPONSE_CACHE_MAX_ENTRIES'])
+                # False remembers that caching is off
+                _cache = _cache or False
+    return _cache or None
+
+
+def reset_response_cache():
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def cached_response(ttl, tags=()):
+    """Cache a GET view's 200 JSON responses for ``ttl`` seconds.
+
+    ``tags`` name the data the response is built from; ``invalidate_responses``
+    with any of them drops it early.
+    """
+    tags = tuple(tags)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            if cache is None or request.method != 'GET':
+                return view(*args, **kwargs)
+
+            called = []
+
+            def produce():
+                called.append(True)
+                return view(*args, **kwargs)
+
+            try:
+                return cache.respond(request.endpoint, ttl, tags, kwargs, produce)
+            except Exception as e:
+                if called:
+                    raise
+                # A cache outage must not take the endpoint down with it
+                logger.warning(f"Response cache failed for {request.endpoint}: {str(e)}")
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def invalidate_responses(*tags):
+    """Drop every cached response built from any of ``tags``; call after the write commits"""
+    cache = get_response_cache()
+    if cache is None:
+        return
+    try:
+        cache.invalidate(tags)
+    except Exception as e:
+        logger.warning(f"Invalidating cached responses {tags} failed: {str(e)}")
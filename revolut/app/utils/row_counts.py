@@ -0,0 +1,250 @@
+# app/utils/row_counts.py - Approximate totals for the listings and the dashboard
+"""Listing totals and dashboard aggregates from counters instead of scans.
+
+``COUNT(*)`` over millions of feedback rows costs a scan on every page, so
+the listings and dashboards report figures from ``row_counter`` rows that
+the write paths bump in the same transaction as each change. Each bump goes
+to a random one of ``COUNTER_SHARDS`` shards so concurrent inserts rarely
+wait on the same row lock; reading a counter sums the shards. Besides its
+``count`` a counter carries a ``total`` (a sum, such as the sentiment of the
+feedback it counts), so averages come from the same row.
+
+The figures are approximate: rows written around the API (admin edits, bulk
+imports) are not counted until ``recount`` recomputes everything exactly.
+The NLP worker does so every ``DASHBOARD_REFRESH_INTERVAL`` seconds, and
+``flask counts recount`` does it on demand. A recount adds the difference
+between the exact figure and the shards into shard 0 rather than rewriting
+the counters, so bumps committed while it runs are kept.
+"""
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Issue, Official, Poll, RowCounter, User, UserFeedback
+from app.utils.db_helpers import dialect_insert
+
+COUNTER_SHARDS = 8
+FEEDBACK_COUNTER = 'user_feedback'
+POSITIVE_FEEDBACK_COUNTER = 'user_feedback:positive'
+ISSUE_COUNTER = 'issue'
+USER_COUNTER = 'user'
+POLL_COUNTER = 'poll'
+OFFICIAL_COUNTER = 'official'
+# Officials with an average_score; the total is the sum of their averages
+SCORED_OFFICIAL_COUNTER = 'official:scored'
+# Marker row whose updated_at is the time of the last full recount
+RECOUNT_MARKER = 'recounted'
+
+# Feedback above this sentiment counts as positive on the dashboards
+POSITIVE_SENTIMENT = 0.3
+
+
+def issue_status_counter(status):
+    return f'issue:status={status}'
+
+
+def issue_category_counter(category):
+    return f'issue:category={category}'
+
+
+def feedback_location_counter(location):
+    """Feedback per location; feedback without one counts under an empty name"""
+    return f'user_feedback:location={location or ""}'
+
+
+def issue_counters(issue):
+    """Counters a new issue adds one to"""
+    names = [ISSUE_COUNTER, issue_status_counter(issue.status)]
+    if issue.category is not None:
+        names.append(issue_category_counter(issue.category))
+    return names
+
+
+def bump_counters(names, delta=1):
+    """Add ``delta`` to each counter; the caller commits with the insert"""
+    add_to_counters({name: (delta, 0.0) for name in names})
+
+
+def add_to_counters(deltas, shard=None):
+    """Add ``{name: (count, total)}`` deltas; the caller commits with the write"""
+    now = datetime.utcnow()
+    rows = [{'name': name, 'shard': random.randrange(COUNTER_SHARDS) if shard is None else shard,
+             'count': count, 'total': total, 'updated_at': now}
+            for name, (count, total) in deltas.items() if count or total]
+    if not rows:
+        return
+    table = RowCounter.__table__
+    stmt = dialect_insert(table)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['name', 'shard'],
+            set_={'count': table.c.count + stmt.excluded['count'],
+                  'total': table.c.total + stmt.excluded['total'],
+                  'updated_at': stmt.excluded['updated_at']}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.name == row['name'], table.c.shard == row['shard'])
+            .values(count=table.c.count + row['count'], total=table.c.total + row['total'],
+                    updated_at=row['updated_at'])
+        ).rowcount
+        if not updated:
+            db.session.execute(table.insert().values(**row))
+
+
+def feedback_deltas(changes):
+    """Counter deltas for feedback rows changing state.
+
+    ``changes`` yields ``(before, after)`` pairs of ``(location,
+    sentiment_score)``, with None for the ``before`` of a row that is being
+    inserted. Counters a change leaves alone come out as zero.
+    """
+    deltas = defaultdict(lambda: [0, 0.0])
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            location, sentiment = state[0], state[1] or 0.0
+            for name in (FEEDBACK_COUNTER, feedback_location_counter(location)):
+                deltas[name][0] += sign
+                deltas[name][1] += sign * sentiment
+            if sentiment > POSITIVE_SENTIMENT:
+                deltas[POSITIVE_FEEDBACK_COUNTER][0] += sign
+    return {name: tuple(delta) for name, delta in deltas.items()}
+
+
+def official_deltas(official, sign=1):
+    """Counter deltas for creating (``sign=1``) or deleting (``sign=-1``) an official"""
+    deltas = {OFFICIAL_COUNTER: (sign, 0.0)}
+    if official.average_score is not None:
+        deltas[SCORED_OFFICIAL_COUNTER] = (sign, sign * official.average_score)
+    return deltas
+
+
+def rating_deltas(official, score):
+    """Scored-official counter delta once ``score`` is in ``official``'s aggregates.
+
+    The previous average follows from the aggregates; before its first
+    rating an official has the 0.0 it was created with.
+    """
+    count = official.rating_count or 0
+    previous = (official.rating_sum - score) / (count - 1) if count > 1 else 0.0
+    return {SCORED_OFFICIAL_COUNTER: (0, (official.average_score or 0.0) - previous)}
+
+
+def approximate_count(name):
+    """Sum of the counter's shards; 0 for a counter never bumped"""
+    return db.session.query(db.func.sum(RowCounter.count)).filter(RowCounter.name == name).scalar() or 0
+
+
+def counter_snapshot():
+    """Every counter in one grouped read.
+
+    Returns ``({name: (count, total)}, recounted_at, updated_at)``: when the
+    last recount ran (None if never) and when any counter last changed.
+    """
+    counters, recounted_at, updated_at = {}, None, None
+    rows = db.session.query(
+        RowCounter.name, db.func.sum(RowCounter.count), db.func.sum(RowCounter.total),
+        db.func.max(RowCounter.updated_at)
+    ).group_by(RowCounter.name)
+    for name, count, total, changed in rows:
+        if name == RECOUNT_MARKER:
+            recounted_at = changed
+            continue
+        counters[name] = (count or 0, total or 0.0)
+        if changed is not None and (updated_at is None or changed > updated_at):
+            updated_at = changed
+    return counters, recounted_at, max(filter(None, (recounted_at, updated_at)), default=None)
+
+
+def exact_counts(session=None):
+    """``{counter name: (COUNT(*), total)}`` for every maintained counter"""
+    session = session or db.session
+    sentiment_sum = db.func.coalesce(db.func.sum(UserFeedback.sentiment_score), 0.0)
+    counts = {
+        FEEDBACK_COUNTER: tuple(session.query(db.func.count(UserFeedback.id), sentiment_sum).one()),
+        POSITIVE_FEEDBACK_COUNTER: (session.query(db.func.count(UserFeedback.id)).filter(
+            UserFeedback.sentiment_score > POSITIVE_SENTIMENT).scalar(), 0.0),
+        ISSUE_COUNTER: (session.query(db.func.count(Issue.id)).scalar(), 0.0),
+        USER_COUNTER: (session.query(db.func.count(User.id)).scalar(), 0.0),
+        POLL_COUNTER: (session.query(db.func.count(Poll.id)).scalar(), 0.0),
+        OFFICIAL_COUNTER: (session.query(db.func.count(Official.id)).scalar(), 0.0),
+    }
+    scored, score_sum = session.query(db.func.count(Official.average_score),
+                                      db.func.sum(Official.average_score)).one()
+    counts[SCORED_OFFICIAL_COUNTER] = (scored, score_sum or 0.0)
+
+    for status, count in session.query(Issue.status, db.func.count(Issue.id)).group_by(Issue.status):
+        if status is not None:
+            counts[issue_status_counter(status)] = (count, 0.0)
+    for category, count in session.query(Issue.category, db.func.count(Issue.id)).group_by(Issue.category):
+        if category is not None:
+            counts[issue_category_counter(category)] = (count, 0.0)
+
+    for location, count, total in session.query(
+        UserFeedback.location, db.func.count(UserFeedback.id), sentiment_sum
+    ).group_by(UserFeedback.location):
+        name = feedback_location_counter(location)
+        # NULL and '' both land on the unknown-location counter
+        previous = counts.get(name, (0, 0.0))
+        counts[name] = (previous[0] + count, previous[1] + total)
+    return counts
+
+
+@contextmanager
+def _snapshot_session():
+    """A session whose reads all see the same committed state"""
+    if db.engine.dialect.name != 'postgresql':
+        # SQLite reads in one transaction are already consistent
+        yield db.session
+        return
+    with db.engine.connect() as connection:
+        connection = connection.execution_options(isolation_level='REPEATABLE READ')
+        with Session(bind=connection) as session:
+            yield session
+
+
+def _mark_recount(now):
+    """Stamp the recount marker; its row lock keeps a second recount waiting until commit"""
+    table = RowCounter.__table__
+    updated = db.session.execute(
+        table.update().where(table.c.name == RECOUNT_MARKER).values(updated_at=now)
+    ).rowcount
+    if not updated:
+        # Two first recounts: the slower insert fails and rolls back
+        db.session.execute(table.insert().values(name=RECOUNT_MARKER, shard=0, count=0, total=0.0,
+                                                 updated_at=now))
+
+
+def recount():
+    """Correct every counter to an exact count; the caller commits.
+
+    The exact figures and the current shard sums are read from one snapshot
+    and the difference is added to shard 0, so bumps committed after the
+    snapshot stay counted. Returns ``{name: (count, total)}``.
+    """
+    _mark_recount(datetime.utcnow())
+    with _snapshot_session() as session:
+        counts = exact_counts(session)
+        current = {name: (count or 0, total or 0.0) for name, count, total in session.query(
+            RowCounter.name, db.func.sum(RowCounter.count), db.func.sum(RowCounter.total)
+        ).filter(RowCounter.name != RECOUNT_MARKER).group_by(RowCounter.name)}
+
+    corrections = {}
+    for name in set(counts) | set(current):
+        count, total = counts.get(name, (0, 0.0))
+        counted, summed = current.get(name, (0, 0.0))
+        # Float sums differ in the last bits; that is not drift
+        total_delta = total - summed if abs(total - summed) > 1e-9 else 0.0
+        corrections[name] = (count - counted, total_delta)
+    add_to_counters(corrections, shard=0)
+    return counts
@@ -0,0 +1,488 @@
+# app/utils/search.py - Full-text search over issues and feedback
+"""Search index for ``GET /api/issues?search=`` and ``GET /api/feedback?search=``.
+
+Text is analysed in Python (``text_analysis.analyse``: folding, stop words,
+English/Swahili stemming) and the resulting terms are stored in a backend
+chosen by ``SEARCH_BACKEND``:
+
+* ``sqlite``    FTS5 tables ``issue_search`` and ``feedback_search`` (rowid = row id),
+                ranked with ``bm25()``
+* ``postgres``  ``search_document`` with a weighted ``tsvector`` and a GIN
+                index, ranked with ``ts_rank()``
+* ``memory``    an inverted index per process, ranked with BM25; loads the
+                table on first use, picks up new rows on every search and
+                reloads fully every ``SEARCH_MEMORY_REFRESH`` seconds
+* ``auto``      (default) the native backend of the database, else ``memory``
+
+The native tables are created with the schema (``SEARCH_TABLES`` in
+``app.models``); ``auto`` falls back to ``memory`` when they are missing.
+Write paths call ``index_rows`` (or ``reindex``) in the same transaction as
+the change; ``flask search rebuild`` (re)fills the index for existing rows,
+and ``--if-empty`` only fills document types with nothing indexed yet.
+
+Each query word must match (in any field, any of its stems); ``location``
+additionally requires every location word as a prefix of the location
+field. ``search`` returns ids best first, at most ``SEARCH_MAX_RESULTS`` of
+them. A location on its own is a filter, not a ranking: ``location_filter``
+is a SQL condition over every match, which the listings page by keyset.
+"""
+import bisect
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+
+from app import db
+from app.models import Issue, UserFeedback
+from app.utils.text_analysis import analyse, term_groups, tokenize
+
+logger = logging.getLogger(__name__)
+
+# weight: ranking weight; pg_weight: tsvector label; stemmed: analysed vs folded words
+SearchField = namedtuple('SearchField', 'name weight pg_weight stemmed')
+# field None matches any field; prefix matches terms starting with each of ``terms``
+Clause = namedtuple('Clause', 'field terms prefix')
+
+
+class DocumentType:
+    def __init__(self, name, model, fields, language=None):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.language = language
+
+    def columns(self):
+        columns = [self.model.id] + [getattr(self.model, field.name) for field in self.fields]
+        if self.language:
+            columns.append(getattr(self.model, self.language))
+        return columns
+
+    def analyse(self, row):
+        """``{field: 'term term ...'}`` for a row with the ``columns()`` attributes"""
+        language = getattr(row, self.language) if self.language else None
+        return {
+            field.name: ' '.join(analyse(getattr(row, field.name), language) if field.stemmed
+                                 else tokenize(getattr(row, field.name)))
+            for field in self.fields
+        }
+
+
+DOCUMENT_TYPES = {
+    'issue': DocumentType('issue', Issue, (
+        SearchField('title', 2.0, 'A', True),
+        SearchField('description', 1.0, 'B', True),
+        SearchField('location', 0.5, 'C', False),
+    )),
+    'feedback': DocumentType('feedback', UserFeedback, (
+        SearchField('content', 1.0, 'B', True),
+        SearchField('location', 0.5, 'C', False),
+    ), language='language'),
+}
+
+
+def build_clauses(text=None, location=None, language=None):
+    clauses = [Clause(None, sorted(group), False) for group in term_groups(text, language)]
+    clauses += [Clause('location', [word], True) for word in tokenize(location)]
+    return clauses
+
+
+class SqliteFtsBackend:
+    name = 'sqlite'
+
+    @staticmethod
+    def available(connection):
+        inspector = db.inspect(connection)
+        return all(inspector.has_table(f"{doc.name}_search") for doc in DOCUMENT_TYPES.values())
+
+    def index(self, doc, documents):
+        self.remove(doc, [doc_id for doc_id, _ in documents])
+        names = [field.name for field in doc.fields]
+        db.session.execute(
+            db.text(f"INSERT INTO {doc.name}_search (rowid, {', '.join(names)}) "
+                    f"VALUES (:doc_id, {', '.join(':' + name for name in names)})"),
+            [{'doc_id': doc_id, **fields} for doc_id, fields in documents]
+        )
+
+    def remove(self, doc, doc_ids):
+        if doc_ids:
+            db.session.execute(db.text(f"DELETE FROM {doc.name}_search WHERE rowid = :doc_id"),
+                               [{'doc_id': doc_id} for doc_id in doc_ids])
+
+    def clear(self, doc):
+        db.session.execute(db.text(f"DELETE FROM {doc.name}_search"))
+
+    @staticmethod
+    def _match(clauses):
+        parts = []
+        for clause in clauses:
+            terms = ' OR '.join(f'"{term}"' + ('*' if clause.prefix else '') for term in clause.terms)
+            parts.append(f"{clause.field} : ({terms})" if clause.field else f"({terms})")
+        return ' AND '.join(parts)
+
+    def empty(self, doc):
+        return db.session.execute(db.text(f"SELECT 1 FROM {doc.name}_search LIMIT 1")).first() is None
+
+    def match_clause(self, doc, clauses):
+        table = f"{doc.name}_search"
+        matches = db.text(f"SELECT rowid FROM {table} WHERE {table} MATCH :search_query") \
+            .bindparams(search_query=self._match(clauses)).columns(db.column('rowid', db.Integer))
+        return doc.model.id.in_(matches)
+
+    def search(self, doc, clauses, limit, ranked):
+        table = f"{doc.name}_search"
+        if ranked:
+            weights = ', '.join(str(field.weight) for field in doc.fields)
+            order = f"bm25({table}, {weights}), rowid DESC"
+        else:
+            order = "rowid DESC"
+        rows = db.session.execute(
+            db.text(f"SELECT rowid FROM {table} WHERE {table} MATCH :query ORDER BY {order} LIMIT :limit"),
+            {'query': self._match(clauses), 'limit': limit}
+        )
+        return [doc_id for doc_id, in rows]
+
+
+class PostgresFtsBackend:
+    name = 'postgres'
+
+    @staticmethod
+    def available(connection):
+        return db.inspect(connection).has_table('search_document')
+
+    def index(self, doc, documents):
+        if not documents:
+            return
+        vector = ' || '.join(f"setweight(to_tsvector('simple', :{field.name}), '{field.pg_weight}')"
+                             for field in doc.fields)
+        db.session.execute(
+            db.text(f"INSERT INTO search_document (doc_type, doc_id, vector) "
+                    f"VALUES (:doc_type, :doc_id, {vector}) "
+                    f"ON CONFLICT (doc_type, doc_id) DO UPDATE SET vector = EXCLUDED.vector"),
+            [{'doc_type': doc.name, 'doc_id': doc_id, **fields} for doc_id, fields in documents]
+        )
+
+    def remove(self, doc, doc_ids):
+        if doc_ids:
+            db.session.execute(db.text("DELETE FROM search_document WHERE doc_type = :doc_type AND doc_id = :doc_id"),
+                               [{'doc_type': doc.name, 'doc_id': doc_id} for doc_id in doc_ids])
+
+    def clear(self, doc):
+        db.session.execute(db.text("DELETE FROM search_document WHERE doc_type = :doc_type"), {'doc_type': doc.name})
+
+    @staticmethod
+    def _tsquery(doc, clauses):
+        weights = {field.name: field.pg_weight for field in doc.fields}
+        parts = []
+        for clause in clauses:
+            # 'term', 'term':* (prefix), 'term':C (location only), 'term':*C
+            label = ('*' if clause.prefix else '') + (weights[clause.field] if clause.field else '')
+            suffix = f":{label}" if label else ''
+            parts.append('(' + ' | '.join(f"'{term}'{suffix}" for term in clause.terms) + ')')
+        return ' & '.join(parts)
+
+    def empty(self, doc):
+        return db.session.execute(db.text("SELECT 1 FROM search_document WHERE doc_type = :doc_type LIMIT 1"),
+                                  {'doc_type': doc.name}).first() is None
+
+    def match_clause(self, doc, clauses):
+        matches = db.text("SELECT doc_id FROM search_document WHERE doc_type = :search_doc_type "
+                          "AND vector @@ to_tsquery('simple', :search_query)") \
+            .bindparams(search_doc_type=doc.name, search_query=self._tsquery(doc, clauses)) \
+            .columns(db.column('doc_id', db.Integer))
+        return doc.model.id.in_(matches)
+
+    def search(self, doc, clauses, limit, ranked):
+        order = "ts_rank(vector, query) DESC, doc_id DESC" if ranked else "doc_id DESC"
+        rows = db.session.execute(
+            db.text(f"SELECT doc_id FROM search_document, to_tsquery('simple', :query) query "
+                    f"WHERE doc_type = :doc_type AND vector @@ query ORDER BY {order} LIMIT :limit"),
+            {'query': self._tsquery(doc, clauses), 'doc_type': doc.name, 'limit': limit}
+        )
+        return [doc_id for doc_id, in rows]
+
+
+class InvertedIndex:
+    """Term -> ``{doc_id: term frequency}`` postings per field, scored with BM25"""
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.postings = {field.name: {} for field in fields}
+        self.documents = {}
+        self.lengths = {field.name: 0 for field in fields}
+        self._vocabulary = {}
+
+    def add(self, doc_id, fields):
+        self.remove(doc_id)
+        terms = {name: text.split() for name, text in fields.items()}
+        self.documents[doc_id] = terms
+        for name, field_terms in terms.items():
+            self.lengths[name] += len(field_terms)
+            postings = self.postings[name]
+            for term in field_terms:
+                if term not in postings:
+                    postings[term] = {}
+                    self._vocabulary.pop(name, None)
+                postings[term][doc_id] = postings[term].get(doc_id, 0) + 1
+
+    def remove(self, doc_id):
+        terms = self.documents.pop(doc_id, None)
+        for name, field_terms in (terms or {}).items():
+            self.lengths[name] -= len(field_terms)
+            postings = self.postings[name]
+            for term in set(field_terms):
+                postings[term].pop(doc_id, None)
+                if not postings[term]:
+                    del postings[term]
+                    self._vocabulary.pop(name, None)
+
+    def _expand(self, name, term, prefix):
+        if not prefix:
+            return [term]
+        vocabulary = self._vocabulary.get(name)
+        if vocabulary is None:
+            vocabulary = self._vocabulary[name] = sorted(self.postings[name])
+        start = bisect.bisect_left(vocabulary, term)
+        end = bisect.bisect_left(vocabulary, term + '\uffff')
+        return vocabulary[start:end]
+
+    def search(self, clauses, limit, ranked):
+        total = len(self.documents)
+        if not total:
+            return []
+        average = {name: length / total or 1 for name, length in self.lengths.items()}
+        scores = None
+        for clause in clauses:
+            fields = [field for field in self.fields if clause.field in (None, field.name)]
+            clause_scores = {}
+            for field in fields:
+                for query_term in clause.terms:
+                    for term in self._expand(field.name, query_term, clause.prefix):
+                        postings = self.postings[field.name].get(term, {})
+                        idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                        for doc_id, tf in postings.items():
+                            length = len(self.documents[doc_id][field.name]) / average[field.name]
+                            score = field.weight * idf * tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * length))
+                            clause_scores[doc_id] = clause_scores.get(doc_id, 0.0) + score
+            if scores is None:
+                scores = clause_scores
+            else:
+                scores = {doc_id: score + clause_scores[doc_id] for doc_id, score in scores.items()
+                          if doc_id in clause_scores}
+            if not scores:
+                return []
+        if ranked:
+            return heapq.nlargest(limit, scores, key=lambda doc_id: (scores[doc_id], doc_id))
+        if limit is None:
+            return sorted(scores, reverse=True)
+        return heapq.nlargest(limit, scores)
+
+
+class MemorySearchBackend:
+    name = 'memory'
+    # Larger match sets reach SQL through a temporary table, not an IN list
+    match_list_max = 500
+
+    def __init__(self, refresh=300.0):
+        self.refresh = refresh
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available(connection):
+        return True
+
+    def _load(self, doc, index, query):
+        for row in query:
+            index.add(row.id, doc.analyse(row))
+
+    def _fresh_index(self, doc):
+        """The index for ``doc``, loading new rows (or everything when stale) first"""
+        now = time.monotonic()
+        entry = self._indexes.get(doc.name)
+        if entry is None or entry['built_at'] + self.refresh < now:
+            index = InvertedIndex(doc.fields)
+            self._load(doc, index, db.session.query(*doc.columns()))
+            entry = self._indexes[doc.name] = {'index': index, 'built_at': now}
+        else:
+            index = entry['index']
+            last_id = max(index.documents, default=0)
+            self._load(doc, index, db.session.query(*doc.columns()).filter(doc.model.id > last_id))
+        return entry['index']
+
+    def index(self, doc, documents):
+        with self._lock:
+            entry = self._indexes.get(doc.name)
+            # Not loaded yet: the first search loads these rows anyway
+            if entry is not None:
+                for doc_id, fields in documents:
+                    entry['index'].add(doc_id, fields)
+
+    def remove(self, doc, doc_ids):
+        with self._lock:
+            entry = self._indexes.get(doc.name)
+            if entry is not None:
+                for doc_id in doc_ids:
+                    entry['index'].remove(doc_id)
+
+    def clear(self, doc):
+        with self._lock:
+            self._indexes.pop(doc.name, None)
+
+    def empty(self, doc):
+        # Loads itself from the tables on first use
+        return False
+
+    def match_clause(self, doc, clauses):
+        ids = self.search(doc, clauses, None, False)
+        if len(ids) <= self.match_list_max:
+            return doc.model.id.in_(ids)
+        # One executemany on the session's connection: no bound-parameter
+        # limit, and the listing query joins a keyed table instead of parsing
+        # a statement with every id in it
+        table = f"{doc.name}_search_matches"
+        db.session.execute(db.text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY)"))
+        db.session.execute(db.text(f"DELETE FROM {table}"))
+        db.session.execute(db.text(f"INSERT INTO {table} (id) VALUES (:id)"), [{'id': doc_id} for doc_id in ids])
+        return doc.model.id.in_(db.text(f"SELECT id FROM {table}").columns(db.column('id', db.Integer)))
+
+    def search(self, doc, clauses, limit, ranked):
+        with self._lock:
+            return self._fresh_index(doc).search(clauses, limit, ranked)
+
+    def stats(self):
+        with self._lock:
+            return {name: len(entry['index'].documents) for name, entry in self._indexes.items()}
+
+
+BACKENDS = {backend.name: backend for backend in (SqliteFtsBackend, PostgresFtsBackend, MemorySearchBackend)}
+NATIVE_BACKENDS = {'sqlite': 'sqlite', 'postgresql': 'postgres'}
+
+
+def make_search_backend(name='auto', refresh=300.0):
+    if name == 'auto':
+        # The session's own connection: checking out another one could reset
+        # a shared (in-memory SQLite) connection mid-transaction
+        connection = db.session.connection()
+        name = NATIVE_BACKENDS.get(connection.dialect.name, 'memory')
+        if not BACKENDS[name].available(connection):
+            logger.warning(f"Full-text search tables are missing on {connection.dialect.name}; using the memory index")
+            name = 'memory'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown search backend '{name}'. Choose from: auto, {', '.join(BACKENDS)}")
+    return MemorySearchBackend(refresh=refresh) if name == 'memory' else BACKENDS[name]()
+
+
+def index_rows(doc_type, rows):
+    """(Re)index rows carrying the document's ``columns()``; the caller commits"""
+    doc = DOCUMENT_TYPES[doc_type]
+    documents = [(row.id, doc.analyse(row)) for row in rows]
+    if documents:
+        get_search_backend().index(doc, documents)
+
+
+def reindex(doc_type, ids):
+    """Reload ``ids`` from the database and index them; the caller commits"""
+    doc = DOCUMENT_TYPES[doc_type]
+    ids = list(ids)
+    if ids:
+        index_rows(doc_type, db.session.query(*doc.columns()).filter(doc.model.id.in_(ids)).all())
+
+
+def remove_rows(doc_type, ids):
+    get_search_backend().remove(DOCUMENT_TYPES[doc_type], list(ids))
+
+
+def search(doc_type, text=None, location=None, language=None, limit=None):
+    """Matching ids, best first when ``text`` is given, else newest first"""
+    clauses = build_clauses(text, location, language)
+    if not clauses:
+        return []
+    limit = limit or current_app.config['SEARCH_MAX_RESULTS']
+    return get_search_backend().search(DOCUMENT_TYPES[doc_type], clauses, limit, ranked=bool(text))
+
+
+def location_filter(doc_type, location):
+    """SQL condition matching every row whose location has each word of ``location`` as a prefix.
+
+    Not capped at ``SEARCH_MAX_RESULTS``, so listings can page through all
+    of a location's rows by keyset.
+    """
+    clauses = build_clauses(location=location)
+    doc = DOCUMENT_TYPES[doc_type]
+    if not clauses:
+        return db.false()
+    return get_search_backend().match_clause(doc, clauses)
+
+
+class RankedPage:
+    """``query.paginate()`` stand-in that keeps ``ranked_ids`` order.
+
+    ``query`` is already filtered to the matches; one id query applies its
+    other filters, one more loads the page.
+    """
+
+    def __init__(self, query, model, ranked_ids, page, per_page):
+        page = max(page, 1)
+        allowed = {row_id for row_id, in query.with_entities(model.id)}
+        ordered = [row_id for row_id in ranked_ids if row_id in allowed]
+        self.total = len(ordered)
+        self.pages = math.ceil(self.total / per_page) if per_page else 0
+        page_ids = ordered[(page - 1) * per_page:page * per_page]
+        rows = {row.id: row for row in query.filter(model.id.in_(page_ids))} if page_ids else {}
+        self.items = [rows[row_id] for row_id in page_ids if row_id in rows]
+
+
+def rebuild_index(doc_type=None, batch_size=1000, progress=None, if_empty=False):
+    """Re-index every row of ``doc_type`` (default: all types), committing per batch.
+
+    With ``if_empty`` only types with nothing indexed are filled, so a deploy
+    can run it every time and only pays after the tables were created.
+    """
+    backend = get_search_backend()
+    counts = {}
+    for doc in ([DOCUMENT_TYPES[doc_type]] if doc_type else DOCUMENT_TYPES.values()):
+        if if_empty and not backend.empty(doc):
+            continue
+        backend.clear(doc)
+        db.session.commit()
+        counts[doc.name] = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(*doc.columns()).filter(doc.model.id > last_id) \
+                .order_by(doc.model.id).limit(batch_size).all()
+            if not rows:
+                break
+            index_rows(doc.name, rows)
+            db.session.commit()
+            counts[doc.name] += len(rows)
+            last_id = rows[-1].id
+            if progress:
+                progress(doc.name, counts[doc.name])
+    return counts
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """Process-wide backend configured from the app config"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = current_app.config
+                _backend = make_search_backend(config['SEARCH_BACKEND'], refresh=config['SEARCH_MEMORY_REFRESH'])
+    return _backend
+
+
+def reset_search_backend():
+    global _backend
+    with _backend_lock:
+        _backend = None
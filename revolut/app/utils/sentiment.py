@@ -0,0 +1,163 @@
+# app/utils/sentiment.py - Pluggable sentiment engines for the NLP processor
+"""Sentiment backends used by ``EnhancedNLPProcessor``.
+
+* ``textblob`` - TextBlob polarity adjusted by the local indicator words
+  (the original behaviour).
+* ``lexicon`` - a precompiled English/Swahili word list with negation
+  handling; no TextBlob call at all.
+* ``hybrid`` - the lexicon first, TextBlob only when the lexicon finds
+  nothing or its hits cancel out.
+
+Engines receive the ``KeywordMatch`` of the message, so they reuse the
+processor's single tokenisation pass. Select one with the
+``NLP_SENTIMENT_ENGINE`` setting.
+"""
+import math
+from abc import ABC, abstractmethod
+
+from textblob import TextBlob
+
+DEFAULT_ENGINE = 'textblob'
+
+# Word weights in [-1, 1]. The processor's indicator lists are merged in.
+DEFAULT_LEXICON = {
+    # English
+    'good': 0.7, 'great': 0.8, 'excellent': 1.0, 'happy': 0.8, 'satisfied': 0.7,
+    'improved': 0.6, 'better': 0.5, 'best': 0.8, 'clean': 0.5, 'fast': 0.4,
+    'quick': 0.4, 'helpful': 0.6, 'thank': 0.6, 'thanks': 0.6, 'fixed': 0.5,
+    'resolved': 0.6, 'repaired': 0.5, 'love': 0.8, 'nice': 0.6, 'safe': 0.5,
+    'appreciate': 0.7, 'efficient': 0.6, 'reliable': 0.6, 'available': 0.3,
+    'working': 0.3, 'well': 0.3, 'friendly': 0.6, 'commend': 0.7,
+    'bad': -0.7, 'terrible': -1.0, 'awful': -1.0, 'poor': -0.6, 'dirty': -0.6,
+    'broken': -0.6, 'damaged': -0.6, 'slow': -0.4, 'corrupt': -0.8, 'unsafe': -0.7,
+    'dangerous': -0.7, 'angry': -0.8, 'frustrated': -0.7, 'disappointed': -0.7,
+    'worst': -1.0, 'worse': -0.6, 'failed': -0.6, 'failure': -0.6, 'shortage': -0.5,
+    'lack': -0.5, 'missing': -0.4, 'stolen': -0.7, 'delayed': -0.4, 'useless': -0.8,
+    'problem': -0.5, 'problems': -0.5, 'leaking': -0.5, 'blocked': -0.4,
+    'flooded': -0.5, 'expensive': -0.4, 'sick': -0.5, 'died': -0.8, 'bribe': -0.7,
+    'ignored': -0.6, 'neglected': -0.7, 'rude': -0.7, 'unavailable': -0.5,
+    # Swahili
+    'nzuri': 0.7, 'safi': 0.6, 'poa': 0.5, 'vizuri': 0.7, 'furaha': 0.8,
+    'raha': 0.6, 'asante': 0.6, 'shukrani': 0.6, 'bora': 0.6, 'salama': 0.5,
+    'hongera': 0.8, 'tunashukuru': 0.7, 'imerekebishwa': 0.5, 'imeboreshwa': 0.6,
+    'mbaya': -0.7, 'vibaya': -0.7, 'hasira': -0.8, 'uchungu': -0.7, 'shida': -0.5,
+    'tatizo': -0.5, 'matatizo': -0.5, 'hatari': -0.7, 'chafu': -0.6, 'uchafu': -0.6,
+    'mbovu': -0.6, 'ubovu': -0.6, 'imeharibika': -0.6, 'rushwa': -0.8, 'hongo': -0.7,
+    'wizi': -0.7, 'njaa': -0.6, 'ugonjwa': -0.5, 'tumechoka': -0.7, 'kero': -0.6
+}
+
+NEGATORS = frozenset([
+    'not', 'no', 'never', 'without', 'cannot', 'nobody', 'nothing', 'none',
+    'hakuna', 'hamna', 'bila', 'si', 'sio', 'siyo', 'hapana', 'haina'
+])
+# Contractions tokenise as "don", "t"
+CONTRACTED_NEGATORS = frozenset([
+    'don', 'doesn', 'didn', 'isn', 'wasn', 'aren', 'weren', 'won', 'can', 'couldn', 'wouldn'
+])
+NEGATION_SCOPE = 3
+# A negator with nothing to negate ("maji hakuna") is itself a complaint
+DANGLING_NEGATION = -0.4
+
+
+def _clamp(value):
+    return max(-1.0, min(1.0, value))
+
+
+class SentimentEngine(ABC):
+    """Base class: ``score(text, match)`` returns a polarity in [-1, 1]"""
+    name = None
+
+    @abstractmethod
+    def score(self, text, match):
+        """Polarity of ``text`` in [-1, 1]"""
+
+
+class TextBlobEngine(SentimentEngine):
+    name = 'textblob'
+
+    def __init__(self, indicator_weight=0.1, **kwargs):
+        self.indicator_weight = indicator_weight
+
+    def score(self, text, match):
+        base_sentiment = TextBlob(text).sentiment.polarity
+
+        # Adjust based on local positive/negative indicators
+        adjustment = (len(match.positive) - len(match.negative)) * self.indicator_weight
+        return _clamp(base_sentiment + adjustment)
+
+
+class LexiconEngine(SentimentEngine):
+    name = 'lexicon'
+
+    def __init__(self, positive_indicators=(), negative_indicators=(), lexicon=None,
+                 alpha=1.5, **kwargs):
+        self.lexicon = dict(lexicon if lexicon is not None else DEFAULT_LEXICON)
+        for word in positive_indicators:
+            self.lexicon.setdefault(word, 0.6)
+        for word in negative_indicators:
+            self.lexicon.setdefault(word, -0.6)
+        # Normalisation constant: a single strong word lands around +/-0.6
+        self.alpha = alpha
+
+    def polarity(self, tokens):
+        """Return ``(score, hits)`` for a token list"""
+        lexicon = self.lexicon
+        total = 0.0
+        hits = 0
+        negate_until = -1
+        pending_negation = False
+
+        for i, token in enumerate(tokens):
+            if token in NEGATORS or (
+                    token in CONTRACTED_NEGATORS and i + 1 < len(tokens) and tokens[i + 1] == 't'):
+                negate_until = i + NEGATION_SCOPE
+                pending_negation = True
+                continue
+
+            weight = lexicon.get(token)
+            if weight is None:
+                continue
+            if i <= negate_until:
+                # "not good" is weaker than "bad"
+                weight = -weight * 0.75
+                pending_negation = False
+            total += weight
+            hits += 1
+
+        if pending_negation and hits == 0:
+            total += DANGLING_NEGATION
+            hits += 1
+
+        if not hits:
+            return 0.0, 0
+        return _clamp(total / math.sqrt(total * total + self.alpha)), hits
+
+    def score(self, text, match):
+        return self.polarity(match.tokens)[0]
+
+
+class HybridEngine(SentimentEngine):
+    name = 'hybrid'
+
+    def __init__(self, positive_indicators=(), negative_indicators=(), inconclusive=0.05, **kwargs):
+        self.lexicon = LexiconEngine(positive_indicators, negative_indicators, **kwargs)
+        self.textblob = TextBlobEngine(**kwargs)
+        self.inconclusive = inconclusive
+
+    def score(self, text, match):
+        score, hits = self.lexicon.polarity(match.tokens)
+        if hits and abs(score) >= self.inconclusive:
+            return score
+        return self.textblob.score(text, match)
+
+
+ENGINES = {engine.name: engine for engine in (TextBlobEngine, LexiconEngine, HybridEngine)}
+
+
+def make_sentiment_engine(name=None, positive_indicators=(), negative_indicators=(), **options):
+    """Instantiate an engine by name (``textblob``, ``lexicon`` or ``hybrid``)"""
+    name = name or DEFAULT_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown sentiment engine '{name}'. Choose from: {', '.join(ENGINES)}")
+    return ENGINES[name](positive_indicators=positive_indicators,
+                         negative_indicators=negative_indicators, **options)
@@ -0,0 +1,110 @@
+# app/utils/text_analysis.py - Normalising, tokenising and stemming for search
+"""Text analysis shared by the search index and the official lookups.
+
+``analyse`` turns text into index terms: accents stripped, case folded,
+stop words dropped and every word reduced by a light English and/or
+Swahili affix stemmer, so "roads"/"road" and "imeharibika"/"kuharibika"
+meet on the same term. When the language is unknown a word yields both
+stems.
+
+The stemmers are deliberately conservative (affix stripping with minimum
+stem lengths, no dictionaries): a missed conflation only costs recall,
+while an over-eager one merges unrelated words.
+"""
+import re
+import unicodedata
+
+WORD = re.compile(r'\w+')
+
+STOP_WORDS = frozenset([
+    # English
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in', 'is',
+    'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'were', 'with',
+    # Swahili
+    'ya', 'wa', 'za', 'la', 'cha', 'vya', 'kwa', 'na', 'ni', 'katika', 'hii', 'huu', 'hiyo',
+    'kuna', 'pia', 'sana', 'au', 'lakini', 'kama', 'hata'
+])
+
+ENGLISH_STEP1 = (('sses', 'ss'), ('ies', 'i'), ('shes', 'sh'), ('ches', 'ch'), ('xes', 'x'), ('ss', 'ss'), ('s', ''))
+ENGLISH_STEP2 = ('eed', 'ing', 'ed')
+ENGLISH_UNDOUBLE = frozenset('bdfgmnprt')
+VOWELS = frozenset('aeiou')
+
+# Verb extensions: passive, causative, stative, applicative, reciprocal
+SWAHILI_SUFFIXES = ('ishwa', 'eshwa', 'iliwa', 'elewa', 'isha', 'esha', 'ika', 'eka',
+                    'iwa', 'ewa', 'ana', 'wa', 'ia', 'ea')
+# Subject marker + tense marker, and the infinitive ku-
+SWAHILI_PREFIXES = tuple(sorted(
+    {subject + tense for subject in ('ni', 'u', 'a', 'tu', 'm', 'wa', 'i', 'li', 'ki', 'vi', 'zi', 'ya')
+     for tense in ('li', 'na', 'me', 'ta')} | {'ku'},
+    key=len, reverse=True
+))
+
+
+def normalise_text(text):
+    """Accent-free, case-folded text with single spaces"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split())
+
+
+def tokenize(text):
+    """Normalised words of ``text``"""
+    return WORD.findall(normalise_text(text))
+
+
+def stem_english(word):
+    """Porter-style step 1: plurals, -ed/-ing, final -y and -e"""
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    for suffix, replacement in ENGLISH_STEP1:
+        if word.endswith(suffix):
+            word = word[:len(word) - len(suffix)] + replacement
+            break
+    for suffix in ENGLISH_STEP2:
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if suffix == 'eed':
+                word = stem + 'ee'
+            elif len(stem) >= 3 and VOWELS & set(stem):
+                word = stem[:-1] if len(stem) > 3 and stem[-1] == stem[-2] and stem[-1] in ENGLISH_UNDOUBLE else stem
+            break
+    if word.endswith('y') and len(word) > 3 and VOWELS & set(word[:-1]):
+        word = word[:-1] + 'i'
+    if word.endswith('e') and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def stem_swahili(word):
+    """Strip a subject/tense prefix and verb extensions from a verb form"""
+    if len(word) <= 4 or not word.isalpha():
+        return word
+    if word.endswith('a'):
+        for prefix in SWAHILI_PREFIXES:
+            if word.startswith(prefix) and len(word) - len(prefix) >= 5:
+                word = word[len(prefix):]
+                break
+        for suffix in SWAHILI_SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+                return word[:-len(suffix)]
+        return word[:-1] if len(word) > 4 else word
+    if word.startswith('ku') and len(word) >= 6:
+        # Infinitives of loan verbs: kuharibu, kujibu
+        return word[2:]
+    return word
+
+
+STEMMERS = {'en': (stem_english,), 'sw': (stem_swahili,)}
+BOTH = (stem_english, stem_swahili)
+
+
+def term_groups(text, language=None):
+    """One set of alternative terms per word of ``text``, stop words dropped"""
+    stemmers = STEMMERS.get(language, BOTH)
+    return [{stem(word) for stem in stemmers} for word in tokenize(text) if word not in STOP_WORDS]
+
+
+def analyse(text, language=None):
+    """Index terms for ``text``; every stem of every word, in order"""
+    return [term for group in term_groups(text, language) for term in sorted(group)]
@@ -0,0 +1,166 @@
+# app/utils/trends.py - Incremental per-tag, per-hour feedback counters
+"""Hourly tag counters behind the trending-issue check.
+
+``record_results`` runs inside the NLP batch write path, before the feedback
+UPDATE, and turns a chunk of scored rows into per ``(tag, hour, location)``
+deltas: +1 for each new tag and -1 for whatever the row counted before when
+it is re-processed, so re-scoring never double counts. Deltas are applied
+with one upsert per chunk. Reading a trend window then costs one grouped
+query over ``tags x hours x locations`` buckets, however much feedback
+arrived.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from app import db
+from app.models import TrendBucket, UserFeedback
+from app.utils.db_helpers import dialect_insert
+
+REBUILD_CHUNK = 1000
+
+
+def hour_bucket(moment):
+    return (moment or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+
+
+def _contributions(tags, created_at, location):
+    bucket = hour_bucket(created_at)
+    return [(tag, bucket, location or '') for tag in set(tags or ())]
+
+
+def previous_rows(results):
+    """``{id: row}`` of the stored state of the feedback rows about to be updated"""
+    return {
+        row.id: row for row in db.session.query(
+            UserFeedback.id, UserFeedback.created_at, UserFeedback.tags,
+            UserFeedback.location, UserFeedback.sentiment_score, UserFeedback.is_processed
+        ).filter(UserFeedback.id.in_([r['id'] for r in results]))
+    }
+
+
+def record_results(results, previous=None):
+    """Add bucket deltas for scored rows; the caller commits with the UPDATE.
+
+    ``previous`` is ``previous_rows(results)`` when the caller already has it.
+    Returns the applied ``{(tag, bucket, location): delta}`` mapping.
+    """
+    if not results:
+        return Counter()
+    if previous is None:
+        previous = previous_rows(results)
+
+    deltas = Counter()
+    for result in results:
+        old = previous.get(result['id'])
+        if old is None:
+            continue
+        if old.is_processed:
+            deltas.subtract(_contributions(old.tags, old.created_at, old.location))
+        deltas.update(_contributions(result['tags'], old.created_at, result['location']))
+    apply_deltas(deltas)
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Upsert ``{(tag, bucket, location): delta}`` into trend_bucket"""
+    rows = [{'tag': tag, 'bucket': bucket, 'location': location, 'count': delta}
+            for (tag, bucket, location), delta in deltas.items() if delta]
+    if not rows:
+        return
+
+    table = TrendBucket.__table__
+    stmt = dialect_insert(table)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['tag', 'bucket', 'location'],
+            set_={'count': table.c.count + stmt.excluded['count']}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.tag == row['tag'], table.c.bucket == row['bucket'],
+                   table.c.location == row['location'])
+            .values(count=table.c.count + row['count'])
+        ).rowcount
+        if not updated:
+            db.session.execute(table.insert().values(**row))
+
+
+def window_start(window_hours, now=None):
+    return hour_bucket(now) - timedelta(hours=window_hours - 1)
+
+
+def tag_counts(window_hours=24, min_count=1, now=None):
+    """``{tag: count}`` for the last ``window_hours`` hourly buckets"""
+    total = db.func.sum(TrendBucket.count)
+    rows = db.session.execute(
+        select(TrendBucket.tag, total)
+        .where(TrendBucket.bucket >= window_start(window_hours, now))
+        .group_by(TrendBucket.tag)
+        .having(total >= min_count)
+    ).all()
+    return dict(rows)
+
+
+def tag_locations(tags, window_hours=24, now=None):
+    """``{tag: [locations]}`` seen in the window, for the given tags"""
+    if not tags:
+        return {}
+    rows = db.session.execute(
+        select(TrendBucket.tag, TrendBucket.location)
+        .where(TrendBucket.tag.in_(list(tags)),
+               TrendBucket.bucket >= window_start(window_hours, now),
+               TrendBucket.location != '')
+        .group_by(TrendBucket.tag, TrendBucket.location)
+        .having(db.func.sum(TrendBucket.count) > 0)
+        .order_by(TrendBucket.location)
+    ).all()
+    locations = {tag: [] for tag in tags}
+    for tag, location in rows:
+        locations[tag].append(location)
+    return locations
+
+
+def prune_buckets(retention_hours, now=None):
+    """Drop buckets older than ``retention_hours``; the caller commits"""
+    return db.session.execute(
+        delete(TrendBucket)
+        .where(TrendBucket.bucket < window_start(retention_hours, now))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def rebuild_buckets(hours, now=None):
+    """Recount the last ``hours`` of processed feedback, e.g. after deploying.
+
+    Processed rows are read in id order, ``REBUILD_CHUNK`` at a time.
+    """
+    since = window_start(hours, now)
+    db.session.execute(
+        delete(TrendBucket).where(TrendBucket.bucket >= since)
+        .execution_options(synchronize_session=False)
+    )
+
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            UserFeedback.id, UserFeedback.created_at, UserFeedback.tags, UserFeedback.location
+        ).filter(
+            UserFeedback.is_processed == True,  # noqa: E712
+            UserFeedback.created_at >= since,
+            UserFeedback.id > last_id
+        ).order_by(UserFeedback.id).limit(REBUILD_CHUNK).all()
+        if not rows:
+            break
+        deltas = Counter()
+        for row in rows:
+            deltas.update(_contributions(row.tags, row.created_at, row.location))
+        apply_deltas(deltas)
+        last_id = rows[-1].id
+
+    db.session.commit()
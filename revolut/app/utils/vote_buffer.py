@@ -0,0 +1,201 @@
+# app/utils/vote_buffer.py - Write-behind buffer for poll votes
+"""Per-process write-behind buffer for poll votes (``POLL_VOTE_MODE=buffered``).
+
+The caller commits the vote's ``poll_voter`` row first, so only votes that
+passed the duplicate check are buffered. A vote is then acknowledged as
+soon as it is counted in memory. A background
+thread flushes every ``POLL_VOTE_FLUSH_INTERVAL`` seconds, or sooner once
+``POLL_VOTE_MAX_PENDING`` votes are waiting, and turns everything it drained
+into one ``UPDATE poll_option SET votes = votes + n`` per option and a single
+commit. A USSD campaign on one poll therefore costs a couple of statements
+per interval instead of a transaction per vote.
+
+``load_options`` adds ``pending()`` to the stored counts, so results include
+buffered votes in the process that took them. Other processes see them after
+the next flush. Pending votes are flushed at interpreter exit; a crash loses
+at most one interval's worth, which is the trade-off for the mode.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, OrderedDict
+
+from flask import current_app
+
+from app import db
+from app.models import Poll
+
+logger = logging.getLogger(__name__)
+
+# Polls whose option ids are remembered; the least recently voted on go first
+OPTION_CACHE_SIZE = 1024
+
+
+class VoteBuffer:
+    def __init__(self, interval=1.0, max_pending=1000, option_cache_size=OPTION_CACHE_SIZE):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.option_cache_size = option_cache_size
+        self._pending = Counter()
+        self._inflight = Counter()
+        self._pending_total = 0
+        self._option_ids = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._app = None
+        self.flushes = 0
+        self.flushed_votes = 0
+
+    def has_option(self, poll, option_id):
+        """True when ``option_id`` is one of ``poll``'s options"""
+        return option_id in self._valid_options(poll)
+
+    def _valid_options(self, poll):
+        """Option ids of ``poll``; they never change, so they are looked up once"""
+        with self._lock:
+            option_ids = self._option_ids.get(poll.id)
+            if option_ids is not None:
+                self._option_ids.move_to_end(poll.id)
+                return option_ids
+
+        from app.utils.poll_votes import load_options
+        option_ids = frozenset(option['id'] for option in load_options([poll])[poll.id])
+        with self._lock:
+            self._option_ids[poll.id] = option_ids
+            while len(self._option_ids) > self.option_cache_size:
+                self._option_ids.popitem(last=False)
+        return option_ids
+
+    def forget(self, poll_id):
+        """Drop a deleted poll's option ids"""
+        with self._lock:
+            self._option_ids.pop(poll_id, None)
+
+    def add(self, poll, option_id):
+        """Buffer one vote; returns False when the option doesn't exist"""
+        if not self.has_option(poll, option_id):
+            return False
+        with self._lock:
+            self._pending[(poll.id, option_id)] += 1
+            self._pending_total += 1
+            full = self._pending_total >= self.max_pending
+        if full:
+            self._wake.set()
+        return True
+
+    def pending(self, poll_ids):
+        """``{(poll_id, option_id): votes}`` not yet committed, for ``poll_ids``"""
+        poll_ids = set(poll_ids)
+        with self._lock:
+            deltas = Counter({key: n for key, n in self._pending.items() if key[0] in poll_ids})
+            deltas.update({key: n for key, n in self._inflight.items() if key[0] in poll_ids})
+        return deltas
+
+    def flush(self):
+        """Write buffered votes with one UPDATE per option; returns the vote count.
+
+        Must run in an app context. On failure the votes go back into the
+        buffer for the next attempt.
+        """
+        from app.utils.poll_votes import record_vote
+
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending, self._pending_total = self._pending, Counter(), 0
+                self._inflight = batch
+
+            try:
+                polls = {poll.id: poll for poll in
+                         Poll.query.filter(Poll.id.in_({poll_id for poll_id, _ in batch}))}
+                for (poll_id, option_id), votes in batch.items():
+                    poll = polls.get(poll_id)
+                    if poll is None or not record_vote(poll, option_id, votes):
+                        logger.warning(f"Dropped {votes} buffered votes for poll {poll_id} option {option_id}")
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    self._pending.update(batch)
+                    self._pending_total += sum(batch.values())
+                    self._inflight = Counter()
+                raise
+
+            with self._lock:
+                self._inflight = Counter()
+            written = sum(batch.values())
+            self.flushes += 1
+            self.flushed_votes += written
+            return written
+
+    def start(self, app):
+        """Start the flusher thread (again, e.g. in a forked worker)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._app = app
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='poll-vote-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"Poll vote flush failed, will retry: {e}")
+                finally:
+                    db.session.remove()
+
+    def stop(self):
+        """Stop the flusher and write whatever is still buffered"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+        if self._app is not None:
+            with self._app.app_context():
+                self.flush()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    """Process-wide buffer when ``POLL_VOTE_MODE`` is ``buffered``, else None"""
+    global _buffer
+    config = current_app.config
+    if config['POLL_VOTE_MODE'] != 'buffered':
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = VoteBuffer(interval=config['POLL_VOTE_FLUSH_INTERVAL'],
+                                     max_pending=config['POLL_VOTE_MAX_PENDING'])
+                atexit.register(_buffer.stop)
+    _buffer.start(current_app._get_current_object())
+    return _buffer
+
+
+def forget_buffered_poll(poll_id):
+    """Drop a deleted poll from the process buffer, if there is one"""
+    if _buffer is not None:
+        _buffer.forget(poll_id)
+
+
+def reset_vote_buffer():
+    """Flush and discard the process buffer"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is not None:
+            atexit.unregister(_buffer.stop)
+            _buffer.stop()
+        _buffer = None
@@ -0,0 +1,120 @@
+# benchmarks/bench_dashboard.py - Dashboard aggregates: row counters vs per-request scans
+"""Time the dashboard's counts and averages with ``--feedback`` rows.
+
+Compares ``dashboard_aggregates()`` (one grouped read of ``row_counter``)
+with the queries ``GET /api/dashboard-data`` used to run on every load: six
+``COUNT(*)``s, the per-location sentiment, the positive count, the average
+rating, one ``avg(sentiment)`` per day for seven days and the issue
+categories. Also times the exact recount the NLP worker runs in the
+background.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_dashboard.py [--feedback 300000] [--database-url URL]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_CHUNK = 20000
+REPEAT = 10
+LOCATIONS = ('Kibra', 'Kisumu', 'Nairobi West', 'Mombasa', 'Githurai', 'Eldoret', None)
+CATEGORIES = ('Water', 'Roads', 'Health', 'Security', 'Energy')
+
+
+def timed(fn, repeat=REPEAT):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def scanned_aggregates():
+    """The queries the dashboard ran before the counters"""
+    from app import db
+    from app.models import Issue, Official, Poll, User, UserFeedback
+
+    counts = [model.query.count() for model in (User, Poll, UserFeedback, Issue, Official)]
+    counts.append(Issue.query.filter_by(status='Open').count())
+    locations = db.session.query(UserFeedback.location, db.func.avg(UserFeedback.sentiment_score),
+                                 db.func.count()).filter(UserFeedback.location.isnot(None)) \
+        .group_by(UserFeedback.location).all()
+    positive = UserFeedback.query.filter(UserFeedback.sentiment_score > 0.3).count()
+    rating = db.session.query(db.func.avg(Official.average_score)).scalar()
+    days = [db.session.query(db.func.avg(UserFeedback.sentiment_score)).filter(
+        db.func.date(UserFeedback.created_at) == (datetime.utcnow() - timedelta(days=i)).date()).scalar()
+        for i in range(7, 0, -1)]
+    categories = db.session.query(Issue.category, db.func.count()).group_by(Issue.category).all()
+    return counts, locations, positive, rating, days, categories
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--feedback', type=int, default=300000)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models import Issue, Official, UserFeedback
+    from app.utils.dashboard import dashboard_aggregates
+    from app.utils.feedback_rollup import rebuild_rollup
+    from app.utils.row_counts import recount
+
+    app = create_app()
+    rng = random.Random(7)
+    with app.app_context():
+        db.create_all()
+        start = datetime.utcnow() - timedelta(days=365)
+        step = 365 * 86400 / args.feedback
+        for first in range(1, args.feedback + 1, INSERT_CHUNK):
+            db.session.execute(UserFeedback.__table__.insert(), [
+                {'id': n, 'content': f"SMS report {n}", 'source': 'sms', 'is_processed': True,
+                 'location': rng.choice(LOCATIONS), 'sentiment_score': round(rng.uniform(-1, 1), 2),
+                 'created_at': start + timedelta(seconds=step * n)}
+                for n in range(first, min(first + INSERT_CHUNK, args.feedback + 1))
+            ])
+            db.session.commit()
+        issues = args.feedback // 20
+        db.session.execute(Issue.__table__.insert(), [
+            {'title': f'Issue {n}', 'description': 'Reported by SMS', 'location': rng.choice(LOCATIONS[:-1]),
+             'category': rng.choice(CATEGORIES), 'status': rng.choice(('Open', 'Resolved')),
+             'created_at': start + timedelta(seconds=step * 20 * n)}
+            for n in range(issues)
+        ])
+        db.session.execute(Official.__table__.insert(), [
+            {'name': f'Official {n}', 'position': 'MCA', 'constituency': f'Ward {n}',
+             'average_score': round(rng.uniform(1, 5), 2), 'rating_count': 1}
+            for n in range(1500)
+        ])
+        db.session.commit()
+
+        recount_ms, _ = timed(recount, repeat=1)
+        rebuild_rollup(days=8)
+        db.session.commit()
+        counters_ms, counted = timed(dashboard_aggregates)
+        scanned_ms, scanned = timed(scanned_aggregates, repeat=3)
+        assert counted['total_feedback'] == scanned[0][2]
+
+    print(f"{args.feedback} feedback rows, {issues} issues ({os.environ['DATABASE_URL'].split(':')[0]})")
+    print(f"{'per-request scans':<22} {scanned_ms:>9.2f} ms")
+    print(f"{'row counters':<22} {counters_ms:>9.2f} ms")
+    print(f"{'background recount':<22} {recount_ms:>9.2f} ms")
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_feedback_daily.py - Daily sentiment series: rollup vs per-day scans
+"""Time a 7, 30 and 365 day sentiment series with ``--feedback`` processed rows.
+
+Compares ``daily_series`` (one range scan of ``feedback_daily``) with the
+old loop of one ``avg(sentiment_score) ... WHERE date(created_at) = day``
+query per day, which cannot use an index on ``created_at``. The old loop is
+only timed for 7 and 30 days.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_feedback_daily.py [--feedback 300000] [--database-url URL]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_CHUNK = 20000
+REPEAT = 10
+LOCATIONS = ('Kibra', 'Kisumu', 'Nairobi West', 'Mombasa', 'Githurai', 'Eldoret', None)
+TAGS = (['water'], ['roads'], ['health'], ['security', 'water'], [])
+
+
+def timed(fn, repeat=REPEAT):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def per_day_loop(days):
+    """The dashboard's old chart query, one scan per day"""
+    from app import db
+    from app.models import UserFeedback
+
+    today = datetime.utcnow().date()
+    return [db.session.query(db.func.avg(UserFeedback.sentiment_score)).filter(
+        db.func.date(UserFeedback.created_at) == today - timedelta(days=i)).scalar() or 0
+        for i in range(days - 1, -1, -1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--feedback', type=int, default=300000)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models import FeedbackDaily, UserFeedback
+    from app.utils.feedback_rollup import daily_series, last_days, rebuild_rollup
+
+    app = create_app()
+    rng = random.Random(7)
+    with app.app_context():
+        db.create_all()
+        start = datetime.utcnow() - timedelta(days=730)
+        step = 730 * 86400 / args.feedback
+        for first in range(1, args.feedback + 1, INSERT_CHUNK):
+            db.session.execute(UserFeedback.__table__.insert(), [
+                {'id': n, 'content': f"SMS report {n}", 'source': 'sms', 'is_processed': True,
+                 'location': rng.choice(LOCATIONS), 'tags': rng.choice(TAGS),
+                 'sentiment_score': round(rng.uniform(-1, 1), 2), 'created_at': start + timedelta(seconds=step * n)}
+                for n in range(first, min(first + INSERT_CHUNK, args.feedback + 1))
+            ])
+            db.session.commit()
+        rebuild_ms, _ = timed(rebuild_rollup, repeat=1)
+        db.session.commit()
+        rollup_rows = FeedbackDaily.query.count()
+
+        print(f"{args.feedback} processed feedback rows over 2 years, {rollup_rows} rollup rows "
+              f"({os.environ['DATABASE_URL'].split(':')[0]}); full rebuild {rebuild_ms:.0f} ms")
+        print(f"{'days':>5} {'rollup ms':>10} {'per-day ms':>11}")
+        for days in (7, 30, 365):
+            rollup_ms, series = timed(lambda: daily_series(*last_days(days)))
+            loop_ms = None
+            if days <= 30:
+                loop_ms, averages = timed(lambda: per_day_loop(days), repeat=1)
+                assert [round(day['avg_sentiment'], 6) for day in series] == [round(a, 6) for a in averages]
+            print(f"{days:>5} {rollup_ms:>10.2f} {loop_ms if loop_ms is not None else float('nan'):>11.2f}")
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_feedback_listing.py - GET /api/feedback latency vs table size and depth
+"""Time the first and a deep page of ``GET /api/feedback`` with ``--feedback`` rows.
+
+For the unfiltered and the ``sentiment=negative`` listing, the deep page is
+reached by following ``next_cursor`` and compared with the same page through
+the old ``paginate()`` (``COUNT(*)`` plus ``OFFSET``).
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_feedback_listing.py [--feedback 300000] [--per-page 20] [--database-url URL]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_CHUNK = 20000
+REPEAT = 10
+
+
+def timed(fn):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        result = fn()
+    return (time.perf_counter() - started) / REPEAT * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--feedback', type=int, default=300000)
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models import SENTIMENT_BANDS, UserFeedback
+    from app.utils.row_counts import recount
+
+    app = create_app()
+    rng = random.Random(7)
+    with app.app_context():
+        db.create_all()
+        start = datetime.utcnow() - timedelta(days=365)
+        for first in range(1, args.feedback + 1, INSERT_CHUNK):
+            db.session.execute(UserFeedback.__table__.insert(), [
+                {'id': n, 'content': f"SMS report {n}", 'source': 'sms', 'is_processed': True,
+                 'sentiment_score': round(rng.uniform(-1, 1), 2), 'created_at': start + timedelta(seconds=30 * n)}
+                for n in range(first, min(first + INSERT_CHUNK, args.feedback + 1))
+            ])
+            db.session.commit()
+        recount()
+        db.session.commit()
+
+    client = app.test_client()
+    per_page = args.per_page
+    print(f"{args.feedback} feedback rows, {per_page} per page ({os.environ['DATABASE_URL'].split(':')[0]})")
+    print(f"{'listing':<10} {'page':>6} {'cursor ms':>10} {'paginate ms':>12}")
+    for sentiment in (None, 'negative'):
+        base = f'/api/feedback?per_page={per_page}' + (f'&sentiment={sentiment}' if sentiment else '')
+        with app.app_context():
+            query = UserFeedback.query
+            if sentiment:
+                query = query.filter(SENTIMENT_BANDS[sentiment])
+            matching = query.count()
+        depth = max(1, matching // per_page // 2)
+
+        cursors = {1: None}
+        cursor = None
+        for page in range(2, depth + 1):
+            cursor = client.get(base + (f'&cursor={cursor}' if cursor else '')).get_json()['next_cursor']
+            cursors[page] = cursor
+        for page in (1, depth):
+            url = base + (f'&cursor={cursors[page]}' if cursors[page] else '')
+            ms, response = timed(lambda: client.get(url))
+            assert response.get_json()['count'] == per_page
+            with app.app_context():
+                old_ms, _ = timed(lambda: query.order_by(UserFeedback.created_at.desc())
+                                  .paginate(page=page, per_page=per_page, error_out=False).items)
+            print(f"{sentiment or 'all':<10} {page:>6} {ms:>10.2f} {old_ms:>12.2f}")
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_issue_listing.py - GET /api/issues query count and latency vs page size
+"""Count the SQL statements behind one ``GET /api/issues`` page at several sizes.
+
+Loads ``--issues`` issues with ``--feedback`` feedback rows each, then counts
+statements per page for the plain and the searched listing and asserts the
+count does not grow with ``per_page``. Times each page next to the old
+per-issue ``COUNT(*)`` loop.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_issue_listing.py [--issues 20000] [--feedback 5] [--database-url URL]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_CHUNK = 5000
+REPEAT = 20
+PAGE_SIZES = (10, 50, 100)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        result = fn()
+    return (time.perf_counter() - started) / REPEAT * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--issues', type=int, default=20000)
+    parser.add_argument('--feedback', type=int, default=5, help='Feedback rows per issue.')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from sqlalchemy import event
+
+    from app import create_app, db
+    from app.models import Issue, UserFeedback
+    from app.utils.search import rebuild_index
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        for first in range(1, args.issues + 1, INSERT_CHUNK):
+            ids = range(first, min(first + INSERT_CHUNK, args.issues + 1))
+            db.session.execute(Issue.__table__.insert(), [
+                {'id': n, 'title': f"Blocked drainage {n}", 'description': 'Water floods the road',
+                 'location': 'Kibra', 'status': 'Open'} for n in ids
+            ])
+            db.session.execute(UserFeedback.__table__.insert(), [
+                {'content': 'Still not fixed', 'issue_id': n, 'is_processed': True}
+                for n in ids for _ in range(args.feedback)
+            ])
+            db.session.commit()
+        rebuild_index('issue', batch_size=INSERT_CHUNK)
+
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *rest: statements.append(statement))
+
+        def old_counts(per_page):
+            issues = Issue.query.order_by(Issue.created_at.desc()).limit(per_page).all()
+            return [UserFeedback.query.filter_by(issue_id=issue.id).count() for issue in issues]
+
+        client = app.test_client()
+        print(f"{args.issues} issues, {args.issues * args.feedback} feedback "
+              f"({os.environ['DATABASE_URL'].split(':')[0]})")
+        print(f"{'listing':<10} {'per_page':>8} {'queries':>8} {'GET ms':>8} {'old N+1 counts ms':>18}")
+        for label, extra in (('plain', ''), ('search', '&search=drainage')):
+            counts = set()
+            for per_page in PAGE_SIZES:
+                url = f'/api/issues?per_page={per_page}{extra}'
+                client.get(url)
+                del statements[:]
+                response = client.get(url)
+                body = response.get_json()
+                assert len(body['issues']) == per_page and body['issues'][0]['feedback_count'] == args.feedback
+                queries = len(statements)
+                counts.add(queries)
+                ms, _ = timed(lambda: client.get(url))
+                old_ms, _ = timed(lambda: old_counts(per_page))
+                print(f"{label:<10} {per_page:>8} {queries:>8} {ms:>8.2f} {old_ms:>18.2f}")
+            assert len(counts) == 1, f"{label} listing query count grows with page size: {sorted(counts)}"
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
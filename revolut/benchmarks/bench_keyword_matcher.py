@@ -0,0 +1,143 @@
+# benchmarks/bench_keyword_matcher.py - Keyword matching cost per message
+"""Compare the old per-call keyword scans with the precompiled index.
+
+Only the keyword work is timed (categorisation, location extraction and the
+sentiment indicator counts); TextBlob polarity is identical in both paths.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_keyword_matcher.py [--messages 100000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.nlp_processor import EnhancedNLPProcessor  # noqa: E402
+
+# Roughly one word in four of real SMS feedback hits a keyword table
+KEYWORDS = [
+    'maji', 'barabara', 'mbaya', 'water', 'working', 'ward', 'hospital', 'medicine',
+    'good', 'school', 'teacher', 'nairobi', 'kisumu', 'police', 'bribe', 'garbage',
+    'road', 'pipe', 'county', 'nzuri', 'repair', 'broken', 'clinic', 'doctor',
+    'shule', 'taka', 'mazingira'
+]
+FILLER = [
+    'the', 'is', 'not', 'in', 'our', 'lack', 'of', 'sana', 'please', 'help', 'we',
+    'need', 'kibra', 'since', 'monday', 'hakuna', 'there', 'has', 'been', 'no',
+    'for', 'three', 'weeks', 'and', 'nobody', 'came', 'to', 'fix', 'it', 'yet',
+    'kwa', 'sababu', 'watoto', 'wetu', 'leo', 'tena', 'this', 'area', 'people'
+]
+
+
+def make_corpus(size, seed=42):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        words = [rng.choice(KEYWORDS) if rng.random() < 0.25 else rng.choice(FILLER)
+                 for _ in range(rng.randint(4, 30))]
+        corpus.append(' '.join(words))
+    return corpus
+
+
+class LegacyKeywords:
+    """The pre-index implementation, minus TextBlob"""
+
+    def __init__(self, processor):
+        self.category_keywords = processor.category_keywords
+        self.positive_indicators = processor.positive_indicators
+        self.negative_indicators = processor.negative_indicators
+
+    def indicators(self, text):
+        positive_count = sum(1 for word in self.positive_indicators if word in text)
+        negative_count = sum(1 for word in self.negative_indicators if word in text)
+        return positive_count, negative_count
+
+    def categorize(self, text):
+        category_scores = {}
+        words = re.findall(r'\b\w+\b', text.lower())
+        word_set = set(words)
+        for category, keywords in self.category_keywords.items():
+            matches = len(word_set.intersection(set(keywords)))
+            if matches > 0:
+                category_scores[category] = matches / len(keywords)
+        categories = [cat for cat, score in category_scores.items() if score >= 0.02]
+        if not categories:
+            categories = self.infer(text)
+        return categories[:3]
+
+    def infer(self, text):
+        categories = []
+        if any(phrase in text for phrase in ['not working', 'broken', 'damaged', 'needs repair']):
+            if any(word in text for word in ['road', 'street', 'bridge']):
+                categories.append('infrastructure')
+            elif any(word in text for word in ['water', 'pipe', 'tap']):
+                categories.append('water_supply')
+        if any(phrase in text for phrase in ['lack of', 'shortage', 'unavailable', 'missing']):
+            if any(word in text for word in ['medicine', 'doctor', 'treatment']):
+                categories.append('healthcare')
+            elif any(word in text for word in ['teacher', 'books', 'classroom']):
+                categories.append('education')
+        return categories
+
+    def location(self, text):
+        kenyan_locations = [
+            'nairobi', 'mombasa', 'kisumu', 'nakuru', 'eldoret', 'thika', 'malindi',
+            'kitale', 'garissa', 'kakamega', 'nyeri', 'machakos', 'meru', 'embu',
+            'county', 'ward', 'constituency', 'sub-county', 'location', 'village'
+        ]
+        words = text.lower().split()
+        for i, word in enumerate(words):
+            if word in kenyan_locations:
+                if word in ['county', 'ward', 'constituency'] and i > 0:
+                    return f"{words[i-1].title()} {word.title()}"
+                elif word in kenyan_locations[:14]:
+                    return word.title()
+        return None
+
+    def run(self, text):
+        return self.indicators(text), self.categorize(text), self.location(text)
+
+
+def run_index(processor, text):
+    match = processor.matcher.match(text)
+    return (len(match.positive), len(match.negative)), processor.matcher.categories(match), match.location
+
+
+def timed(fn, corpus):
+    started = time.perf_counter()
+    for text in corpus:
+        fn(text)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages)
+
+    started = time.perf_counter()
+    processor = EnhancedNLPProcessor()
+    build = time.perf_counter() - started
+    legacy = LegacyKeywords(processor)
+
+    legacy_time = timed(legacy.run, corpus)
+    index_time = timed(lambda text: run_index(processor, text), corpus)
+
+    agree = sum(1 for text in corpus if legacy.categorize(text) == run_index(processor, text)[1])
+
+    print(f"messages:           {len(corpus)}")
+    print(f"index build:        {build * 1000:.2f} ms (once per processor)")
+    print(f"legacy scans:       {legacy_time:.2f} s  ({legacy_time / len(corpus) * 1e6:.1f} us/message)")
+    print(f"precompiled index:  {index_time:.2f} s  ({index_time / len(corpus) * 1e6:.1f} us/message)")
+    print(f"speedup:            {legacy_time / index_time:.1f}x")
+    print(f"same categories:    {agree / len(corpus) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# benchmarks/bench_official_lookup.py - Rating lookup cost vs number of officials
+"""Time finding the official for a rating among ``--officials`` officials.
+
+Compares the old ``lower()`` match on three columns, the indexed
+``lookup_key`` query and the cached lookup (warmed first), then times whole
+``POST /api/scorecards/rate`` requests. Prints the query plan of both
+queries so the index use is visible.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_official_lookup.py [--officials 100000] [--samples 500] [--database-url URL]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_CHUNK = 10000
+POSITIONS = ['MCA', 'MP', 'Senator', 'Governor', 'Women Rep']
+
+
+def official_fields(n):
+    return f"Official Número {n}", POSITIONS[n % len(POSITIONS)], f"Ward {n % 1450}"
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    pick = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))] * 1000
+    return pick(0.5), pick(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--officials', type=int, default=100000)
+    parser.add_argument('--samples', type=int, default=500, help='Lookups timed per case.')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models import Official
+    from app.utils.official_lookup import find_official_id, official_lookup_key
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        for first in range(0, args.officials, INSERT_CHUNK):
+            rows = []
+            for n in range(first, min(first + INSERT_CHUNK, args.officials)):
+                name, position, constituency = official_fields(n)
+                rows.append({'name': name, 'position': position, 'constituency': constituency,
+                             'lookup_key': official_lookup_key(name, position, constituency),
+                             'average_score': 0.0, 'rating_count': 0})
+            db.session.execute(Official.__table__.insert(), rows)
+            db.session.commit()
+
+        picks = [official_fields(n) for n in random.Random(7).choices(range(args.officials), k=args.samples)]
+
+        def lower_match(name, position, constituency):
+            return db.session.query(Official.id).filter(
+                db.func.lower(Official.name) == db.func.lower(name),
+                db.func.lower(Official.position) == db.func.lower(position),
+                db.func.lower(Official.constituency) == db.func.lower(constituency)
+            ).first()
+
+        def key_match(name, position, constituency):
+            return db.session.query(Official.id).filter(
+                Official.lookup_key == official_lookup_key(name, position, constituency)
+            ).first()
+
+        if db.engine.dialect.name in ('sqlite', 'postgresql'):
+            explain = 'EXPLAIN QUERY PLAN' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN'
+            plans = {
+                'lower()': db.session.query(Official.id).filter(db.func.lower(Official.name) == 'x',
+                                                                db.func.lower(Official.position) == 'x',
+                                                                db.func.lower(Official.constituency) == 'x'),
+                'lookup_key': db.session.query(Official.id).filter(Official.lookup_key == 'x'),
+            }
+            for label, query in plans.items():
+                statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+                plan = db.session.execute(db.text(f"{explain} {statement}")).all()
+                print(f"plan {label:<11} {' / '.join(str(row[-1]) for row in plan)}")
+
+        for fields in picks:
+            find_official_id(*fields)
+        cases = [
+            ('lower() on 3 columns', lower_match),
+            ('lookup_key index', key_match),
+            ('cached lookup (warm)', find_official_id),
+        ]
+        print(f"{args.officials} officials ({os.environ['DATABASE_URL'].split(':')[0]})")
+        print(f"{'case':<22} {'p50 ms':>8} {'p99 ms':>8}")
+        for label, fn in cases:
+            timings = []
+            for name, position, constituency in picks:
+                started = time.perf_counter()
+                found = fn(name, position, constituency)
+                timings.append(time.perf_counter() - started)
+                assert found is not None
+            p50, p99 = percentiles(timings)
+            print(f"{label:<22} {p50:>8.3f} {p99:>8.3f}")
+
+    client = app.test_client()
+    timings = []
+    for name, position, constituency in picks:
+        started = time.perf_counter()
+        response = client.post('/api/scorecards/rate', json={'name': name.upper(), 'position': position,
+                                                              'constituency': constituency, 'score': 4})
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    p50, p99 = percentiles(timings)
+    print(f"{'POST /scorecards/rate':<22} {p50:>8.3f} {p99:>8.3f}")
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/bench_official_typeahead.py - Official search latency, ILIKE vs typeahead index
+"""Time ``/api/scorecards/search`` suggestions among ``--officials`` officials.
+
+Types each sampled name one keystroke at a time and times the old
+``name ILIKE '%...%' LIMIT 10`` query against ``OfficialTypeahead.suggest``
+for every prefix, with and without its result cache, plus misspelt names the
+ILIKE query cannot find. Prints the index build time and memory footprint.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_official_typeahead.py [--officials 2000] [--samples 200] [--database-url URL]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_CHUNK = 10000
+FIRST_NAMES = ['Wanjiru', 'Kamau', 'Achieng', 'Otieno', 'Mohammed', 'Faith', 'Kiprono', 'Chebet', 'Mwangi',
+               'Njeri', 'Hassan', 'Amina', 'Odhiambo', 'Wafula', 'Nekesa', 'Kariuki', 'Gathoni', 'Mutua']
+SURNAMES = ['Kamau', "Nyong'o", 'Odhiambo', 'Kariuki', 'Ruto', 'Wambui', 'Abdullahi', 'Kiplagat', 'Muthoni',
+            'Owino', 'Barasa', 'Langat', 'Ochieng', 'Kilonzo', 'Jeptoo', 'Macharia', 'Nyambura', 'Omondi']
+POSITIONS = ['MCA', 'MP', 'Senator', 'Governor', 'Women Rep']
+MISSPELLINGS = [('Odhiambo', 'odiambo'), ('Kariuki', 'kaliuki'), ("Nyong'o", 'nyongo'), ('Mohammed', 'muhamed'),
+                ('Macharia', 'macharai'), ('Jeptoo', 'jepto')]
+
+
+def official_fields(n):
+    rng = random.Random(n)
+    return (f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)}", POSITIONS[n % len(POSITIONS)],
+            f"Ward {n % 1450}")
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    pick = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))] * 1000
+    return pick(0.5), pick(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--officials', type=int, default=2000)
+    parser.add_argument('--samples', type=int, default=200, help='Names typed per case.')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models import Official
+    from app.utils.official_lookup import official_lookup_key
+    from app.utils.official_typeahead import OfficialTypeahead, get_official_typeahead
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        for first in range(0, args.officials, INSERT_CHUNK):
+            rows = []
+            for n in range(first, min(first + INSERT_CHUNK, args.officials)):
+                name, position, constituency = official_fields(n)
+                rows.append({'name': name, 'position': position, 'constituency': constituency,
+                             'lookup_key': official_lookup_key(name, position, constituency),
+                             'average_score': 0.0, 'rating_count': n % 50})
+            db.session.execute(Official.__table__.insert(), rows)
+            db.session.commit()
+
+        index = get_official_typeahead()
+        stats = index.stats()
+        print(f"{args.officials} officials ({os.environ['DATABASE_URL'].split(':')[0]})")
+        print(f"index: built in {stats['build_ms']:.1f} ms, {stats['words']} words, "
+              f"{stats['postings']} postings, {stats['bytes'] / 1024 / 1024:.2f} MB")
+
+        # Same index without the result cache, so every keystroke is ranked from scratch
+        uncached = OfficialTypeahead(max_cached=0)
+        uncached.load(db.session.query(Official.id, Official.name, Official.position, Official.constituency,
+                                       Official.average_score, Official.rating_count))
+
+        names = [official_fields(n)[0] for n in random.Random(7).choices(range(args.officials), k=args.samples)]
+        keystrokes = [name[:n] for name in names for n in range(1, len(name) + 1)]
+
+        def ilike(query):
+            return Official.query.filter(Official.name.ilike(f'%{query}%')).limit(10).all()
+
+        print(f"{'case':<24} {'p50 ms':>8} {'p99 ms':>8} {'found':>6}")
+        for label, fn in (('ILIKE per keystroke', ilike), ('typeahead, uncached', uncached.suggest),
+                          ('typeahead, cached', index.suggest)):
+            timings, found = [], 0
+            for query in keystrokes:
+                started = time.perf_counter()
+                found += bool(fn(query))
+                timings.append(time.perf_counter() - started)
+            p50, p99 = percentiles(timings)
+            print(f"{label:<24} {p50:>8.3f} {p99:>8.3f} {found * 100 // len(keystrokes):>5}%")
+
+        for label, fn in (('ILIKE misspelt', ilike), ('typeahead misspelt', index.suggest)):
+            hits = sum(any(correct in official.name for official in fn(typo))
+                       if fn is ilike else any(correct in s['name'] for s in fn(typo))
+                       for correct, typo in MISSPELLINGS)
+            print(f"{label:<24} {hits}/{len(MISSPELLINGS)} misspellings found")
+
+    client = app.test_client()
+    timings = []
+    for query in keystrokes[:2000]:
+        started = time.perf_counter()
+        response = client.get('/api/scorecards/search', query_string={'name': query})
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    p50, p99 = percentiles(timings)
+    print(f"{'GET /scorecards/search':<24} {p50:>8.3f} {p99:>8.3f}")
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_poll_dedup.py - Vote latency with a large voter history
+"""Vote latency on one poll that already has ``--prior`` voters.
+
+Three cases, each timed over ``--samples`` votes:
+
+* ``new``            first vote: claim the ``poll_voter`` row, bump the counter, commit
+* ``repeat-filter``  repeat voter this process has seen: rejected by the Bloom filter
+* ``repeat-index``   repeat voter the filter doesn't know (e.g. after a restart):
+                     rejected by the unique index
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_poll_dedup.py [--prior 1000000] [--samples 2000] [--database-url URL]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_CHUNK = 50000
+
+
+def voter(n):
+    return f"phone:2547{n:08d}"
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    pick = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))] * 1000
+    return pick(0.5), pick(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--prior', type=int, default=1000000, help='Existing voters on the poll.')
+    parser.add_argument('--samples', type=int, default=2000, help='Votes timed per case.')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models import Poll, PollOption, PollVoter
+    from app.utils.poll_dedup import VoterIndex, claim_voter
+    from app.utils.poll_votes import build_option_rows, record_vote
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        poll = Poll(question="Benchmark poll", options=[{'id': 1, 'text': 'Yes', 'votes': 0},
+                                                        {'id': 2, 'text': 'No', 'votes': 0}])
+        poll.option_rows = build_option_rows(['Yes', 'No'])
+        db.session.add(poll)
+        db.session.commit()
+
+        started = time.perf_counter()
+        for start in range(0, args.prior, INSERT_CHUNK):
+            db.session.execute(PollVoter.__table__.insert(), [
+                {'poll_id': poll.id, 'voter_key': voter(n), 'option_id': 1 + n % 2}
+                for n in range(start, min(start + INSERT_CHUNK, args.prior))
+            ])
+            db.session.commit()
+        print(f"Loaded {args.prior} prior voters in {time.perf_counter() - started:.1f}s "
+              f"({os.environ['DATABASE_URL'].split(':')[0]})")
+
+        index = VoterIndex(capacity=app.config['POLL_VOTER_FILTER_CAPACITY'],
+                           error_rate=app.config['POLL_VOTER_ERROR_RATE'])
+
+        def vote(key, option_id):
+            if index.seen(poll.id, key):
+                return 'filter'
+            if not claim_voter(poll.id, key, option_id):
+                index.add(poll.id, key)
+                return 'index'
+            record_vote(poll, option_id)
+            db.session.commit()
+            index.add(poll.id, key)
+            return 'ok'
+
+        repeaters = random.Random(7).sample(range(args.prior), min(args.samples, args.prior))
+        cases = {
+            'new': [voter(args.prior + n) for n in range(args.samples)],
+            'repeat-index': [voter(n) for n in repeaters],
+            'repeat-filter': [voter(n) for n in repeaters],
+        }
+        expected = {'new': 'ok', 'repeat-index': 'index', 'repeat-filter': 'filter'}
+
+        print(f"{'case':<14} {'votes':>6} {'p50 ms':>8} {'p99 ms':>8} {'unexpected':>11}")
+        for case, keys in cases.items():
+            timings, unexpected = [], 0
+            for key in keys:
+                started = time.perf_counter()
+                outcome = vote(key, 1)
+                timings.append(time.perf_counter() - started)
+                unexpected += outcome != expected[case]
+            p50, p99 = percentiles(timings)
+            print(f"{case:<14} {len(keys):>6} {p50:>8.3f} {p99:>8.3f} {unexpected:>11}")
+
+        stats = index.stats()
+        print(f"Filter: {stats['voters']} voters in {stats['bytes'] / 1024:.0f} KB")
+
+        counted = db.session.query(db.func.sum(PollOption.votes)).filter_by(poll_id=poll.id).scalar()
+        print(f"Votes counted: {counted} (expected {args.samples})")
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_poll_listing.py - GET /api/polls latency vs poll history size
+"""Time the first and a deep page of ``GET /api/polls`` with ``--polls`` polls.
+
+The deep page is reached by following ``next_cursor``; its latency is
+compared with the same page fetched through ``OFFSET`` on the same index.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_poll_listing.py [--polls 20000] [--per-page 20] [--database-url URL]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_CHUNK = 5000
+REPEAT = 20
+
+
+def timed(fn):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        result = fn()
+    return (time.perf_counter() - started) / REPEAT * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--polls', type=int, default=20000)
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models import Poll, PollOption
+    from app.utils.pagination import keyset_page
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        start = datetime.utcnow() - timedelta(days=3 * 365)
+        for first in range(0, args.polls, INSERT_CHUNK):
+            ids = range(first + 1, min(first + INSERT_CHUNK, args.polls) + 1)
+            db.session.execute(Poll.__table__.insert(), [
+                {'id': n, 'question': f"Benchmark poll {n}", 'options': [{'id': 1, 'text': 'Yes', 'votes': 0}],
+                 'options_version': 2, 'created_at': start + timedelta(minutes=n),
+                 'expires_at': start + timedelta(minutes=n, days=14)} for n in ids
+            ])
+            db.session.execute(PollOption.__table__.insert(), [
+                {'poll_id': n, 'option_id': 1, 'text': 'Yes', 'votes': n % 50} for n in ids
+            ])
+            db.session.commit()
+
+    client = app.test_client()
+    per_page = args.per_page
+    depth = max(1, args.polls // per_page // 2)
+
+    first_ms, _ = timed(lambda: client.get(f'/api/polls?per_page={per_page}'))
+
+    cursor = None
+    for _ in range(depth):
+        cursor = client.get(f'/api/polls?per_page={per_page}' + (f'&cursor={cursor}' if cursor else '')).get_json()['next_cursor']
+    deep_ms, response = timed(lambda: client.get(f'/api/polls?per_page={per_page}&cursor={cursor}'))
+    assert response.status_code == 200 and response.get_json()['count'] == per_page
+
+    with app.app_context():
+        offset_ms, _ = timed(lambda: db.session.query(Poll.id, Poll.created_at)
+                             .order_by(Poll.created_at.desc(), Poll.id.desc())
+                             .offset(depth * per_page).limit(per_page + 1).all())
+        keyset_ms, _ = timed(lambda: keyset_page(db.session.query(Poll.id, Poll.created_at),
+                                                 Poll.created_at, Poll.id, cursor=cursor, per_page=per_page))
+
+    print(f"{args.polls} polls, {per_page} per page ({os.environ['DATABASE_URL'].split(':')[0]})")
+    print(f"GET first page:            {first_ms:7.2f} ms")
+    print(f"GET page {depth + 1:<6} (cursor):   {deep_ms:7.2f} ms")
+    print(f"page query, keyset:        {keyset_ms:7.2f} ms")
+    print(f"page query, OFFSET:        {offset_ms:7.2f} ms")
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
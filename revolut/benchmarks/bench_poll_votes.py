@@ -0,0 +1,147 @@
+# benchmarks/bench_poll_votes.py - Concurrent votes on one popular poll
+"""Hammer one poll from many threads and count lost votes.
+
+``atomic`` is the direct path (``UPDATE poll_option SET votes = votes + 1``);
+``buffered`` is the write-behind ``VoteBuffer`` (counts are checked after a
+final flush, and ``commits`` shows how many transactions the votes took);
+``legacy`` reproduces the old read-modify-write of the ``Poll.options`` JSON.
+Each thread votes with its own connection and, outside ``buffered``, commits
+after every vote.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_poll_votes.py [--threads 16] [--votes 50] [--database-url URL]
+
+Defaults to a throwaway SQLite file; pass a PostgreSQL URL for numbers that
+match production.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_vote(db, Poll, poll_id, option_id):
+    """The pre-PollOption vote_on_poll body"""
+    from sqlalchemy.orm.attributes import flag_modified
+
+    poll = db.session.get(Poll, poll_id)
+    updated = []
+    for option in poll.options:
+        option = dict(option)
+        if option['id'] == option_id:
+            option['votes'] += 1
+        updated.append(option)
+    poll.options = updated
+    flag_modified(poll, 'options')
+    db.session.commit()
+
+
+def run(app, mode, threads, votes_per_thread):
+    from app import db
+    from app.models import Poll, PollOption
+    from app.utils.poll_votes import build_option_rows, load_options, record_vote
+    from app.utils.vote_buffer import VoteBuffer
+
+    buffer = VoteBuffer(interval=app.config['POLL_VOTE_FLUSH_INTERVAL'],
+                        max_pending=app.config['POLL_VOTE_MAX_PENDING'])
+
+    with app.app_context():
+        poll = Poll(question="Benchmark poll", options=[{'id': 1, 'text': 'Yes', 'votes': 0},
+                                                        {'id': 2, 'text': 'No', 'votes': 0}])
+        poll.option_rows = build_option_rows(['Yes', 'No'])
+        db.session.add(poll)
+        db.session.commit()
+        poll_id = poll.id
+
+    errors = []
+    start_gate = threading.Barrier(threads)
+
+    def voter(index):
+        with app.app_context():
+            poll = db.session.get(Poll, poll_id)
+            start_gate.wait()
+            for n in range(votes_per_thread):
+                option_id = 1 + (index + n) % 2
+                try:
+                    if mode == 'atomic':
+                        record_vote(poll, option_id)
+                        db.session.commit()
+                    elif mode == 'buffered':
+                        buffer.add(poll, option_id)
+                    else:
+                        legacy_vote(db, Poll, poll_id, option_id)
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(e)
+
+    workers = [threading.Thread(target=voter, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    if mode == 'buffered':
+        buffer.start(app)
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    if mode == 'buffered':
+        buffer.stop()
+
+    with app.app_context():
+        poll = db.session.get(Poll, poll_id)
+        if mode in ('atomic', 'buffered'):
+            counted = sum(option['votes'] for option in load_options([poll])[poll_id])
+        else:
+            counted = sum(option['votes'] for option in poll.options)
+        db.session.query(PollOption).filter_by(poll_id=poll_id).delete()
+        db.session.delete(poll)
+        db.session.commit()
+
+    attempted = threads * votes_per_thread
+    return {
+        'mode': mode,
+        'attempted': attempted,
+        'failed': len(errors),
+        'counted': counted,
+        'lost': attempted - len(errors) - counted,
+        'commits': buffer.flushes if mode == 'buffered' else attempted - len(errors),
+        'votes_per_sec': (attempted - len(errors)) / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--votes', type=int, default=50, help='Votes per thread.')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+
+    print(f"{args.threads} threads x {args.votes} votes on one poll ({os.environ['DATABASE_URL'].split(':')[0]})")
+    print(f"{'mode':<8} {'attempted':>9} {'failed':>7} {'counted':>8} {'lost':>6} {'commits':>8} {'votes/sec':>10}")
+    for mode in ('atomic', 'buffered', 'legacy'):
+        r = run(app, mode, args.threads, args.votes)
+        print(f"{r['mode']:<8} {r['attempted']:>9} {r['failed']:>7} {r['counted']:>8} "
+              f"{r['lost']:>6} {r['commits']:>8} {r['votes_per_sec']:>10.0f}")
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_response_cache.py - Public JSON endpoints with and without the response cache
+"""Time repeated page-load requests against the public listings.
+
+Loads ``--officials`` officials, ``--issues`` issues and ``--polls`` polls,
+then requests each cached endpoint with ``RESPONSE_CACHE_BACKEND=none`` and
+with the in-process cache, reporting the mean time per request. Cached runs
+are warmed with one request first, so they measure the hit path.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_response_cache.py [--officials 2000] [--issues 20000] [--polls 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPEAT = 50
+ENDPOINTS = ('/api/scorecards/officials', '/api/scorecards/top', '/api/issues?status=all',
+             '/api/polls', '/api/dashboard-data')
+LOCATIONS = ('Kibra', 'Kisumu', 'Nairobi West', 'Mombasa', 'Githurai', 'Eldoret')
+
+
+def timed(client, path, repeat=REPEAT):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def populate(args, rng):
+    from app import db
+    from app.models import Issue, Official, Poll
+    from app.utils.official_lookup import official_lookup_key
+    from app.utils.poll_votes import build_option_rows
+
+    now = datetime.utcnow()
+    db.session.execute(Official.__table__.insert(), [
+        {'name': f'Official {n}', 'position': 'MCA', 'constituency': f'Ward {n}',
+         'lookup_key': official_lookup_key(f'Official {n}', 'MCA', f'Ward {n}'),
+         'average_score': round(rng.uniform(1, 5), 2), 'rating_count': rng.randint(1, 50)}
+        for n in range(args.officials)
+    ])
+    db.session.execute(Issue.__table__.insert(), [
+        {'title': f'Issue {n}', 'description': 'Reported by SMS', 'location': rng.choice(LOCATIONS),
+         'category': 'Water', 'status': 'Open', 'created_at': now - timedelta(minutes=n)}
+        for n in range(args.issues)
+    ])
+    for n in range(args.polls):
+        poll = Poll(question=f"Poll number {n} for the ward?", options=[],
+                    expires_at=now + timedelta(days=7))
+        poll.option_rows = build_option_rows(['Yes', 'No'])
+        db.session.add(poll)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--officials', type=int, default=2000)
+    parser.add_argument('--issues', type=int, default=20000)
+    parser.add_argument('--polls', type=int, default=200)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from app import create_app, db
+    from app.utils.response_cache import reset_response_cache
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        populate(args, random.Random(7))
+
+        results = {}
+        for backend in ('none', 'local'):
+            app.config['RESPONSE_CACHE_BACKEND'] = backend
+            reset_response_cache()
+            client = app.test_client()
+            for path in ENDPOINTS:
+                client.get(path)
+                results[path, backend] = timed(client, path)
+
+    print(f"{args.officials} officials, {args.issues} issues, {args.polls} polls (sqlite)")
+    print(f"{'endpoint':<28} {'uncached':>10} {'cached':>10}")
+    for path in ENDPOINTS:
+        print(f"{path.split('?')[0]:<28} {results[path, 'none']:>7.2f} ms {results[path, 'local']:>7.2f} ms")
+
+    tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
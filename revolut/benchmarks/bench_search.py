@@ -0,0 +1,102 @@
+# benchmarks/bench_search.py - Issue search latency vs table size
+"""Time ``GET /api/issues?search=`` against the old leading-wildcard ``ILIKE``.
+
+Loads ``--issues`` synthetic issues, indexes them with ``rebuild_index`` and
+times a rare term, a common term and a two-word query through each search
+backend, next to the ``ILIKE '%term%'`` filter it replaces.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_search.py [--issues 100000] [--repeat 20] [--database-url URL]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_CHUNK = 10000
+TOPICS = ['water', 'road', 'drainage', 'garbage', 'clinic', 'school', 'electricity', 'security', 'market']
+PROBLEMS = ['shortage', 'flooded', 'broken', 'blocked', 'delayed', 'dirty', 'closed', 'unsafe']
+SWAHILI = ['maji hayatoki', 'barabara imeharibika', 'taka hazijazolewa', 'hospitali haina dawa']
+PLACES = ['Kibra', 'Kisumu', 'Nairobi West', 'Eldoret', 'Mombasa', 'Githurai', 'Nakuru']
+QUERIES = ['cholera', 'water', 'flooded road']
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--issues', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models import Issue
+    from app.utils import search as search_module
+
+    app = create_app()
+    rng = random.Random(7)
+    with app.app_context():
+        db.create_all()
+        for first in range(0, args.issues, INSERT_CHUNK):
+            rows = []
+            for n in range(first, min(first + INSERT_CHUNK, args.issues)):
+                topic, problem = rng.choice(TOPICS), rng.choice(PROBLEMS)
+                description = f"The {topic} near the {rng.choice(TOPICS)} has been {problem} for {n % 30} days. {rng.choice(SWAHILI)}."
+                if n % 5000 == 0:
+                    description += ' Residents fear cholera.'
+                rows.append({'title': f"{topic.title()} {problem} in {rng.choice(PLACES)}", 'description': description,
+                             'location': rng.choice(PLACES), 'status': 'Open'})
+            db.session.execute(Issue.__table__.insert(), rows)
+            db.session.commit()
+
+        backends = [search_module.NATIVE_BACKENDS.get(db.engine.dialect.name), 'memory']
+        print(f"{args.issues} issues ({os.environ['DATABASE_URL'].split(':')[0]})")
+        print(f"{'query':<14} {'method':<10} {'ms':>8} {'matches':>8}")
+        for query in QUERIES:
+            ilike_ms, found = timed(lambda: Issue.query.filter(db.or_(
+                *[db.or_(Issue.title.ilike(f'%{word}%'), Issue.description.ilike(f'%{word}%'))
+                  for word in query.split()]
+            )).order_by(Issue.created_at.desc()).limit(20).all(), args.repeat)
+            print(f"{query:<14} {'ilike':<10} {ilike_ms:>8.2f} {len(found):>8}")
+            for name in backends:
+                if name is None:
+                    continue
+                app.config['SEARCH_BACKEND'] = name
+                search_module.reset_search_backend()
+                search_module.rebuild_index('issue', batch_size=5000)
+                search_module.search('issue', text=query)
+                ms, ids = timed(lambda: search_module.search('issue', text=query), args.repeat)
+                print(f"{query:<14} {name:<10} {ms:>8.2f} {len(ids):>8}")
+
+        client = app.test_client()
+        for name in [name for name in backends if name]:
+            app.config['SEARCH_BACKEND'] = name
+            search_module.reset_search_backend()
+            search_module.rebuild_index('issue', batch_size=5000)
+            client.get('/api/issues?search=flooded+road')
+            ms, response = timed(lambda: client.get('/api/issues?search=flooded+road&status=all'), args.repeat)
+            print(f"GET /api/issues?search=flooded+road ({name}): {ms:.2f} ms, total {response.get_json()['total']}")
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
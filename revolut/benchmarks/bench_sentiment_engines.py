@@ -0,0 +1,61 @@
+# benchmarks/bench_sentiment_engines.py - Sentiment engine accuracy and throughput
+"""Compare the textblob, lexicon and hybrid sentiment engines.
+
+Accuracy is measured against a small labelled fixture of English/Swahili SMS
+feedback using the dashboard's bands (> 0.1 positive, < -0.1 negative).
+Throughput covers the sentiment call only; each message is matched once up
+front, as the processor does.
+
+Usage (from the revolut/ directory):
+    python benchmarks/bench_sentiment_engines.py [--repeat 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.nlp_processor import EnhancedNLPProcessor  # noqa: E402
+from app.utils.sentiment import ENGINES  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'sentiment_labelled.json')
+
+
+def band(score):
+    if score > 0.1:
+        return 'positive'
+    if score < -0.1:
+        return 'negative'
+    return 'neutral'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help='Passes over the fixture for timing.')
+    parser.add_argument('--fixture', default=FIXTURE)
+    args = parser.parse_args()
+
+    with open(args.fixture) as fixture:
+        samples = json.load(fixture)
+
+    print(f"{'engine':<10} {'accuracy':>9} {'msgs/sec':>11}")
+    for name in ENGINES:
+        processor = EnhancedNLPProcessor(sentiment_engine=name)
+        engine = processor.sentiment_engine
+        matched = [(s['text'], processor.matcher.match(s['text']), s['label']) for s in samples]
+
+        correct = sum(1 for text, match, label in matched if band(engine.score(text, match)) == label)
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for text, match, _label in matched:
+                engine.score(text, match)
+        elapsed = time.perf_counter() - started
+
+        print(f"{name:<10} {correct / len(matched) * 100:>8.1f}% {len(matched) * args.repeat / elapsed:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
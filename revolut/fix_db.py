@@ -18,6 +18,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 try:
     from app import create_app, db
     from app.models import User, Role, UserFeedback, Issue, Official, Poll, Alert
+    from app.utils.official_lookup import set_lookup_key
 except ImportError as e:
     print(f"Import error: {e}")
     print("Make sure you're running this from the project root directory")
@@ -232,11 +233,11 @@ def create_sample_data():
                 position=official_data['position'],
                 constituency=official_data['constituency'],
                 department=official_data['department'],
-                ratings=[],
                 average_score=0.0,
                 rating_count=0,
                 last_updated=datetime.utcnow()
             )
+            set_lookup_key(official)
             db.session.add(official)
             print(f"✓ Created official: {official_data['name']}")
 
@@ -0,0 +1,26 @@
+# gunicorn.conf.py - Loaded automatically by gunicorn from the working directory
+import os
+
+# Poll result streams (SSE) hold a connection open for up to
+# POLL_STREAM_MAX_SECONDS, so serve requests from threads: a sync worker
+# would be blocked by a single viewer and killed by its own timeout.
+# Streams take at most POLL_STREAM_MAX_PER_WORKER (default 10) threads and
+# get a 503 past it; the other 15 threads match SQLAlchemy's default pool
+# (5 connections + 10 overflow), so ordinary requests never queue for one.
+# Raise both together, along with the pool size, if you raise either.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 25))
+
+# No NLP warm-up here: web workers only queue feedback, and `flask nlp
+# worker` loads the models itself before it claims its first batch
+
+
+def post_worker_init(worker):
+    """Build the official typeahead index once the worker has loaded the app"""
+    try:
+        from app.utils.official_typeahead import warm_official_typeahead
+        with worker.wsgi.app_context():
+            stats = warm_official_typeahead()
+        worker.log.info(f"Official typeahead ready in worker {worker.pid}: {stats}")
+    except Exception as e:
+        worker.log.warning(f"Official typeahead warm-up in worker {worker.pid} failed: {e}")
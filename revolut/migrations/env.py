@@ -94,6 +94,15 @@ def run_migrations_online():
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
+    # The full-text search tables (and FTS5's shadow tables) are not models;
+    # keep autogenerate from proposing to drop them
+    def include_object(object, name, type_, reflected, compare_to):
+        from app.models import SEARCH_TABLES
+        return not (type_ == 'table' and reflected and compare_to is None and name.startswith(SEARCH_TABLES))
+
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
+
     connectable = get_engine()
 
     with connectable.connect() as connection:
@@ -0,0 +1,37 @@
+"""Add nlp_result_cache table
+
+Revision ID: 5b7e2f8c4a10
+Revises: e3a1c9d4b7f2
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2f8c4a10'
+down_revision = 'e3a1c9d4b7f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('nlp_result_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('fingerprint', sa.String(length=16), nullable=False),
+        sa.Column('sentiment_score', sa.Float(), nullable=True),
+        sa.Column('tags', sa.JSON(), nullable=True),
+        sa.Column('location', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('nlp_result_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_nlp_result_cache_fingerprint'), ['fingerprint'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('nlp_result_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_nlp_result_cache_fingerprint'))
+
+    op.drop_table('nlp_result_cache')
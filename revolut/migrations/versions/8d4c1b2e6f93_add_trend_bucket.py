@@ -0,0 +1,36 @@
+"""Add trend_bucket counters
+
+Revision ID: 8d4c1b2e6f93
+Revises: 5b7e2f8c4a10
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4c1b2e6f93'
+down_revision = '5b7e2f8c4a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populate with `flask nlp trends --rebuild` after upgrading
+    op.create_table('trend_bucket',
+        sa.Column('tag', sa.String(length=50), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('location', sa.String(length=100), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('tag', 'bucket', 'location')
+    )
+    with op.batch_alter_table('trend_bucket', schema=None) as batch_op:
+        batch_op.create_index('ix_trend_bucket_bucket_tag', ['bucket', 'tag'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('trend_bucket', schema=None) as batch_op:
+        batch_op.drop_index('ix_trend_bucket_bucket_tag')
+
+    op.drop_table('trend_bucket')
@@ -0,0 +1,41 @@
+"""Add full-text search index tables
+
+Revision ID: a3c5e7f9b102
+Revises: d4a7c3e9f215
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f9b102'
+down_revision = 'd4a7c3e9f215'
+branch_labels = None
+depends_on = None
+
+FTS5_TABLES = {'issue_search': 'title, description, location', 'feedback_search': 'content, location'}
+
+
+def upgrade():
+    # Fill the new tables afterwards with `flask search rebuild`
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        if not bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+            return
+        for table, columns in FTS5_TABLES.items():
+            op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+                       f"USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')")
+    elif bind.dialect.name == 'postgresql':
+        op.execute("CREATE TABLE IF NOT EXISTS search_document (doc_type VARCHAR(20) NOT NULL, "
+                   "doc_id INTEGER NOT NULL, vector TSVECTOR NOT NULL, PRIMARY KEY (doc_type, doc_id))")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_search_document_vector ON search_document USING gin (vector)")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for table in FTS5_TABLES:
+            op.execute(f"DROP TABLE IF EXISTS {table}")
+    elif bind.dialect.name == 'postgresql':
+        op.execute("DROP TABLE IF EXISTS search_document")
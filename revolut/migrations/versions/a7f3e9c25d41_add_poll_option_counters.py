@@ -0,0 +1,76 @@
+"""Add poll_option vote counters
+
+Revision ID: a7f3e9c25d41
+Revises: 8d4c1b2e6f93
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7f3e9c25d41'
+down_revision = '8d4c1b2e6f93'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+poll = sa.table('poll', sa.column('id', sa.Integer), sa.column('options', sa.JSON))
+poll_option = sa.table(
+    'poll_option',
+    sa.column('poll_id', sa.Integer), sa.column('option_id', sa.Integer),
+    sa.column('text', sa.String), sa.column('votes', sa.Integer)
+)
+
+
+def _option_rows(poll_id, options):
+    if isinstance(options, str):
+        options = json.loads(options)
+    if not isinstance(options, list):
+        return []
+    rows = []
+    for i, option in enumerate(options):
+        if isinstance(option, dict):
+            rows.append({'poll_id': poll_id, 'option_id': option.get('id', i + 1),
+                         'text': option.get('text', f"Option {i + 1}"), 'votes': option.get('votes', 0) or 0})
+        elif isinstance(option, str):
+            rows.append({'poll_id': poll_id, 'option_id': i + 1, 'text': option, 'votes': 0})
+    return rows
+
+
+def upgrade():
+    op.create_table('poll_option',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('poll_id', sa.Integer(), nullable=False),
+        sa.Column('option_id', sa.Integer(), nullable=False),
+        sa.Column('text', sa.String(length=500), nullable=False),
+        sa.Column('votes', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['poll_id'], ['poll.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('poll_id', 'option_id', name='uq_poll_option_poll_id_option_id')
+    )
+
+    # Copy existing JSON counts into option rows, a batch of polls at a time
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        polls = bind.execute(
+            sa.select(poll.c.id, poll.c.options).where(poll.c.id > last_id)
+            .order_by(poll.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not polls:
+            break
+        rows = []
+        for poll_id, options in polls:
+            rows.extend(_option_rows(poll_id, options))
+        if rows:
+            bind.execute(poll_option.insert(), rows)
+        last_id = polls[-1][0]
+
+
+def downgrade():
+    op.drop_table('poll_option')
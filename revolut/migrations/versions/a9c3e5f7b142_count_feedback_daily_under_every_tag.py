@@ -0,0 +1,81 @@
+"""Count feedback_daily under every tag, plus a '*' total per day and location
+
+Revision ID: a9c3e5f7b142
+Revises: f7a2c4e8b513
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+import json
+from collections import defaultdict
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e5f7b142'
+down_revision = 'f7a2c4e8b513'
+branch_labels = None
+depends_on = None
+
+CHUNK = 5000
+ALL_CATEGORIES = '*'
+
+feedback_daily = sa.table(
+    'feedback_daily',
+    sa.column('day', sa.Date()),
+    sa.column('location', sa.String()),
+    sa.column('category', sa.String()),
+    sa.column('count', sa.Integer()),
+    sa.column('sum_sentiment', sa.Float())
+)
+
+
+def _day(created_at):
+    # SQLite hands back strings
+    if isinstance(created_at, str):
+        return created_at[:10]
+    return (created_at or datetime(1970, 1, 1)).date().isoformat()
+
+
+def _tags(tags):
+    if isinstance(tags, str):
+        tags = json.loads(tags)
+    return list(dict.fromkeys(tag or '' for tag in tags or ())) or ['']
+
+
+def _refill(categories):
+    """Recount the table from processed feedback, one row per ``categories(tags)`` entry"""
+    bind = op.get_bind()
+    bind.execute(feedback_daily.delete())
+    totals = defaultdict(lambda: [0, 0.0])
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, created_at, location, tags, sentiment_score FROM user_feedback "
+            "WHERE is_processed = :processed AND id > :last_id ORDER BY id LIMIT :chunk"
+        ), {'processed': True, 'last_id': last_id, 'chunk': CHUNK}).all()
+        if not rows:
+            break
+        for _id, created_at, location, tags, sentiment in rows:
+            for category in categories(tags):
+                key = (_day(created_at), location or '', category)
+                totals[key][0] += 1
+                totals[key][1] += sentiment or 0.0
+        last_id = rows[-1][0]
+
+    if totals:
+        op.bulk_insert(feedback_daily, [
+            {'day': datetime.strptime(day, '%Y-%m-%d').date(), 'location': location, 'category': category,
+             'count': count, 'sum_sentiment': total}
+            for (day, location, category), (count, total) in totals.items()
+        ])
+
+
+def upgrade():
+    _refill(lambda tags: [ALL_CATEGORIES] + _tags(tags))
+
+
+def downgrade():
+    _refill(lambda tags: _tags(tags)[:1])
@@ -0,0 +1,33 @@
+"""Add total and updated_at to row_counter for the dashboard aggregates
+
+Revision ID: b4d7e2c9a615
+Revises: e8b3f1a7c294
+Create Date: 2026-10-16 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d7e2c9a615'
+down_revision = 'e8b3f1a7c294'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The dashboards seed the new counters with a recount on their first load
+    with op.batch_alter_table('row_counter') as batch_op:
+        batch_op.add_column(sa.Column('total', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    # Only the listing counters existed before
+    op.execute(sa.text(
+        "DELETE FROM row_counter WHERE name NOT IN ('user_feedback', 'issue') AND name NOT LIKE 'issue:status=%'"
+    ))
+    with op.batch_alter_table('row_counter') as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('total')
@@ -0,0 +1,158 @@
+"""Move official ratings into official_rating with running aggregates
+
+Revision ID: b8e4d2f7c610
+Revises: f1c6a2e8d954
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+import json
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4d2f7c610'
+down_revision = 'f1c6a2e8d954'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+SCORES = range(1, 6)
+AGGREGATE_COLUMNS = ['rating_sum', 'rating_sum_sq'] + [f'score_{score}' for score in SCORES]
+
+official = sa.table(
+    'official',
+    sa.column('id', sa.Integer), sa.column('ratings', sa.JSON), sa.column('average_score', sa.Float),
+    sa.column('rating_count', sa.Integer), sa.column('last_updated', sa.DateTime),
+    *[sa.column(name, sa.Integer) for name in AGGREGATE_COLUMNS]
+)
+official_rating = sa.table(
+    'official_rating',
+    sa.column('official_id', sa.Integer), sa.column('score', sa.SmallInteger), sa.column('comment', sa.Text),
+    sa.column('user_id', sa.String), sa.column('created_at', sa.DateTime)
+)
+
+
+def _timestamp(value, default):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _rating_rows(official_id, ratings, last_updated):
+    """Valid ratings from one official's JSON array; out-of-range scores are dropped"""
+    if isinstance(ratings, str):
+        ratings = json.loads(ratings)
+    if not isinstance(ratings, list):
+        return []
+    rows = []
+    for rating in ratings:
+        if not isinstance(rating, dict):
+            continue
+        try:
+            score = int(rating.get('score'))
+        except (TypeError, ValueError):
+            continue
+        if score not in SCORES:
+            continue
+        rows.append({
+            'official_id': official_id,
+            'score': score,
+            'comment': rating.get('comment') or '',
+            'user_id': str(rating.get('user_id') or 'anonymous')[:50],
+            'created_at': _timestamp(rating.get('timestamp'), last_updated)
+        })
+    return rows
+
+
+def _aggregates(scores):
+    values = {
+        'rating_count': len(scores),
+        'rating_sum': sum(scores),
+        'rating_sum_sq': sum(score * score for score in scores),
+        'average_score': sum(scores) / len(scores) if scores else 0.0
+    }
+    for score in SCORES:
+        values[f'score_{score}'] = scores.count(score)
+    return values
+
+
+def upgrade():
+    op.create_table('official_rating',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('official_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.SmallInteger(), nullable=False),
+        sa.Column('comment', sa.Text(), nullable=True),
+        sa.Column('user_id', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['official_id'], ['official.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_official_rating_official_id_created_at', 'official_rating',
+                    ['official_id', 'created_at'], unique=False)
+    with op.batch_alter_table('official', schema=None) as batch_op:
+        for name in AGGREGATE_COLUMNS:
+            batch_op.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+    # Copy the JSON arrays into rows and aggregates, a batch of officials at a time
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        officials = bind.execute(
+            sa.select(official.c.id, official.c.ratings, official.c.last_updated)
+            .where(official.c.id > last_id).order_by(official.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not officials:
+            break
+        rows = []
+        for official_id, ratings, last_updated in officials:
+            official_rows = _rating_rows(official_id, ratings, last_updated)
+            rows.extend(official_rows)
+            bind.execute(official.update().where(official.c.id == official_id)
+                         .values(**_aggregates([row['score'] for row in official_rows])))
+        if rows:
+            bind.execute(official_rating.insert(), rows)
+        last_id = officials[-1][0]
+
+    with op.batch_alter_table('official', schema=None) as batch_op:
+        batch_op.drop_column('ratings')
+
+
+def downgrade():
+    with op.batch_alter_table('official', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ratings', sa.JSON(), nullable=True))
+
+    # Rebuild the JSON arrays from the rows
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        official_ids = [row[0] for row in bind.execute(
+            sa.select(official.c.id).where(official.c.id > last_id).order_by(official.c.id).limit(BATCH_SIZE)
+        )]
+        if not official_ids:
+            break
+        ratings = {official_id: [] for official_id in official_ids}
+        for official_id, score, comment, user_id, created_at in bind.execute(
+            sa.select(official_rating.c.official_id, official_rating.c.score, official_rating.c.comment,
+                      official_rating.c.user_id, official_rating.c.created_at)
+            .where(official_rating.c.official_id.in_(official_ids))
+            .order_by(official_rating.c.official_id, official_rating.c.created_at)
+        ):
+            ratings[official_id].append({
+                'score': score,
+                'comment': comment or '',
+                'timestamp': created_at.isoformat() if created_at else None,
+                'user_id': user_id
+            })
+        for official_id, official_ratings in ratings.items():
+            bind.execute(official.update().where(official.c.id == official_id).values(ratings=official_ratings))
+        last_id = official_ids[-1]
+
+    with op.batch_alter_table('official', schema=None) as batch_op:
+        for name in AGGREGATE_COLUMNS:
+            batch_op.drop_column(name)
+    op.drop_index('ix_official_rating_official_id_created_at', table_name='official_rating')
+    op.drop_table('official_rating')
@@ -0,0 +1,31 @@
+"""Add poll_voter dedup index
+
+Revision ID: c2d8f4a61b37
+Revises: a7f3e9c25d41
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d8f4a61b37'
+down_revision = 'a7f3e9c25d41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('poll_voter',
+        sa.Column('poll_id', sa.Integer(), nullable=False),
+        sa.Column('voter_key', sa.String(length=64), nullable=False),
+        sa.Column('option_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['poll_id'], ['poll.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('poll_id', 'voter_key')
+    )
+
+
+def downgrade():
+    op.drop_table('poll_voter')
@@ -0,0 +1,23 @@
+"""Add user_feedback.issue_id index for per-issue feedback counts
+
+Revision ID: c6e2a9d4f318
+Revises: a3c5e7f9b102
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e2a9d4f318'
+down_revision = 'a3c5e7f9b102'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_feedback_issue_id', 'user_feedback', ['issue_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_feedback_issue_id', table_name='user_feedback')
@@ -0,0 +1,76 @@
+"""Add the feedback_daily rollup of processed feedback per day, location and category
+
+Revision ID: d2f8a4c6e391
+Revises: b4d7e2c9a615
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+import json
+from collections import defaultdict
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f8a4c6e391'
+down_revision = 'b4d7e2c9a615'
+branch_labels = None
+depends_on = None
+
+CHUNK = 5000
+
+
+def _day(created_at):
+    # SQLite hands back strings
+    if isinstance(created_at, str):
+        return created_at[:10]
+    return (created_at or datetime(1970, 1, 1)).date().isoformat()
+
+
+def _first_tag(tags):
+    if isinstance(tags, str):
+        tags = json.loads(tags)
+    return (tags or [''])[0] or ''
+
+
+def upgrade():
+    feedback_daily = op.create_table(
+        'feedback_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('location', sa.String(length=100), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('sum_sentiment', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'location', 'category')
+    )
+
+    # Backfill from processed feedback; the first tag is read from JSON, so
+    # rows are grouped here rather than in SQL
+    bind = op.get_bind()
+    totals = defaultdict(lambda: [0, 0.0])
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, created_at, location, tags, sentiment_score FROM user_feedback "
+            "WHERE is_processed = :processed AND id > :last_id ORDER BY id LIMIT :chunk"
+        ), {'processed': True, 'last_id': last_id, 'chunk': CHUNK}).all()
+        if not rows:
+            break
+        for _id, created_at, location, tags, sentiment in rows:
+            key = (_day(created_at), location or '', _first_tag(tags))
+            totals[key][0] += 1
+            totals[key][1] += sentiment or 0.0
+        last_id = rows[-1][0]
+
+    if totals:
+        op.bulk_insert(feedback_daily, [
+            {'day': datetime.strptime(day, '%Y-%m-%d').date(), 'location': location, 'category': category,
+             'count': count, 'sum_sentiment': total}
+            for (day, location, category), (count, total) in totals.items()
+        ])
+
+
+def downgrade():
+    op.drop_table('feedback_daily')
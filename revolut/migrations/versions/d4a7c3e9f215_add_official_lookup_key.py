@@ -0,0 +1,61 @@
+"""Add indexed official lookup_key
+
+Revision ID: d4a7c3e9f215
+Revises: b8e4d2f7c610
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7c3e9f215'
+down_revision = 'b8e4d2f7c610'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+official = sa.table(
+    'official',
+    sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('position', sa.String),
+    sa.column('constituency', sa.String), sa.column('lookup_key', sa.String)
+)
+
+
+# Copy of app.utils.official_lookup.normalise_text as of this revision
+def _normalise(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split())
+
+
+def upgrade():
+    with op.batch_alter_table('official', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('lookup_key', sa.String(length=320), nullable=True))
+
+    # Keys need Python's Unicode normalisation, so fill them a batch at a time
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        officials = bind.execute(
+            sa.select(official.c.id, official.c.name, official.c.position, official.c.constituency)
+            .where(official.c.id > last_id).order_by(official.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not officials:
+            break
+        for official_id, name, position, constituency in officials:
+            key = '|'.join(_normalise(part) for part in (name, position, constituency))
+            bind.execute(official.update().where(official.c.id == official_id).values(lookup_key=key))
+        last_id = officials[-1][0]
+
+    op.create_index('ix_official_lookup_key', 'official', ['lookup_key'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_official_lookup_key', table_name='official')
+    with op.batch_alter_table('official', schema=None) as batch_op:
+        batch_op.drop_column('lookup_key')
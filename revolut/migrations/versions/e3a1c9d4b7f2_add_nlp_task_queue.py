@@ -0,0 +1,47 @@
+"""Add nlp_task queue table
+
+Revision ID: e3a1c9d4b7f2
+Revises: 37bb9bdf567b
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a1c9d4b7f2'
+down_revision = '37bb9bdf567b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('nlp_task',
+        sa.Column('feedback_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('claim_token', sa.String(length=32), nullable=True),
+        sa.Column('worker_id', sa.String(length=100), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('available_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['feedback_id'], ['user_feedback.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('feedback_id')
+    )
+    with op.batch_alter_table('nlp_task', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_nlp_task_claim_token'), ['claim_token'], unique=False)
+
+    with op.batch_alter_table('user_feedback', schema=None) as batch_op:
+        batch_op.create_index('ix_user_feedback_is_processed_id', ['is_processed', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_feedback', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_feedback_is_processed_id')
+
+    with op.batch_alter_table('nlp_task', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_nlp_task_claim_token'))
+
+    op.drop_table('nlp_task')
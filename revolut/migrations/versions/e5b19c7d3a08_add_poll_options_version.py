@@ -0,0 +1,27 @@
+"""Add poll options_version
+
+Revision ID: e5b19c7d3a08
+Revises: c2d8f4a61b37
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b19c7d3a08'
+down_revision = 'c2d8f4a61b37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing polls start at version 1; `flask polls migrate-options` upgrades them
+    with op.batch_alter_table('poll', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('options_version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('poll', schema=None) as batch_op:
+        batch_op.drop_column('options_version')
@@ -0,0 +1,62 @@
+"""Add keyset indexes for feedback/issue listings and row_counter totals
+
+Revision ID: e8b3f1a7c294
+Revises: c6e2a9d4f318
+Create Date: 2026-10-16 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3f1a7c294'
+down_revision = 'c6e2a9d4f318'
+branch_labels = None
+depends_on = None
+
+# Literal bounds, as in app.models.SENTIMENT_BANDS
+SENTIMENT_BANDS = {
+    'positive': 'sentiment_score > 0.1',
+    'negative': 'sentiment_score < -0.1',
+    'neutral': 'sentiment_score BETWEEN -0.1 AND 0.1',
+}
+
+
+def upgrade():
+    # Keyset pagination can't place rows without a creation time; date them
+    # before everything else so they come last
+    op.execute(sa.text("UPDATE user_feedback SET created_at = '1970-01-01 00:00:00' WHERE created_at IS NULL"))
+    op.execute(sa.text("UPDATE issue SET created_at = '1970-01-01 00:00:00' WHERE created_at IS NULL"))
+
+    op.create_index('ix_user_feedback_created_at_id', 'user_feedback', ['created_at', 'id'], unique=False)
+    for band, predicate in SENTIMENT_BANDS.items():
+        op.create_index(f'ix_user_feedback_{band}_created_at_id', 'user_feedback', ['created_at', 'id'],
+                        unique=False, sqlite_where=sa.text(predicate), postgresql_where=sa.text(predicate))
+    op.create_index('ix_issue_created_at_id', 'issue', ['created_at', 'id'], unique=False)
+    op.create_index('ix_issue_status_created_at_id', 'issue', ['status', 'created_at', 'id'], unique=False)
+
+    row_counter = op.create_table(
+        'row_counter',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('shard', sa.SmallInteger(), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name', 'shard')
+    )
+
+    # Seed the totals; afterwards `flask counts recount` recomputes them
+    bind = op.get_bind()
+    counts = [('user_feedback', bind.execute(sa.text("SELECT COUNT(*) FROM user_feedback")).scalar()),
+              ('issue', bind.execute(sa.text("SELECT COUNT(*) FROM issue")).scalar())]
+    counts += [(f'issue:status={status}', count) for status, count in bind.execute(
+        sa.text("SELECT status, COUNT(*) FROM issue WHERE status IS NOT NULL GROUP BY status"))]
+    op.bulk_insert(row_counter, [{'name': name, 'shard': 0, 'count': count} for name, count in counts])
+
+
+def downgrade():
+    op.drop_table('row_counter')
+    op.drop_index('ix_issue_status_created_at_id', table_name='issue')
+    op.drop_index('ix_issue_created_at_id', table_name='issue')
+    for band in SENTIMENT_BANDS:
+        op.drop_index(f'ix_user_feedback_{band}_created_at_id', table_name='user_feedback')
+    op.drop_index('ix_user_feedback_created_at_id', table_name='user_feedback')
@@ -0,0 +1,27 @@
+"""Add poll (created_at, id) index for keyset pagination
+
+Revision ID: f1c6a2e8d954
+Revises: e5b19c7d3a08
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6a2e8d954'
+down_revision = 'e5b19c7d3a08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyset pagination can't place rows without a creation time; date them
+    # before everything else so they come last
+    op.execute(sa.text("UPDATE poll SET created_at = '1970-01-01 00:00:00' WHERE created_at IS NULL"))
+    op.create_index('ix_poll_created_at_id', 'poll', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_poll_created_at_id', table_name='poll')
@@ -0,0 +1,26 @@
+"""Add alert.dedup_key so automatic alerts are raised once across workers
+
+Revision ID: f7a2c4e8b513
+Revises: d2f8a4c6e391
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a2c4e8b513'
+down_revision = 'd2f8a4c6e391'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('alert', sa.Column('dedup_key', sa.String(length=255), nullable=True))
+    op.create_index('ix_alert_dedup_key', 'alert', ['dedup_key'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_alert_dedup_key', table_name='alert')
+    op.drop_column('alert', 'dedup_key')
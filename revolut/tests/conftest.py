@@ -0,0 +1,59 @@
+import pytest
+from app import create_app, db
+from app.utils.anomaly import reset_detector
+from app.utils.nlp_processor import reset_processors
+from app.utils.official_lookup import reset_official_key_cache
+from app.utils.official_typeahead import reset_official_typeahead
+from app.utils.poll_dedup import reset_voter_index
+from app.utils.poll_results import reset_result_cache
+from app.utils.poll_stream import reset_stream_hub
+from app.utils.response_cache import reset_response_cache
+from app.utils.search import reset_search_backend
+from app.utils.vote_buffer import reset_vote_buffer
+
+# Every process-wide singleton; each test starts from none of them
+SINGLETON_RESETS = (
+    reset_detector,
+    reset_processors,
+    reset_official_key_cache,
+    reset_official_typeahead,
+    reset_voter_index,
+    reset_result_cache,
+    reset_stream_hub,
+    reset_response_cache,
+    reset_search_backend,
+    reset_vote_buffer,
+)
+
+
+def reset_singletons():
+    for reset in SINGLETON_RESETS:
+        reset()
+
+
+@pytest.fixture
+def app_config():
+    """Config overrides for the app fixture; override in a test module"""
+    return {}
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path, app_config):
+    # A file database so concurrency tests can use several connections
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    reset_singletons()
+    app = create_app()
+    app.config.update({"TESTING": True, **app_config})
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        # Inside the context: the vote buffer flushes to the database as it stops
+        reset_singletons()
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,70 @@
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Alert, TrendBucket, UserFeedback
+from app.utils.anomaly import AnomalyDetector, detect_anomalies
+from app.utils.nlp_processor import EnhancedNLPProcessor
+from app.utils.trends import hour_bucket
+
+
+def test_baselines_are_per_location():
+    detector = AnomalyDetector(min_samples=24, min_count=5)
+    start = datetime(2026, 1, 1)
+    for hour in range(48):
+        bucket = start + timedelta(hours=hour)
+        assert detector.observe(('water_supply', 'Nairobi'), bucket, 40 + hour % 7) is None
+        assert detector.observe(('water_supply', 'Kibra Ward'), bucket, hour % 2) is None
+
+    now = start + timedelta(hours=48)
+    # Busy city: a normal-sized hour is not news
+    assert detector.observe(('water_supply', 'Nairobi'), now, 46) is None
+    # Small ward: eight messages in an hour is
+    severity, z = detector.observe(('water_supply', 'Kibra Ward'), now, 8)
+    assert severity in ('low', 'medium', 'high') and z >= 3
+    # Only one alert per key and hour
+    assert detector.observe(('water_supply', 'Kibra Ward'), now, 9) is None
+    assert detector.severity(30) == 'high'
+
+
+def test_baseline_state_stays_small():
+    detector = AnomalyDetector()
+    bucket = datetime(2026, 1, 1)
+    tracemalloc.start()
+    for ward in range(5000):
+        for tag in ('water_supply', 'healthcare', 'education', 'security'):
+            detector.observe((tag, f"Ward {ward}"), bucket, 1)
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert detector.stats()['keys'] == 20000
+    assert size < 8 * 1024 * 1024
+
+
+def test_worker_deltas_raise_alert_for_spiking_ward(app):
+    now = hour_bucket(datetime.utcnow())
+    for hour in range(1, 49):
+        db.session.add(TrendBucket(tag='infrastructure', location='Nairobi',
+                                   bucket=now - timedelta(hours=hour), count=30))
+    db.session.add(TrendBucket(tag='infrastructure', location='Kisumu',
+                               bucket=now - timedelta(hours=3), count=1))
+    db.session.commit()
+
+    db.session.add_all([UserFeedback(content="Barabara mbaya", location=town, is_processed=False)
+                        for town in ['Kisumu'] * 7 + ['Nairobi'] * 7])
+    db.session.commit()
+
+    processor = EnhancedNLPProcessor()
+    results, _failures = processor.score_rows(
+        db.session.query(UserFeedback.id, UserFeedback.content, UserFeedback.location).all()
+    )
+    deltas = processor.write_results(results)
+    db.session.commit()
+
+    alerts = detect_anomalies(deltas, detector=AnomalyDetector())
+    assert [(a.topic, a.affected_locations) for a in alerts] == [('infrastructure', ['Kisumu'])]
+    assert Alert.query.count() == 1
+
+    # Another worker (or this one after a restart) flags the same hour: no second alert
+    assert detect_anomalies(deltas, detector=AnomalyDetector()) == []
+    assert Alert.query.count() == 1
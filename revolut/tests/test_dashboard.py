@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from app import db
+from app.models import Official, RowCounter, UserFeedback
+from app.utils.dashboard import recount_if_stale
+from app.utils.nlp_processor import EnhancedNLPProcessor
+from app.utils.official_lookup import set_lookup_key
+from app.utils.response_cache import invalidate_responses
+from app.utils.row_counts import (FEEDBACK_COUNTER, RECOUNT_MARKER, add_to_counters, counter_snapshot, exact_counts,
+                                  recount)
+
+
+def make_official(name, average_score=0.0):
+    official = Official(name=name, position='MP', constituency='Westlands',
+                        average_score=average_score, rating_count=0)
+    set_lookup_key(official)
+    db.session.add(official)
+    db.session.commit()
+    return official
+
+
+def assert_counters_exact():
+    counters, _, _ = counter_snapshot()
+    exact = exact_counts()
+    for name in set(counters) | set(exact):
+        count, total = counters.get(name, (0, 0.0))
+        assert (count, round(total, 6)) == (exact.get(name, (0, 0.0))[0], round(exact.get(name, (0, 0.0))[1], 6)), name
+
+
+def test_dashboard_reads_counters_kept_current_by_writes(app, client):
+    make_official('Mary Wanjiku', average_score=4.0)
+    make_official('John Otieno')
+    client.post('/api/issues', json={'title': 'Burst water pipe', 'description': 'Water everywhere on the road',
+                                     'location': 'Kibra', 'category': 'Water'})
+    client.post('/api/feedback', json={'content': 'The clinic has no drugs', 'location': 'Kibra'})
+
+    # The first load seeds the counters with an exact recount
+    first = client.get('/api/dashboard-data').get_json()
+    assert first['total_feedback'] == 1 and first['officials_count'] == 2
+    assert first['stats']['avg_rating'] == 2.0
+    assert first['charts']['issues'] == {'labels': ['Water'], 'data': [1]}
+    assert first['recounted_at'] is not None
+
+    # Later writes bump the counters; no recount needed
+    client.post('/api/feedback', json={'content': 'Great job on the new road', 'location': 'Kisumu'})
+    client.post('/api/feedback', json={'content': 'Hakuna maji'})
+    client.post('/api/issues', json={'title': 'Street lights off', 'description': 'Dark since Monday night',
+                                     'location': 'Kibra', 'category': 'Energy'})
+    client.post('/api/scorecards/rate', json={'name': 'John Otieno', 'position': 'MP',
+                                              'constituency': 'Westlands', 'score': 5})
+
+    # The NLP worker moves sentiment and location
+    processor = EnhancedNLPProcessor()
+    rows = [(f.id, f.content, f.location) for f in UserFeedback.query.order_by(UserFeedback.id)]
+    results, _ = processor.score_rows(rows)
+    results[2]['location'] = 'Kibra'
+    processor.write_results(results)
+    db.session.commit()
+
+    body = client.get('/api/dashboard-data').get_json()
+    assert body['recounted_at'] == first['recounted_at']
+    assert body['updated_at'] > first['updated_at']
+    assert body['total_feedback'] == 3 and body['total_issues'] == 2
+    assert body['stats']['avg_rating'] == 4.5
+    assert body['stats']['positive_sentiment'] == 33
+    assert {stat['location']: stat['count'] for stat in body['feedback_stats']} == {'Kibra': 2, 'Kisumu': 1}
+    assert_counters_exact()
+
+    admin = app.view_functions['admin.get_dashboard_data'].__wrapped__.__wrapped__
+    with app.test_request_context():
+        admin_body = admin().get_json()
+    assert admin_body['total_users'] == 0 and admin_body['officials_count'] == 2
+    assert admin_body['updated_at'] == body['updated_at']
+
+
+def test_dashboard_counts_come_from_one_read(app, client):
+    for n in range(5):
+        client.post('/api/feedback', json={'content': f'Feedback {n}', 'location': f'Ward {n}'})
+    client.get('/api/dashboard-data')
+    # Time a recompute, not the cached response
+    invalidate_responses('dashboard')
+
+    statements = []
+    listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        body = client.get('/api/dashboard-data').get_json()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert len(body['feedback_stats']) == 5
+    assert [s for s in statements if 'row_counter' in s] == [statements[0]]
+    assert not [s for s in statements if 'user_feedback' in s or 'official' in s]
+
+
+def test_recount_corrects_drift_on_schedule(app, client):
+    client.post('/api/feedback', json={'content': 'Counted', 'location': 'Kibra'})
+    assert recount_if_stale(300)
+    db.session.commit()
+    assert not recount_if_stale(300)
+
+    # Written behind the API's back
+    db.session.add(UserFeedback(content='Imported', location='Kibra', sentiment_score=0.8))
+    db.session.commit()
+    assert client.get('/api/dashboard-data').get_json()['total_feedback'] == 1
+
+    RowCounter.query.filter_by(name=RECOUNT_MARKER).update({'updated_at': datetime.utcnow() - timedelta(hours=1)})
+    assert recount_if_stale(300)
+    db.session.commit()
+    invalidate_responses('dashboard')
+    body = client.get('/api/dashboard-data').get_json()
+    assert body['total_feedback'] == 2
+    assert body['feedback_stats'] == [{'location': 'Kibra', 'count': 2, 'avg_sentiment': 0.4}]
+    assert body['stats']['positive_sentiment'] == 50
+
+
+def test_recount_adds_corrections_instead_of_rewriting_counters(app, client):
+    for n in range(3):
+        client.post('/api/feedback', json={'content': f'Feedback {n}', 'location': 'Kibra'})
+    # Drift: one row written behind the API's back, one counted but never written
+    db.session.add(UserFeedback(content='Imported', location='Kisumu'))
+    add_to_counters({FEEDBACK_COUNTER: (1, 0.0)}, shard=5)
+    db.session.commit()
+    shards = {(row.name, row.shard): row.count for row in RowCounter.query if row.shard}
+
+    statements = []
+    listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        recount()
+        db.session.commit()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert not [s for s in statements if s.lstrip().upper().startswith('DELETE')]
+    # Other shards keep what concurrent writers added; the difference lands in shard 0
+    assert {(row.name, row.shard): row.count for row in RowCounter.query if row.shard} == shards
+    assert_counters_exact()
+    assert counter_snapshot()[0][FEEDBACK_COUNTER][0] == 4
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import FeedbackDaily, UserFeedback
+from app.utils.feedback_rollup import rebuild_rollup
+from app.utils.nlp_processor import EnhancedNLPProcessor
+
+
+def add_feedback(days_ago, location=None):
+    feedback = UserFeedback(content='Report', location=location,
+                            created_at=datetime.utcnow() - timedelta(days=days_ago))
+    db.session.add(feedback)
+    db.session.commit()
+    return feedback.id
+
+
+def process(processor, feedback_id, sentiment, tags, location=None):
+    processor.write_results([{'id': feedback_id, 'sentiment_score': sentiment, 'tags': tags,
+                              'location': location, 'is_processed': True}])
+    db.session.commit()
+
+
+def rollup_rows():
+    return sorted((row.day, row.location, row.category, row.count, round(row.sum_sentiment, 6))
+                  for row in FeedbackDaily.query if row.count)
+
+
+def test_processing_maintains_rollup_like_a_rebuild(app):
+    processor = EnhancedNLPProcessor()
+    today = add_feedback(0, 'Kibra')
+    old = add_feedback(40)
+    unprocessed = add_feedback(1, 'Kibra')
+
+    process(processor, today, 0.5, ['water', 'health'], 'Kibra')
+    process(processor, old, -0.25, [], 'Kisumu')
+    # Re-scoring moves the row instead of counting it twice
+    process(processor, old, 0.75, ['roads'], 'Kisumu')
+
+    maintained = rollup_rows()
+    # Every tag gets the row, and the '*' total counts it once
+    assert [(location, category, count, total) for _, location, category, count, total in maintained] == [
+        ('Kisumu', '*', 1, 0.75), ('Kisumu', 'roads', 1, 0.75),
+        ('Kibra', '*', 1, 0.5), ('Kibra', 'health', 1, 0.5), ('Kibra', 'water', 1, 0.5)]
+    assert unprocessed not in [row[0] for row in maintained]
+
+    assert rebuild_rollup() == 2
+    db.session.commit()
+    assert rollup_rows() == maintained
+
+
+def test_daily_endpoint_reads_any_range_in_one_query(app, client):
+    processor = EnhancedNLPProcessor()
+    for days_ago, sentiment, tags, location in ((0, 0.4, ['water'], 'Kibra'), (0, -0.2, ['water'], 'Kisumu'),
+                                                (3, 0.6, ['roads'], 'Kibra'), (200, -0.8, [], 'Kibra')):
+        process(processor, add_feedback(days_ago), sentiment, tags, location)
+
+    statements = []
+    listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        week = client.get('/api/feedback/daily').get_json()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(statements) == 1 and 'feedback_daily' in statements[0]
+
+    assert len(week['days']) == 7 and week['end'] == datetime.utcnow().date().isoformat()
+    assert [day['count'] for day in week['days']] == [0, 0, 0, 1, 0, 0, 2]
+    assert week['days'][-1]['avg_sentiment'] == pytest.approx(0.1)
+    assert week['count'] == 3 and week['avg_sentiment'] == pytest.approx(0.8 / 3)
+
+    year = client.get('/api/feedback/daily?days=365&location=Kibra').get_json()
+    assert len(year['days']) == 365 and year['count'] == 3
+
+    by_category = client.get('/api/feedback/daily?days=30&by=category').get_json()
+    assert by_category['groups'] == [{'category': 'water', 'count': 2, 'avg_sentiment': pytest.approx(0.1)},
+                                     {'category': 'roads', 'count': 1, 'avg_sentiment': pytest.approx(0.6)}]
+
+    start = (datetime.utcnow() - timedelta(days=3)).date().isoformat()
+    ranged = client.get(f'/api/feedback/daily?start={start}&end={start}&category=roads').get_json()
+    assert ranged['days'] == [{'date': start, 'count': 1, 'avg_sentiment': pytest.approx(0.6)}]
+
+    assert client.get('/api/feedback/daily?start=2026-02-30').status_code == 400
+    assert client.get('/api/feedback/daily?start=2026-10-10&end=2026-10-01').status_code == 400
+    assert client.get('/api/feedback/daily?by=tag').status_code == 400
+
+    chart = client.get('/api/dashboard-data').get_json()['charts']['sentiment']
+    assert chart['data'][-3] == pytest.approx(0.6) and len(chart['labels']) == 7
+
+
+def test_rows_with_several_tags_count_under_each_and_once_overall(app, client):
+    processor = EnhancedNLPProcessor()
+    process(processor, add_feedback(0), 0.5, ['water', 'health'], 'Kibra')
+    process(processor, add_feedback(0), -0.5, ['health'], 'Kibra')
+    process(processor, add_feedback(0), 0.1, [], 'Kibra')
+
+    assert client.get('/api/feedback/daily?category=health').get_json()['count'] == 2
+    assert client.get('/api/feedback/daily?category=water').get_json()['count'] == 1
+    assert client.get('/api/feedback/daily').get_json()['count'] == 3
+    assert client.get('/api/feedback/daily?by=location').get_json()['groups'] == [
+        {'location': 'Kibra', 'count': 3, 'avg_sentiment': pytest.approx(0.1 / 3)}]
+    by_category = client.get('/api/feedback/daily?by=category').get_json()['groups']
+    assert [(group['category'], group['count']) for group in by_category] == [('health', 2), (None, 1), ('water', 1)]
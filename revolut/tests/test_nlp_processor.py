@@ -0,0 +1,187 @@
+import pytest
+from app import db
+from app.models import UserFeedback
+from app.utils import nlp_processor
+from app.utils.nlp_processor import EnhancedNLPProcessor
+
+
+def test_process_batch_by_query_commits_per_chunk(app):
+    db.session.add_all([UserFeedback(content=f"Maji hakuna in Nairobi {i}", is_processed=False) for i in range(7)])
+    db.session.add(UserFeedback(content="Already done", is_processed=True, sentiment_score=0.5))
+    db.session.commit()
+
+    chunks = []
+    stats = EnhancedNLPProcessor().process_batch(
+        query=UserFeedback.query.filter_by(is_processed=False),
+        chunk_size=3,
+        progress=chunks.append
+    )
+
+    assert stats['processed'] == 7
+    assert stats['chunks'] == 3
+    assert [c['processed'] for c in chunks] == [3, 6, 7]
+    assert stats['rows_per_sec'] > 0
+    assert UserFeedback.query.filter_by(is_processed=False).count() == 0
+    assert UserFeedback.query.filter_by(location='Nairobi').count() == 7
+    assert UserFeedback.query.filter_by(content="Already done").one().sentiment_score == 0.5
+
+
+def test_process_batch_by_ids_keeps_existing_location(app):
+    feedback = UserFeedback(content="The road in Mombasa is bad", location="Kilifi", is_processed=False)
+    db.session.add(feedback)
+    db.session.commit()
+
+    stats = EnhancedNLPProcessor().process_batch(ids=[feedback.id])
+
+    db.session.refresh(feedback)
+    assert stats['processed'] == 1
+    assert feedback.is_processed
+    assert feedback.location == 'Kilifi'
+    assert feedback.tags == ['infrastructure']
+    assert feedback.sentiment_score < 0
+
+
+def test_single_pass_match_handles_phrases_plurals_and_locations():
+    processor = EnhancedNLPProcessor()
+    match = processor.matcher.match("lack of doctors at the clinic in kibra ward, very bad")
+
+    assert match.location == 'Kibra Ward'
+    assert 'shortage' in match.patterns
+    assert match.negative == {'bad'}
+    assert processor.matcher.categories(match) == ['healthcare']
+
+    # Substrings no longer count as indicator words ("haya" inside "hayakuwa")
+    assert processor.matcher.match("maji hayakuwa").negative == set()
+    # Pattern inference when no category keyword is present
+    assert processor._categorize_feedback("the streets are not working") == ['infrastructure']
+    assert processor._extract_location("nyumba nairobi, karibu na mombasa") == 'Nairobi'
+
+
+def test_shared_processor_is_built_once_and_warmed():
+    nlp_processor.reset_processors()
+
+    report = nlp_processor.warm_up()
+
+    assert nlp_processor.get_processor() is nlp_processor.get_processor()
+    assert report['seconds'] >= 0
+    assert report['pid'] > 0
+    assert nlp_processor.warm_up() is report
+
+
+def test_warm_up_in_forked_child_reports_its_own_process(monkeypatch):
+    nlp_processor.reset_processors()
+    parent = nlp_processor.warm_up()
+
+    monkeypatch.setattr(nlp_processor.os, 'getpid', lambda: parent['pid'] + 1)
+    child = nlp_processor.warm_up()
+
+    assert child['pid'] == parent['pid'] + 1
+    assert child['inherited_from'] == parent['pid'] and child['seconds'] == 0.0
+    assert nlp_processor.warm_up() is child
+
+
+def test_backfill_scores_through_process_pool(app):
+    from app.utils.nlp_backfill import backfill
+
+    db.session.add_all([UserFeedback(content=f"Barabara mbaya in Kisumu {i}", is_processed=False) for i in range(9)])
+    db.session.commit()
+
+    stats = backfill(workers=2, chunk_size=2)
+
+    assert stats['processed'] == 9
+    assert stats['chunks'] == 5
+    rows = UserFeedback.query.all()
+    assert all(r.is_processed and r.tags == ['infrastructure'] and r.location == 'Kisumu' for r in rows)
+
+
+def test_backfill_worker_builds_its_own_processor_without_persistence(app):
+    from app.utils.nlp_backfill import _init_worker
+
+    app.config['NLP_CACHE_PERSIST'] = True
+    parent = nlp_processor.get_processor()
+    assert parent.cache.persist
+
+    # What a forked worker runs first, with the parent's app context still set
+    _init_worker('lexicon', 50)
+    worker = nlp_processor.get_processor()
+    assert worker is not parent
+    assert worker.sentiment_engine.name == 'lexicon'
+    assert worker.cache.maxsize == 50 and not worker.cache.persist
+
+
+def test_lexicon_engine_handles_negation_and_hybrid_falls_back():
+    from app.utils.sentiment import make_sentiment_engine
+
+    processor = EnhancedNLPProcessor(sentiment_engine='lexicon')
+
+    def score(text):
+        return processor._analyze_sentiment(text)
+
+    assert score("the clinic is good") > 0.1
+    assert score("the clinic is not good") < -0.1
+    assert score("the road isn't bad anymore") > 0.1
+    assert score("hakuna shida na maji") > 0.1
+    # A bare "no water" complaint is negative
+    assert score("maji hakuna") < -0.1
+    assert score("ward office opens on monday") == 0.0
+
+    hybrid = make_sentiment_engine('hybrid')
+    neutral = processor.matcher.match("The meeting was wonderful")
+    assert hybrid.score("The meeting was wonderful", neutral) > 0  # TextBlob knows "wonderful"
+
+    with pytest.raises(ValueError):
+        make_sentiment_engine('vader')
+
+
+def test_processor_uses_configured_sentiment_engine(app):
+    app.config['NLP_SENTIMENT_ENGINE'] = 'lexicon'
+    assert EnhancedNLPProcessor().sentiment_engine.name == 'lexicon'
+    assert EnhancedNLPProcessor(sentiment_engine='hybrid').sentiment_engine.name == 'hybrid'
+
+
+def test_result_cache_hits_on_normalised_text_and_tracks_fingerprint():
+    processor = EnhancedNLPProcessor(cache_size=2)
+
+    first = processor.analyze("Maji hakuna in Nairobi")
+    assert processor.analyze("  maji   HAKUNA, in nairobi!") == first
+    assert processor.cache.stats()['hits'] == 1
+    assert processor.cache.stats()['misses'] == 1
+
+    # Cached tags are copies
+    processor.analyze("maji hakuna in nairobi")[1].append('oops')
+    assert processor.analyze("maji hakuna in nairobi")[1] == first[1]
+
+    # Bounded LRU
+    processor.analyze("barabara mbaya")
+    processor.analyze("shule nzuri")
+    assert processor.cache.stats()['size'] == 2
+
+    # Changing the keyword tables or the engine changes every key
+    from app.utils.nlp_cache import table_fingerprint
+    tables = dict(processor.category_keywords)
+    assert table_fingerprint(tables) != table_fingerprint(dict(tables, transport=['matatu']))
+    assert EnhancedNLPProcessor().fingerprint == processor.fingerprint
+    assert EnhancedNLPProcessor(sentiment_engine='lexicon').fingerprint != processor.fingerprint
+
+
+def test_persisted_cache_survives_new_processor(app):
+    from app.models import NLPResultCache
+
+    app.config['NLP_CACHE_PERSIST'] = True
+    db.session.add_all([UserFeedback(content="Barabara mbaya Kisumu", is_processed=False) for _ in range(3)])
+    db.session.commit()
+
+    processor = EnhancedNLPProcessor()
+    pending = UserFeedback.query.filter_by(is_processed=False)
+    assert processor.process_batch(query=pending)['processed'] == 3
+    assert processor.cache.stats()['hits'] == 2
+    assert NLPResultCache.query.count() == 1
+
+    db.session.add(UserFeedback(content="barabara MBAYA kisumu", is_processed=False))
+    db.session.commit()
+    restarted = EnhancedNLPProcessor()
+    restarted.process_batch(query=pending)
+
+    assert restarted.cache.stats()['persisted_hits'] == 1
+    assert restarted.cache.stats()['misses'] == 0
+    assert UserFeedback.query.filter_by(is_processed=True).count() == 4
@@ -0,0 +1,60 @@
+from app import db
+from app.models import UserFeedback, NLPTask
+from app.utils import nlp_queue
+from app.utils.nlp_processor import EnhancedNLPProcessor
+
+
+def add_feedback(*contents):
+    rows = [UserFeedback(content=c, is_processed=False) for c in contents]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [r.id for r in rows]
+
+
+def test_worker_processes_unprocessed_feedback(app):
+    ids = add_feedback("The water pipe in Nairobi is broken", "Good new road in Kisumu")
+
+    processed, failed = nlp_queue.process_next_batch('w1')
+
+    assert (processed, failed) == (2, 0)
+    rows = UserFeedback.query.filter(UserFeedback.id.in_(ids)).order_by(UserFeedback.id).all()
+    assert all(r.is_processed for r in rows)
+    assert 'water_supply' in rows[0].tags
+    assert rows[0].location == 'Nairobi'
+    assert NLPTask.query.count() == 0
+
+
+def test_claims_are_exclusive(app):
+    add_feedback(*[f"Feedback message number {i}" for i in range(10)])
+
+    _, first = nlp_queue.claim_batch('w1', batch_size=6)
+    _, second = nlp_queue.claim_batch('w2', batch_size=6)
+
+    assert len(first) == 6
+    assert len(second) == 4
+    assert not set(first) & set(second)
+
+
+def test_poison_row_is_quarantined(app, monkeypatch):
+    poison_id, good_id = add_feedback("explode on this message", "Clinic has no medicine")
+    real_analyze = EnhancedNLPProcessor.analyze
+
+    def analyze(self, content):
+        if content.startswith('explode'):
+            raise ValueError('boom')
+        return real_analyze(self, content)
+
+    monkeypatch.setattr(EnhancedNLPProcessor, 'analyze', analyze)
+    app.config['NLP_WORKER_RETRY_DELAY'] = 0
+
+    for _ in range(app.config['NLP_WORKER_MAX_ATTEMPTS']):
+        nlp_queue.process_next_batch('w1')
+
+    task = db.session.get(NLPTask, poison_id)
+    assert task.status == nlp_queue.STATUS_QUARANTINED
+    assert task.attempts == app.config['NLP_WORKER_MAX_ATTEMPTS']
+    assert db.session.get(UserFeedback, good_id).is_processed
+
+    # Quarantined rows are no longer handed out
+    assert nlp_queue.process_next_batch('w1') == (0, 0)
+    assert nlp_queue.requeue_quarantined() == 1
@@ -0,0 +1,375 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import POLL_OPTIONS_VERSION, Poll, PollOption, PollVoter
+from app.utils.poll_dedup import BloomFilter, ScalableBloomFilter, reset_voter_index
+from app.utils.poll_stream import MemoryBroker, MemoryBus, PollStreamHub, PostgresBroker, get_stream_hub
+from app.utils.poll_votes import build_option_rows, record_vote
+from app.utils.response_cache import invalidate_responses
+from app.utils.vote_buffer import VoteBuffer, get_vote_buffer, reset_vote_buffer
+
+
+GATEWAY_TOKEN = 'sms-gateway-secret'
+
+
+def gateway_vote(client, poll_id, option_id, phone):
+    """A vote relayed by the SMS/USSD gateway, which may name the phone"""
+    client.application.config['POLL_GATEWAY_TOKEN'] = GATEWAY_TOKEN
+    return client.post(f'/api/polls/{poll_id}/vote', json={'option_id': option_id, 'phone_number': phone},
+                       headers={'X-Gateway-Token': GATEWAY_TOKEN})
+
+
+def make_poll(options=('Yes', 'No'), legacy_options=None):
+    poll = Poll(question="Should the county fix Kibra roads first?",
+                options=legacy_options or [{'id': i + 1, 'text': t, 'votes': 0} for i, t in enumerate(options)],
+                expires_at=datetime.utcnow() + timedelta(days=7))
+    if legacy_options is None:
+        poll.option_rows = build_option_rows(options)
+    else:
+        poll.options_version = 1
+    db.session.add(poll)
+    db.session.commit()
+    return poll
+
+
+def test_vote_increments_option_row(client):
+    poll = make_poll()
+
+    response = client.post(f'/api/polls/{poll.id}/vote', json={'option_id': 2})
+    assert response.status_code == 200
+    body = response.get_json()['updated_poll']
+    assert body['total_votes'] == 1
+    assert [o['votes'] for o in body['options']] == [0, 1]
+    assert body['options'][1]['percentage'] == 100.0
+
+    assert gateway_vote(client, poll.id, 9, '0700000001').status_code == 400
+
+    listed = client.get('/api/polls').get_json()['polls'][0]
+    assert listed['total_votes'] == 1
+    # The JSON column is no longer rewritten per vote
+    assert db.session.get(Poll, poll.id).options[1]['votes'] == 0
+
+
+def test_legacy_poll_is_materialised_on_first_vote(client):
+    poll = make_poll(legacy_options=['Water', {'text': 'Roads', 'votes': 4}])
+    assert PollOption.query.count() == 0
+
+    details = client.get(f'/api/polls/{poll.id}').get_json()
+    assert details['total_votes'] == 4
+
+    client.post(f'/api/polls/{poll.id}/vote', json={'option_id': 1})
+    rows = PollOption.query.order_by(PollOption.option_id).all()
+    assert [(r.option_id, r.text, r.votes) for r in rows] == [(1, 'Water', 1), (2, 'Roads', 4)]
+    db.session.expire_all()
+    assert db.session.get(Poll, poll.id).options_version == POLL_OPTIONS_VERSION
+
+
+def test_concurrent_votes_are_not_lost(app):
+    poll_id = make_poll().id
+    threads, per_thread = 4, 25
+
+    def vote():
+        with app.app_context():
+            poll = db.session.get(Poll, poll_id)
+            for _ in range(per_thread):
+                record_vote(poll, 1)
+                db.session.commit()
+
+    workers = [threading.Thread(target=vote) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    db.session.expire_all()
+    assert PollOption.query.filter_by(poll_id=poll_id, option_id=1).one().votes == threads * per_thread
+
+
+def test_buffered_votes_are_merged_and_coalesced(app, client):
+    app.config.update(POLL_VOTE_MODE='buffered', POLL_VOTE_FLUSH_INTERVAL=3600)
+    poll = make_poll()
+    try:
+        for phone, option_id in (('0700000001', 1), ('0700000002', 2), ('0700000003', 2)):
+            assert gateway_vote(client, poll.id, option_id, phone).status_code == 200
+        assert gateway_vote(client, poll.id, 9, '0700000004').status_code == 400
+
+        # Acknowledged but not written yet; readers still see the votes
+        db.session.expire_all()
+        assert sum(r.votes for r in PollOption.query.filter_by(poll_id=poll.id)) == 0
+        details = client.get(f'/api/polls/{poll.id}').get_json()
+        assert [o['votes'] for o in details['options']] == [1, 2]
+
+        buffer = get_vote_buffer()
+        assert buffer.flush() == 3
+        assert buffer.flushes == 1
+        db.session.expire_all()
+        rows = PollOption.query.filter_by(poll_id=poll.id).order_by(PollOption.option_id).all()
+        assert [r.votes for r in rows] == [1, 2]
+        assert client.get(f'/api/polls/{poll.id}').get_json()['total_votes'] == 3
+    finally:
+        reset_vote_buffer()
+
+
+def test_repeat_voters_are_rejected(client):
+    poll = make_poll()
+    url = f'/api/polls/{poll.id}/vote'
+    subscription, _, _ = get_stream_hub().subscribe(poll.id)
+
+    assert gateway_vote(client, poll.id, 1, '0712 345 678').status_code == 200
+    # Same number in international format
+    assert gateway_vote(client, poll.id, 2, '+254712345678').status_code == 409
+    # Anonymous web voters are keyed by their session
+    assert client.post(url, json={'option_id': 2}).status_code == 200
+    assert client.post(url, json={'option_id': 1}).status_code == 409
+    # A phone number from the web is not believed: no fresh votes, no locking out its owner
+    assert client.post(url, json={'option_id': 1, 'phone_number': '0799 999 999'}).status_code == 409
+    assert client.post(url, json={'option_id': 1, 'phone_number': '0799 999 999'},
+                       headers={'X-Gateway-Token': 'guessed'}).status_code == 409
+    assert gateway_vote(client, poll.id, 1, '0799 999 999').status_code == 200
+
+    # A fresh process has empty filters; the unique index still catches them
+    reset_voter_index()
+    assert gateway_vote(client, poll.id, 2, '254712345678').status_code == 409
+
+    assert sorted(v.voter_key.split(':')[0] for v in PollVoter.query.filter_by(poll_id=poll.id)) == \
+        ['phone', 'phone', 'session']
+    assert client.get(f'/api/polls/{poll.id}').get_json()['total_votes'] == 3
+    # Streams only carry the votes that were claimed and committed
+    streamed = [event[1]['deltas'] for event in iter(lambda: subscription.get(timeout=0.05), None)]
+    assert streamed == [{1: 1}, {2: 1}, {1: 1}]
+
+
+def test_buffered_votes_claimed_elsewhere_are_refused_before_streaming(app, client):
+    app.config.update(POLL_VOTE_MODE='buffered', POLL_VOTE_FLUSH_INTERVAL=3600)
+    poll = make_poll()
+    # Claimed through another process: this one's Bloom filter hasn't seen it
+    db.session.add(PollVoter(poll_id=poll.id, voter_key='phone:254700000001', option_id=2))
+    db.session.commit()
+    subscription, _, _ = get_stream_hub().subscribe(poll.id)
+
+    assert gateway_vote(client, poll.id, 1, '0700000001').status_code == 409
+    assert gateway_vote(client, poll.id, 1, '0700000002').status_code == 200
+    # Only the accepted vote is buffered and streamed
+    assert get_vote_buffer().pending([poll.id]) == {(poll.id, 1): 1}
+    assert subscription.get(timeout=0.1)[1]['deltas'] == {1: 1}
+    assert subscription.get(timeout=0.1) is None
+    assert get_vote_buffer().flush() == 1
+    db.session.expire_all()
+    assert PollOption.query.filter_by(poll_id=poll.id, option_id=1).one().votes == 1
+
+
+def test_buffer_option_cache_is_bounded_and_forgets_deleted_polls(app):
+    buffer = VoteBuffer(option_cache_size=2)
+    polls = [make_poll() for _ in range(3)]
+    for poll in polls:
+        assert buffer.add(poll, 1)
+    assert list(buffer._option_ids) == [polls[1].id, polls[2].id]
+
+    buffer.forget(polls[2].id)
+    assert list(buffer._option_ids) == [polls[1].id]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = ScalableBloomFilter(capacity=1000, error_rate=1e-4)
+    keys = [f"phone:2547{n:08d}" for n in range(5000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    assert len(bloom.slices) > 1
+
+    false_positives = sum(f"session:{n}" in bloom for n in range(20000))
+    assert false_positives <= 5
+    assert BloomFilter(1000, 1e-6).hashes == 20
+
+
+def test_migrate_options_upgrades_legacy_polls_in_batches(app):
+    legacy = [make_poll(legacy_options=[f'Ward {n}', {'text': 'Other', 'votes': n}]) for n in range(5)]
+    current = make_poll()
+    # Rows copied by the schema migration keep their newer counts
+    db.session.add(PollOption(poll_id=legacy[0].id, option_id=2, text='Other', votes=7))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['polls', 'migrate-options', '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'Done: 5 polls upgraded' in result.output
+
+    db.session.expire_all()
+    assert {p.options_version for p in Poll.query} == {POLL_OPTIONS_VERSION}
+    assert db.session.get(Poll, legacy[3].id).options == [
+        {'id': 1, 'text': 'Ward 3', 'votes': 0}, {'id': 2, 'text': 'Other', 'votes': 3}]
+    votes = {(r.poll_id, r.option_id): r.votes for r in PollOption.query}
+    assert votes[(legacy[0].id, 2)] == 7 and votes[(legacy[4].id, 2)] == 4
+    assert votes[(current.id, 1)] == 0
+
+    # Nothing left to do on a second run
+    result = app.test_cli_runner().invoke(args=['polls', 'migrate-options'])
+    assert 'Done: 0 polls upgraded' in result.output
+
+
+def test_poll_listing_is_cached_and_revalidates_with_etag(client):
+    poll = make_poll()
+    first = client.get('/api/polls')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    unchanged = client.get('/api/polls', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers['X-Cache'] == 'HIT'
+
+    # A vote invalidates the snapshot, so the ETag changes
+    client.post(f'/api/polls/{poll.id}/vote', json={'option_id': 1})
+    changed = client.get('/api/polls', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['polls'][0]['total_votes'] == 1
+    assert changed.headers['ETag'] != etag
+
+    # Pages are selected in SQL, so polls created elsewhere show up once the listing is invalidated
+    make_poll(options=('Water', 'Roads', 'Clinics'))
+    invalidate_responses('polls')
+    assert client.get('/api/polls').get_json()['count'] == 2
+
+
+def test_poll_listing_pages_with_cursor_and_status_filter(client):
+    created = datetime(2026, 3, 1, 12, 0)
+    now = datetime.utcnow()
+    for n in range(7):
+        poll = Poll(question=f"Poll number {n} for the ward?", options=[{'id': 1, 'text': 'Yes', 'votes': 0}],
+                    # Two polls share each timestamp; id breaks the tie
+                    created_at=created + timedelta(hours=n // 2),
+                    expires_at=now + timedelta(days=1) if n % 3 else now - timedelta(days=1))
+        poll.option_rows = build_option_rows(['Yes'])
+        db.session.add(poll)
+    db.session.commit()
+    # Legacy rows without a creation time come last instead of breaking the cursor
+    legacy = [make_poll().id for _ in range(3)]
+    Poll.query.filter(Poll.id.in_(legacy)).update({'created_at': None}, synchronize_session=False)
+    db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        body = client.get('/api/polls', query_string={'per_page': 3, **({'cursor': cursor} if cursor else {})}).get_json()
+        assert body['count'] <= 3
+        seen.extend(p['id'] for p in body['polls'])
+        cursor = body['next_cursor']
+        assert body['has_more'] == (cursor is not None)
+        if not cursor:
+            break
+    expected = [p.id for p in Poll.query.filter(Poll.created_at.isnot(None))
+                .order_by(Poll.created_at.desc(), Poll.id.desc())]
+    assert seen == expected + legacy[::-1]
+
+    active = client.get('/api/polls', query_string={'status': 'active', 'per_page': 100}).get_json()['polls']
+    expired = client.get('/api/polls', query_string={'status': 'expired'}).get_json()['polls']
+    assert all(p['is_active'] for p in active) and not any(p['is_active'] for p in expired)
+    assert len(active) + len(expired) == 10
+
+    assert client.get('/api/polls', query_string={'cursor': 'not-a-cursor'}).status_code == 400
+    assert client.get('/api/polls', query_string={'status': 'open'}).status_code == 400
+
+
+def test_stream_hub_replays_missed_events_or_asks_for_snapshot():
+    hub = PollStreamHub(history=2)
+    hub.publish(1, {1: 1})
+    first, _, current_id = hub.subscribe(1)
+    hub.unsubscribe(first)
+
+    hub.publish(1, {2: 1})
+    _, replay, _ = hub.subscribe(1, last_event_id=current_id)
+    assert [data['deltas'] for _, data in replay] == [{2: 1}]
+
+    hub.publish(1, {1: 1})
+    hub.publish(1, {1: 1})
+    # Older than the history, or from another process: snapshot instead
+    assert hub.subscribe(1, last_event_id=current_id)[1] is None
+    assert hub.subscribe(1, last_event_id='0000-1')[1] is None
+
+
+def test_stream_hubs_share_votes_through_broker():
+    bus = MemoryBus()
+    worker_a = PollStreamHub(broker=MemoryBroker(bus))
+    worker_b = PollStreamHub(broker=MemoryBroker(bus))
+    subscription, _, _ = worker_b.subscribe(7)
+
+    worker_a.publish(7, {3: 1})
+    event_id, data = subscription.get(timeout=1)
+    assert event_id.startswith(worker_b.epoch)
+    assert data == {'poll_id': 7, 'deltas': {3: 1}}
+    worker_a.close()
+    worker_b.close()
+
+
+def test_postgres_listener_takes_its_connection_out_of_the_pool():
+    calls = []
+
+    class Raw:
+        def set_session(self, autocommit):
+            calls.append(('autocommit', autocommit))
+
+        def cursor(self):
+            return self
+
+        def execute(self, sql):
+            calls.append(sql)
+            broker.stop()
+
+    class Pooled:
+        driver_connection = Raw()
+
+        def detach(self):
+            calls.append('detach')
+
+        def close(self):
+            calls.append('close')
+
+    class Engine:
+        def raw_connection(self):
+            return Pooled()
+
+    broker = PostgresBroker(engine=Engine())
+    broker._listen(lambda payload: None)
+    assert calls == ['detach', ('autocommit', True), 'LISTEN poll_votes', 'close']
+
+
+def test_poll_stream_sends_snapshot_then_vote_deltas(app, client):
+    app.config['POLL_STREAM_HEARTBEAT'] = 0.05
+    poll = make_poll()
+
+    response = client.get(f'/api/polls/{poll.id}/stream')
+    assert response.mimetype == 'text/event-stream'
+    chunks = (chunk.decode() for chunk in response.response)
+    assert next(chunks).startswith('retry:')
+    snapshot = next(chunks)
+    assert 'event: snapshot' in snapshot and '"total_votes":0' in snapshot
+
+    client.post(f'/api/polls/{poll.id}/vote', json={'option_id': 2})
+    delta = next(chunks)
+    assert '"deltas":{"2":1}' in delta
+    assert next(chunks) == ': heartbeat\n\n'
+    response.close()
+
+
+def test_poll_stream_ends_after_max_lifetime(app, client):
+    app.config.update(POLL_STREAM_HEARTBEAT=0.05, POLL_STREAM_MAX_SECONDS=0.2)
+    poll = make_poll()
+
+    started = time.monotonic()
+    body = client.get(f'/api/polls/{poll.id}/stream').get_data(as_text=True)
+    assert time.monotonic() - started < 2
+    assert body.startswith('retry:') and 'event: snapshot' in body and ': heartbeat' in body
+
+
+def test_poll_stream_refuses_streams_past_the_worker_cap(app, client):
+    app.config.update(POLL_STREAM_HEARTBEAT=0.05, POLL_STREAM_MAX_PER_WORKER=1)
+    poll = make_poll()
+
+    first = client.get(f'/api/polls/{poll.id}/stream')
+    next(iter(first.response))
+    refused = client.get(f'/api/polls/{poll.id}/stream')
+    assert refused.status_code == 503 and refused.headers['Retry-After'] == '3'
+    first.close()
+    # A closed stream frees its slot
+    second = client.get(f'/api/polls/{poll.id}/stream')
+    assert second.status_code == 200
+    second.close()
@@ -0,0 +1,134 @@
+import threading
+import time
+
+from app import db
+from app.models import Official
+from app.utils.official_lookup import set_lookup_key
+from app.utils.response_cache import MemoryBackend, RedisBackend, ResponseCache, get_response_cache
+
+
+def make_official(name):
+    official = Official(name=name, position='MP', constituency='Westlands', average_score=0.0, rating_count=0)
+    set_lookup_key(official)
+    db.session.add(official)
+    db.session.commit()
+    return official
+
+
+class FakeRedis:
+    """The slice of redis-py the backend uses"""
+
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, b'0')) + 1).encode()
+        return int(self.data[key])
+
+
+def test_public_listings_are_cached_until_a_write_invalidates_them(app, client):
+    make_official('Mary Wanjiku')
+
+    first = client.get('/api/scorecards/officials')
+    assert first.headers['X-Cache'] == 'MISS' and first.get_json()['count'] == 1
+    second = client.get('/api/scorecards/officials')
+    assert second.headers['X-Cache'] == 'HIT' and second.get_data() == first.get_data()
+
+    assert client.get('/api/scorecards/officials', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert client.get('/api/scorecards/officials',
+                      headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+
+    # Rating invalidates the officials listings and the dashboard
+    client.get('/api/dashboard-data')
+    client.post('/api/scorecards/rate', json={'name': 'Mary Wanjiku', 'position': 'MP',
+                                              'constituency': 'Westlands', 'score': 4})
+    rated = client.get('/api/scorecards/officials', headers={'If-None-Match': first.headers['ETag']})
+    assert rated.status_code == 200 and rated.headers['X-Cache'] == 'MISS'
+    assert rated.get_json()['officials']['MP - Westlands'][0]['rating_count'] == 1
+    assert client.get('/api/dashboard-data').headers['X-Cache'] == 'MISS'
+
+    # Feedback invalidates the issue listing
+    assert client.get('/api/issues').headers['X-Cache'] == 'MISS'
+    assert client.get('/api/issues').headers['X-Cache'] == 'HIT'
+    client.post('/api/feedback', json={'content': 'The clinic has no drugs', 'location': 'Kibra'})
+    assert client.get('/api/issues').headers['X-Cache'] == 'MISS'
+
+    # Errors are never stored
+    assert client.get('/api/issues?cursor=nonsense').status_code == 400
+    assert 'X-Cache' not in client.get('/api/issues?cursor=nonsense').headers
+
+
+def test_keys_follow_query_args_and_locale(app, client):
+    assert client.get('/api/issues?status=all&per_page=5').headers['X-Cache'] == 'MISS'
+    # Argument order does not matter; values and locale do
+    assert client.get('/api/issues?per_page=5&status=all').headers['X-Cache'] == 'HIT'
+    assert client.get('/api/issues?per_page=6&status=all').headers['X-Cache'] == 'MISS'
+    swahili = client.get('/api/issues?status=all&per_page=5', headers={'Accept-Language': 'sw'})
+    assert swahili.headers['X-Cache'] == 'MISS' and 'Accept-Language' in swahili.headers['Vary']
+
+
+def test_one_request_recomputes_while_others_wait_or_serve_stale(app):
+    cache = ResponseCache(MemoryBackend(), lock_timeout=2)
+    calls = []
+
+    def produce():
+        calls.append(True)
+        time.sleep(0.2)
+        return {'calls': len(calls)}
+
+    statuses = []
+
+    def load():
+        with app.test_request_context('/api/polls'):
+            statuses.append(cache.respond('polls.get_polls', 60, ('polls',), {}, produce).headers['X-Cache'])
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(statuses) == ['HIT'] * 7 + ['MISS']
+
+    # A stale entry is served while another request holds the recompute lock
+    with app.test_request_context('/api/polls'):
+        key = cache.key('polls.get_polls', ('polls',), {})
+        entry = cache.backend.get(key)
+        entry['fresh_until'] = time.time() - 1
+        cache.backend.set(key, entry)
+        cache.backend.add(f'{key}:lock', 'other', 2)
+        stale = cache.respond('polls.get_polls', 60, ('polls',), {}, produce)
+    assert stale.headers['X-Cache'] == 'STALE' and stale.get_json() == {'calls': 1}
+    assert len(calls) == 1
+
+
+def test_shared_backend_and_outages(app, client):
+    cache = ResponseCache(RedisBackend(client=FakeRedis()))
+    with app.test_request_context('/api/scorecards/top'):
+        assert cache.respond('api.get_top_officials', 60, ('officials',), {}, lambda: {'top': []}) \
+            .headers['X-Cache'] == 'MISS'
+        assert cache.respond('api.get_top_officials', 60, ('officials',), {}, lambda: {'top': [1]}) \
+            .get_json() == {'top': []}
+        cache.invalidate(('officials',))
+        assert cache.respond('api.get_top_officials', 60, ('officials',), {}, lambda: {'top': [1]}) \
+            .get_json() == {'top': [1]}
+
+    # A failing backend falls back to the uncached view
+    get_response_cache().backend = RedisBackend(client=object())
+    body = client.get('/api/scorecards/top')
+    assert body.status_code == 200 and 'X-Cache' not in body.headers
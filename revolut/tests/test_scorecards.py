@@ -0,0 +1,156 @@
+import threading
+
+from app import db
+from app.models import Official, OfficialRating
+from app.utils.official_lookup import get_official_key_cache, official_lookup_key, set_lookup_key
+from app.utils.official_ratings import record_rating
+from app.utils.official_typeahead import (OfficialTypeahead, get_official_typeahead, index_official,
+                                          name_skeleton, reset_official_typeahead)
+
+
+def make_official(name='Mary Wanjiku', position='MP', constituency='Westlands'):
+    official = Official(name=name, position=position, constituency=constituency,
+                        average_score=0.0, rating_count=0)
+    set_lookup_key(official)
+    db.session.add(official)
+    db.session.commit()
+    return official
+
+
+def rate(client, score, **fields):
+    data = {'name': 'mary wanjiku ', 'position': 'mp', 'constituency': 'Westlands', 'score': score}
+    return client.post('/api/scorecards/rate', json={**data, **fields})
+
+
+def test_rating_updates_aggregates_and_stores_row(client):
+    official_id = make_official().id
+
+    for score in (5, 3, 4):
+        response = rate(client, score, comment='Fixed the water point')
+        assert response.status_code == 200
+
+    body = response.get_json()
+    assert body['new_average'] == 4.0
+    assert body['total_ratings'] == 3
+    assert body['distribution'] == {'1': 0, '2': 0, '3': 1, '4': 1, '5': 1}
+
+    official = db.session.get(Official, official_id)
+    assert (official.rating_sum, official.rating_sum_sq, official.average_score) == (12, 50, 4.0)
+    assert [r.score for r in OfficialRating.query.order_by(OfficialRating.id)] == [5, 3, 4]
+
+    assert rate(client, 6).status_code == 400
+    assert rate(client, 4, name='Someone Else').status_code == 404
+    assert OfficialRating.query.count() == 3
+
+
+def test_concurrent_ratings_are_not_lost(app):
+    official_id = make_official().id
+    threads, per_thread = 4, 25
+
+    def submit(score):
+        with app.app_context():
+            for _ in range(per_thread):
+                record_rating(official_id, score)
+                db.session.commit()
+
+    workers = [threading.Thread(target=submit, args=(score,)) for score in (1, 2, 4, 5)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    db.session.expire_all()
+    official = db.session.get(Official, official_id)
+    assert official.rating_count == threads * per_thread
+    assert official.rating_sum == 12 * per_thread
+    assert official.average_score == 3.0
+    assert [official.score_1, official.score_3, official.score_5] == [per_thread, 0, per_thread]
+
+
+def test_lookup_key_ignores_case_accents_and_spacing():
+    assert official_lookup_key('  José  Ñyambura ', 'MCA', 'Kibra\tWard') == 'jose nyambura|mca|kibra ward'
+
+
+def test_rating_lookup_is_cached_and_evicted(client):
+    official = make_official(name='Amina Hassan')
+    key = official_lookup_key('Amina Hassan', 'MP', 'Westlands')
+
+    assert rate(client, 4, name='AMINA  HASSAN').status_code == 200
+    assert get_official_key_cache().get(key) == official.id
+
+    # Deleted by another process: the stale cache entry is dropped on the next rating
+    db.session.delete(official)
+    db.session.commit()
+    assert rate(client, 4, name='Amina Hassan').status_code == 404
+    assert get_official_key_cache().get(key) is None
+
+
+def suggest(client, query):
+    response = client.get('/api/scorecards/search', query_string={'name': query})
+    assert response.status_code == 200
+    return [official['name'] for official in response.get_json()]
+
+
+def test_typeahead_ranks_prefix_matches(client):
+    make_official(name='Wanjiru Kamau', position='MCA', constituency='Kangemi')
+    make_official(name='Kamau Njoroge', position='MP', constituency='Kikuyu')
+    make_official(name='Peter Otieno', position='Senator', constituency='Kamukunji')
+
+    # Name words beat constituency words, whole words beat prefixes
+    assert suggest(client, 'kam') == ['Wanjiru Kamau', 'Kamau Njoroge', 'Peter Otieno']
+    assert suggest(client, 'kamau') == ['Wanjiru Kamau', 'Kamau Njoroge']
+    # Every word must match, in any field
+    assert suggest(client, 'kamau kik') == ['Kamau Njoroge']
+    assert suggest(client, 'kamau nairobi') == []
+    assert client.get('/api/scorecards/search').status_code == 400
+
+
+def test_typeahead_tolerates_misspelt_kenyan_names(client):
+    for name in ("Raila Odhiambo", "Anyang' Nyong'o", "Mohammed Ali", "Moses Kariuki", "Faith Wanjiku"):
+        make_official(name=name)
+
+    assert name_skeleton('odhiambo') == name_skeleton('odiambo')
+    assert name_skeleton('muhamad') == 'mohamad'
+    assert suggest(client, 'odiam') == ['Raila Odhiambo']
+    assert suggest(client, 'nyongo') == ["Anyang' Nyong'o"]
+    assert suggest(client, 'kaliuki') == ['Moses Kariuki']
+    assert suggest(client, 'muhamed') == ['Mohammed Ali']
+    # One typo in a whole word
+    assert suggest(client, 'wanjkiu') == ['Faith Wanjiku']
+
+
+def test_typeahead_follows_admin_edits_and_ratings(client):
+    official = make_official(name='Esther Passaris')
+    assert suggest(client, 'esther') == ['Esther Passaris']
+
+    # Added behind the index's back: picked up by the next rebuild
+    make_official(name='Esther Muthoni')
+    assert suggest(client, 'esther') == ['Esther Passaris']
+
+    # What the admin edit route does
+    official.name = 'Esther Mwangi'
+    set_lookup_key(official)
+    db.session.commit()
+    index_official(official)
+    assert suggest(client, 'passaris') == []
+    assert suggest(client, 'mwangi') == ['Esther Mwangi']
+
+    assert rate(client, 5, name='Esther Mwangi', position='MP').status_code == 200
+    results = client.get('/api/scorecards/search?name=esther').get_json()
+    assert results[0]['current_rating'] == 5.0
+
+    reset_official_typeahead()
+    assert suggest(client, 'esther') == ['Esther Mwangi', 'Esther Muthoni']
+    assert get_official_typeahead().stats()['officials'] == 2
+
+
+def test_typeahead_removal_frees_index_entries():
+    index = OfficialTypeahead()
+    index.load([(1, 'Gladys Wanga', 'Governor', 'Homa Bay', 3.5, 10)])
+    assert index.suggest('wanga')[0]['current_rating'] == 3.5
+    assert index.stats()['bytes'] > 0
+
+    index.remove(1)
+    assert index.suggest('wanga') == []
+    stats = index.stats()
+    assert [stats[key] for key in ('officials', 'words', 'postings', 'fuzzy_keys')] == [0, 0, 0, 0]
@@ -0,0 +1,183 @@
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import Issue, RowCounter, UserFeedback
+from app.utils.nlp_processor import EnhancedNLPProcessor
+from app.utils.search import get_search_backend, search
+from app.utils.text_analysis import analyse, stem_english, stem_swahili
+
+
+@pytest.fixture(params=['sqlite', 'memory'])
+def app_config(request):
+    return {'SEARCH_BACKEND': request.param}
+
+
+def report(client, title, description, location='Kibra'):
+    response = client.post('/api/issues', json={'title': title, 'description': description, 'location': location})
+    assert response.status_code == 201
+    return response.get_json()['issue_id']
+
+
+def test_stemmers_conflate_inflections():
+    assert stem_english('roads') == stem_english('road')
+    assert stem_english('flooding') == stem_english('flooded') == 'flood'
+    assert stem_swahili('imeharibika') == stem_swahili('kuharibika')
+    assert stem_swahili('imerekebishwa') == stem_swahili('kurekebisha')
+    assert 'the' not in analyse('The roads in Kibra')
+
+
+def test_issue_search_is_ranked_and_stemmed(client):
+    mention = report(client, 'Water shortage at the market', 'Also the road to the market is flooded')
+    headline = report(client, 'Flooded roads near Olympic', 'Nobody has cleared the drainage for weeks')
+    report(client, 'Street lights off', 'No lights on the main street since Monday')
+
+    body = client.get('/api/issues?search=flooding road&status=all').get_json()
+    assert [issue['id'] for issue in body['issues']] == [headline, mention]
+    assert body['total'] == 2
+
+    swahili = report(client, 'Barabara imeharibika', 'Barabara ya Kibra imeharibika kabisa')
+    found = client.get('/api/issues?search=kuharibika').get_json()['issues']
+    assert [issue['id'] for issue in found] == [swahili]
+
+
+def test_issue_location_filter_uses_prefixes_and_other_filters(client):
+    west = report(client, 'Burst pipe on Langata Road', 'Water is leaking everywhere', location='Nairobi West')
+    report(client, 'Burst pipe in Kondele', 'Water is leaking everywhere', location='Kisumu')
+    Issue.query.filter_by(id=west).update({'status': 'Resolved'})
+    db.session.commit()
+
+    assert [i['id'] for i in client.get('/api/issues?location=nairobi w&status=all').get_json()['issues']] == [west]
+    assert client.get('/api/issues?location=Nairobi West').get_json()['total'] == 0
+    assert client.get('/api/issues?search=pipe&location=NAIROBI&status=Resolved').get_json()['total'] == 1
+
+
+def test_location_listing_is_not_capped_by_search_results(app, client):
+    app.config['SEARCH_MAX_RESULTS'] = 3
+    west = [report(client, f'Blocked drain {n}', 'Water floods the road', location='Nairobi West') for n in range(5)]
+    report(client, 'Blocked drain', 'Water floods the road', location='Kisumu')
+
+    seen, cursor = [], None
+    while True:
+        body = client.get('/api/issues', query_string={'location': 'nairobi w', 'per_page': 2,
+                                                       **({'cursor': cursor} if cursor else {})}).get_json()
+        seen += [issue['id'] for issue in body['issues']]
+        assert body['total'] == 5
+        cursor = body['next_cursor']
+        if not body['has_more']:
+            break
+    assert seen == west[::-1]
+    # Ranked text searches stay capped
+    assert client.get('/api/issues?search=drain&location=nairobi').get_json()['total'] == 3
+
+
+def test_large_memory_location_matches_go_through_a_temporary_table(app, client):
+    backend = get_search_backend()
+    if backend.name != 'memory':
+        pytest.skip("native backends match in SQL")
+    backend.match_list_max = 2
+    west = [report(client, f'Blocked drain {n}', 'Water floods the road', location='Nairobi West') for n in range(5)]
+    report(client, 'Blocked drain', 'Water floods the road', location='Kisumu')
+
+    statements = []
+    listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        body = client.get('/api/issues', query_string={'location': 'nairobi w', 'per_page': 10}).get_json()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert [issue['id'] for issue in body['issues']] == west[::-1] and body['total'] == 5
+    # The listing reads the matches from the table instead of an id per parameter
+    assert not any('issue.id IN (?' in statement for statement in statements)
+    assert any('issue.id IN (SELECT id FROM issue_search_matches)' in statement for statement in statements)
+
+
+def test_feedback_search_follows_processed_location(app, client):
+    client.post('/api/feedback', json={'content': 'Maji hayatoki Kibera tangu jana', 'language': 'sw'})
+    client.post('/api/feedback', json={'content': 'Great job fixing the clinic', 'location': 'Kisumu'})
+    feedback = UserFeedback.query.filter_by(language='sw').one()
+
+    assert client.get('/api/feedback?search=maji').get_json()['total'] == 1
+    assert client.get('/api/feedback?location=kibera').get_json()['total'] == 0
+
+    # The NLP worker fills in the location it extracts
+    processor = EnhancedNLPProcessor()
+    results, _ = processor.score_rows([(feedback.id, feedback.content, None)])
+    processor.write_results([{**results[0], 'location': 'Kibera'}])
+    db.session.commit()
+
+    body = client.get('/api/feedback?location=kibera').get_json()
+    assert [f['id'] for f in body['feedback']] == [feedback.id]
+
+
+def test_rebuild_command_indexes_existing_rows(app):
+    # Written behind the API's back, so never indexed
+    db.session.add(Issue(title='Garbage not collected', description='Heaps of garbage at the stage',
+                         location='Githurai'))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['search', 'rebuild'])
+    assert result.exit_code == 0, result.output
+    assert f'Rebuilding the {get_search_backend().name} search index' in result.output
+    assert 'Done: 1 issue rows indexed' in result.output
+    assert len(search('issue', text='garbage')) == 1
+
+    # Nothing to fill once the index has rows (the memory index loads itself)
+    result = app.test_cli_runner().invoke(args=['search', 'rebuild', '--if-empty'])
+    assert result.exit_code == 0 and 'issue rows indexed' not in result.output
+
+
+def test_issue_listing_counts_feedback_in_one_query(app, client):
+    issues = [report(client, f'Blocked drain {n}', 'Water floods the road') for n in range(6)]
+    for issue_id, count in zip(issues, (3, 0, 1, 0, 2, 0)):
+        for _ in range(count):
+            client.post('/api/feedback', json={'content': 'Still blocked', 'issue_id': issue_id})
+
+    statements = []
+    listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        queries = []
+        for per_page in (2, 6):
+            del statements[:]
+            body = client.get(f'/api/issues?per_page={per_page}&search=drain').get_json()
+            queries.append(len(statements))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert queries[0] == queries[1]
+    assert {issue['id']: issue['feedback_count'] for issue in body['issues']} == dict(zip(issues, (3, 0, 1, 0, 2, 0)))
+
+
+def test_listings_page_by_cursor_with_approximate_totals(app, client):
+    issues = [report(client, f'Blocked drain {n}', 'Water floods the road') for n in range(5)]
+    for n, score in enumerate((0.6, -0.5, 0.3, 0.0, 0.9)):
+        client.post('/api/feedback', json={'content': f'Feedback number {n}'})
+        UserFeedback.query.filter_by(content=f'Feedback number {n}').update({'sentiment_score': score})
+    db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        body = client.get('/api/issues', query_string={'per_page': 2, 'cursor': cursor}).get_json()
+        seen += [issue['id'] for issue in body['issues']]
+        assert body['total'] == 5
+        cursor = body['next_cursor']
+        if not body['has_more']:
+            break
+    assert seen == issues[::-1]
+    assert client.get('/api/issues?cursor=nonsense').status_code == 400
+
+    positive = client.get('/api/feedback?sentiment=positive&per_page=2').get_json()
+    assert [f['sentiment_score'] for f in positive['feedback']] == [0.9, 0.3]
+    assert positive['total'] is None
+    rest = client.get(f"/api/feedback?sentiment=positive&cursor={positive['next_cursor']}").get_json()
+    assert [f['sentiment_score'] for f in rest['feedback']] == [0.6] and rest['next_cursor'] is None
+
+    # Sharded counters bumped on insert; recount makes them exact again
+    assert client.get('/api/feedback').get_json()['total'] == 5
+    db.session.add(UserFeedback(content='Imported behind the API'))
+    db.session.commit()
+    assert client.get('/api/feedback').get_json()['total'] == 5
+    result = app.test_cli_runner().invoke(args=['counts', 'recount'])
+    assert 'user_feedback: 6' in result.output
+    assert client.get('/api/feedback').get_json()['total'] == 6
+    assert sum(row.count for row in RowCounter.query.filter_by(name='issue:status=Open')) == 5
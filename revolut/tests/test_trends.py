@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models import Alert, TrendBucket, UserFeedback
+from app.utils.alerts import check_for_trending_issues
+from app.utils.nlp_processor import EnhancedNLPProcessor
+from app.utils.trends import rebuild_buckets, tag_counts
+
+
+@pytest.fixture
+def app_config():
+    return {'TRENDING_THRESHOLD': 3}
+
+
+def process_all():
+    EnhancedNLPProcessor().process_batch(query=UserFeedback.query)
+
+
+def test_buckets_follow_processing_without_double_counting(app):
+    db.session.add_all([UserFeedback(content="Maji hakuna in Nairobi", is_processed=False) for _ in range(2)])
+    db.session.add(UserFeedback(content="The clinic has no medicine", location="Kisumu", is_processed=False))
+    db.session.commit()
+
+    process_all()
+    assert tag_counts() == {'water_supply': 2, 'healthcare': 1}
+
+    # Re-scoring replaces a row's contribution instead of adding to it
+    process_all()
+    assert tag_counts() == {'water_supply': 2, 'healthcare': 1}
+
+    # Counts move with edited content
+    feedback = UserFeedback.query.filter_by(location='Kisumu').one()
+    feedback.content = "The road is broken"
+    db.session.commit()
+    process_all()
+    assert tag_counts() == {'water_supply': 2, 'infrastructure': 1}
+
+    # Old buckets fall out of the window
+    db.session.add(TrendBucket(tag='security', bucket=datetime.utcnow() - timedelta(hours=30), count=50))
+    db.session.commit()
+    assert 'security' not in tag_counts(window_hours=24)
+    assert tag_counts(window_hours=48)['security'] == 50
+
+
+def test_trending_alert_is_raised_once_with_locations(app):
+    db.session.add_all([UserFeedback(content=f"Barabara mbaya {town}", is_processed=False)
+                        for town in ('Nairobi', 'Kisumu', 'Kisumu')])
+    db.session.commit()
+    process_all()
+
+    alerts = check_for_trending_issues()
+    assert [a.topic for a in alerts] == ['infrastructure']
+    assert alerts[0].affected_locations == ['Kisumu', 'Nairobi']
+
+    assert check_for_trending_issues() == []
+    assert Alert.query.count() == 1
+
+
+def test_rebuild_matches_incremental_counts(app):
+    db.session.add_all([UserFeedback(content="Shule hakuna mwalimu", location="Meru", is_processed=False)
+                        for _ in range(4)])
+    db.session.commit()
+    process_all()
+    incremental = tag_counts()
+
+    rebuild_buckets(24)
+    assert tag_counts() == incremental == {'education': 4}